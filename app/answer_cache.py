@@ -0,0 +1,117 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+
+def normalize_question(question: str) -> str:
+    """Normaliza a pergunta para comparação exata (caixa, acentos, espaços, pontuação final)"""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!.;: ")
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class AnswerCache:
+    """Cache de respostas (LRU + TTL), chaveado por pergunta normalizada, modelo e versão do índice"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600, similarity_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._index_version = None
+        self._lock = threading.Lock()
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def _sync_version(self, index_version):
+        # Índice mudou: nenhuma resposta antiga é confiável
+        if index_version != self._index_version:
+            self._entries.clear()
+            self._index_version = index_version
+
+    def _purge_expired(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, question: str, model: str, index_version, embedding: Optional[List[float]] = None) -> Optional[dict]:
+        """Busca exata e, se habilitada, por similaridade do embedding da pergunta"""
+        now = time.time()
+        key = (normalize_question(question), model)
+
+        with self._lock:
+            self._sync_version(index_version)
+            self._purge_expired(now)
+
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry["result"])
+
+            if embedding is not None and self.semantic_enabled:
+                best_key, best_score = None, 0.0
+                for candidate_key, candidate in self._entries.items():
+                    if candidate_key[1] != model or candidate.get("embedding") is None:
+                        continue
+                    score = _cosine(embedding, candidate["embedding"])
+                    if score > best_score:
+                        best_key, best_score = candidate_key, score
+
+                if best_key and best_score >= self.similarity_threshold:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return dict(self._entries[best_key]["result"])
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, model: str, index_version, result: dict, embedding: Optional[List[float]] = None):
+        key = (normalize_question(question), model)
+
+        with self._lock:
+            self._sync_version(index_version)
+            self._entries[key] = {
+                "result": dict(result),
+                "embedding": embedding,
+                "created_at": time.time()
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self._entries)
+            }
@@ -0,0 +1,384 @@
+"""API HTTP assíncrona do KRAG (aiohttp), para plugins de IDE, chatbots e scripts
+
+    python app/api_server.py --port 8000 --index
+
+Com API_ENABLED=True ela também sobe junto da interface, compartilhando o mesmo motor.
+
+    POST /query                {"question": "...", "filters": {...}, "deadline": 30} → resposta completa
+    POST /query/stream         mesma entrada → NDJSON: {"token": "..."} por linha e {"done": true, ...} no fim
+    POST /index                {"force": true} → {"job_id": ...}
+    GET  /index/jobs[/{id}]    estado dos jobs de indexação
+    GET  /models               modelos instalados no Ollama
+    POST /models/active        {"model": "..."} → troca o modelo
+    GET  /stats, GET /health
+
+O motor é síncrono: as consultas entram numa fila limitada (API_QUEUE_SIZE) atendida por
+API_WORKERS threads, e o loop de eventos nunca bloqueia. Fila cheia responde 503. As chamadas ao
+Ollama passam pelo escalonador do motor: Ollama sobrecarregado responde 503 e prazo
+("deadline", em s; padrão API_DEADLINE) esgotado antes de conseguir vaga responde 504.
+"""
+import argparse
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from aiohttp import web
+
+from config import Config
+from ollama_scheduler import DeadlineExceeded, RequestRejected
+
+
+class QueueFull(Exception):
+    pass
+
+
+class WorkQueue:
+    """Fila limitada de chamadas bloqueantes ao motor, atendida por `workers` threads"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="krag-api")
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn: Callable, *args) -> asyncio.Future:
+        """Enfileira sem esperar; QueueFull se já há `max_pending` trabalhos aguardando"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((fn, args, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull()
+        return future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, args, future = await self._queue.get()
+            try:
+                # Cliente desistiu enquanto esperava na fila
+                if future.cancelled():
+                    continue
+                self.active += 1
+                try:
+                    result = await loop.run_in_executor(self._executor, fn, *args)
+                    if not future.cancelled():
+                        future.set_result(result)
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                finally:
+                    self.active -= 1
+                    self.completed += 1
+            finally:
+                self._queue.task_done()
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+
+def json_response(data, status: int = 200) -> web.Response:
+    return web.json_response(data, status=status, dumps=partial(json.dumps, ensure_ascii=False, default=str))
+
+
+def error_response(message: str, status: int) -> web.Response:
+    return json_response({"error": message}, status=status)
+
+
+def busy_response(message: str = "Servidor ocupado, tente novamente") -> web.Response:
+    response = error_response(message, 503)
+    response.headers["Retry-After"] = "5"
+    return response
+
+
+def rejected_response(error: RequestRejected) -> web.Response:
+    """Recusa do escalonador do Ollama: prazo esgotado (504) ou sobrecarga (503)"""
+    if isinstance(error, DeadlineExceeded):
+        return error_response(str(error), 504)
+    return busy_response(str(error))
+
+
+async def read_question(request: web.Request) -> tuple:
+    """(pergunta, filtros, prazo em s) do corpo JSON; ValueError se inválido"""
+    try:
+        body = await request.json()
+    except Exception:
+        raise ValueError("JSON inválido")
+    if isinstance(body, str):
+        body = {"question": body}
+    question = (body.get("question") or "").strip() if isinstance(body, dict) else ""
+    if not question:
+        raise ValueError("Campo \"question\" é obrigatório")
+
+    try:
+        deadline = float(body.get("deadline") or Config.API_DEADLINE)
+    except (TypeError, ValueError):
+        raise ValueError("Campo \"deadline\" deve ser um número de segundos")
+    return question, body.get("filters"), deadline
+
+
+class KRAGApi:
+    def __init__(self, rag_engine, workers: int, max_pending: int):
+        self.rag = rag_engine
+        self.work = WorkQueue(workers, max_pending)
+
+    async def on_startup(self, app):
+        await self.work.start()
+
+    async def on_cleanup(self, app):
+        await self.work.stop()
+
+    def _query(self, question: str, filters: Optional[dict], deadline: float) -> dict:
+        result = self.rag.query(question, filters, deadline=deadline)
+        if result.get("answer", "").startswith("Erro:"):
+            result["error"] = result["answer"][len("Erro:"):].strip()
+        return result
+
+    async def query(self, request: web.Request) -> web.Response:
+        try:
+            question, filters, deadline = await read_question(request)
+            future = self.work.submit(self._query, question, filters, deadline)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except QueueFull:
+            return busy_response()
+
+        try:
+            result = await future
+        except RequestRejected as e:
+            return rejected_response(e)
+        return json_response(dict(result, model=self.rag.get_current_model()))
+
+    def _stream(self, question: str, filters: Optional[dict], deadline: float, loop, events: asyncio.Queue,
+                cancelled: threading.Event):
+        """Roda no worker: repassa cada token para o loop de eventos até o fim ou o cliente sair"""
+        def emit(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        try:
+            result = self.rag.query_stream(question, filters, deadline=deadline)
+            tokens = result.pop("tokens", None)
+            if tokens is not None:
+                try:
+                    for piece in tokens:
+                        if cancelled.is_set():
+                            break
+                        emit({"token": piece})
+                finally:
+                    tokens.close()
+            emit(dict(result, done=True, model=self.rag.get_current_model()))
+        except RequestRejected as e:
+            # Recusa acontece antes do primeiro token: o handler ainda pode devolver 503/504
+            emit({"done": True, "rejected": e})
+        except Exception as e:
+            emit({"done": True, "error": str(e)})
+
+    async def query_stream(self, request: web.Request) -> web.StreamResponse:
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        cancelled = threading.Event()
+        try:
+            question, filters, deadline = await read_question(request)
+            future = self.work.submit(self._stream, question, filters, deadline, loop, events, cancelled)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except QueueFull:
+            return busy_response()
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+        try:
+            # A resposta só abre no primeiro token: recusa do escalonador ainda vira status HTTP
+            event = await events.get()
+            if "rejected" in event:
+                await future
+                return rejected_response(event["rejected"])
+
+            await response.prepare(request)
+            while True:
+                line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+                await response.write(line.encode("utf-8"))
+                if event.get("done"):
+                    break
+                event = await events.get()
+            await future
+            await response.write_eof()
+        except ConnectionResetError:
+            print("⚠️ Cliente desconectou durante o streaming")
+        finally:
+            # Conexão caiu: o worker para de gerar no próximo token
+            cancelled.set()
+        return response
+
+    async def start_index(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json() if request.can_read_body else {}
+        except Exception:
+            return error_response("JSON inválido", 400)
+        if not isinstance(body, dict):
+            body = {}
+        job_id = self.rag.start_index_job(force_reindex=bool(body.get("force", False)))
+        return json_response({"job_id": job_id, "job": self.rag.get_index_job(job_id)}, status=202)
+
+    async def index_jobs(self, request: web.Request) -> web.Response:
+        return json_response(self.rag.index_jobs.list())
+
+    async def index_job(self, request: web.Request) -> web.Response:
+        job = self.rag.get_index_job(request.match_info["job_id"])
+        if not job:
+            return error_response("Job não encontrado", 404)
+        return json_response(job)
+
+    async def models(self, request: web.Request) -> web.Response:
+        loop = asyncio.get_running_loop()
+        available = await loop.run_in_executor(None, self.rag.get_available_models)
+        return json_response({
+            "current": self.rag.get_current_model(),
+            "available": available,
+            "pool": self.rag.model_manager.get_status()
+        })
+
+    async def change_model(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            model = (body.get("model") or "").strip()
+        except Exception:
+            return error_response("JSON inválido", 400)
+        if not model:
+            return error_response("Campo \"model\" é obrigatório", 400)
+
+        loop = asyncio.get_running_loop()
+        success, message = await loop.run_in_executor(None, self.rag.change_model, model)
+        return json_response({"success": success, "message": message, "model": self.rag.get_current_model()},
+                             status=200 if success else 400)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return json_response(dict(self.rag.get_stats(), api=self.work.get_stats()))
+
+    async def health(self, request: web.Request) -> web.Response:
+        health = self.rag.stats_monitor.snapshot()["health"]
+        return json_response({"status": health["status"], "queue": self.work.get_stats()},
+                             status=503 if health["status"] == "error" else 200)
+
+
+def create_app(rag_engine, workers: Optional[int] = None, max_pending: Optional[int] = None) -> web.Application:
+    api = KRAGApi(
+        rag_engine,
+        workers=max(1, workers or Config.API_WORKERS),
+        max_pending=max(1, max_pending or Config.API_QUEUE_SIZE)
+    )
+    app = web.Application()
+    app["api"] = api
+    app.on_startup.append(api.on_startup)
+    app.on_cleanup.append(api.on_cleanup)
+    app.router.add_post("/query", api.query)
+    app.router.add_post("/query/stream", api.query_stream)
+    app.router.add_post("/index", api.start_index)
+    app.router.add_get("/index/jobs", api.index_jobs)
+    app.router.add_get("/index/jobs/{job_id}", api.index_job)
+    app.router.add_get("/models", api.models)
+    app.router.add_post("/models/active", api.change_model)
+    app.router.add_get("/stats", api.stats)
+    app.router.add_get("/health", api.health)
+    return app
+
+
+# API embutida na UI: uma por processo, sempre apontando para o motor atual
+_background_lock = threading.Lock()
+_background: Optional[KRAGApi] = None
+
+
+def start_in_background(rag_engine, host: str, port: int, **options) -> bool:
+    """Sobe a API num loop de eventos próprio, em thread daemon (ex.: junto do Streamlit)
+
+    Se ela já roda neste processo (a UI recriou o motor), só passa a atender com o novo motor.
+    """
+    global _background
+    with _background_lock:
+        if _background is not None:
+            _background.rag = rag_engine
+            return True
+
+        app = create_app(rag_engine, **options)
+        started = threading.Event()
+        result = {}
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            runner = web.AppRunner(app)
+            try:
+                loop.run_until_complete(runner.setup())
+                loop.run_until_complete(web.TCPSite(runner, host, port).start())
+            except OSError as e:
+                print(f"⚠️ API indisponível na porta {port}: {e}")
+                loop.run_until_complete(runner.cleanup())
+                started.set()
+                return
+            print(f"🌐 API em http://{host}:{port}")
+            result["ok"] = True
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="krag-api-server", daemon=True).start()
+        started.wait()
+        if result.get("ok"):
+            _background = app["api"]
+        return _background is not None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="KRAG: API HTTP assíncrona")
+    parser.add_argument("--host", default=Config.API_HOST)
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    parser.add_argument("--workers", type=int, help="consultas em paralelo (padrão: API_WORKERS)")
+    parser.add_argument("--queue", type=int, help="consultas aguardando antes de responder 503 (padrão: API_QUEUE_SIZE)")
+    parser.add_argument("--model", help="modelo LLM (padrão: DEFAULT_MODEL)")
+    parser.add_argument("--source", help="pasta do código-fonte (padrão: SOURCE_CODE_PATH)")
+    parser.add_argument("--index", action="store_true", help="atualiza o índice em background ao subir")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from rag_engine import KRAGEngine
+
+    engine = KRAGEngine()
+    if args.model:
+        engine.config.DEFAULT_MODEL = args.model
+    if args.source:
+        engine.config.SOURCE_CODE_PATH = args.source
+    engine.initialize()
+    if args.index:
+        engine.start_index_job()
+
+    app = create_app(engine, args.workers, args.queue)
+    web.run_app(app, host=args.host, port=args.port, print=lambda message: print(f"🌐 {message}"))
+
+
+if __name__ == "__main__":
+    main()
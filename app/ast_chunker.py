@@ -0,0 +1,301 @@
+import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    from tree_sitter import Language, Parser
+    TREE_SITTER_AVAILABLE = True
+except ImportError:
+    TREE_SITTER_AVAILABLE = False
+
+# extensão → (módulo da gramática, nome da linguagem)
+GRAMMARS = {
+    ".py": ("tree_sitter_python", "python"),
+    ".java": ("tree_sitter_java", "java"),
+    ".js": ("tree_sitter_javascript", "javascript"),
+    ".jsx": ("tree_sitter_javascript", "javascript"),
+}
+
+# tipo de nó → tipo de símbolo
+DEFINITION_KINDS = {
+    "python": {
+        "function_definition": "function",
+        "class_definition": "class",
+    },
+    "java": {
+        "class_declaration": "class",
+        "interface_declaration": "interface",
+        "enum_declaration": "enum",
+        "record_declaration": "class",
+        "method_declaration": "method",
+        "constructor_declaration": "constructor",
+    },
+    "javascript": {
+        "function_declaration": "function",
+        "generator_function_declaration": "function",
+        "class_declaration": "class",
+        "method_definition": "method",
+    },
+}
+
+CONTAINER_KINDS = {"class", "interface", "enum"}
+COMMENT_TYPES = {"comment", "line_comment", "block_comment"}
+FUNCTION_VALUE_TYPES = {"arrow_function", "function_expression", "function", "generator_function"}
+
+_parsers: Dict[str, "Parser"] = {}
+
+
+def is_supported(source: str) -> bool:
+    """Indica se o arquivo tem gramática tree-sitter disponível"""
+    if not TREE_SITTER_AVAILABLE:
+        return False
+    ext = os.path.splitext(source)[1].lower()
+    return ext in GRAMMARS and _get_parser(ext) is not None
+
+
+def get_parser(source: str) -> tuple:
+    """(parser, linguagem) para o arquivo, ou (None, None) sem gramática disponível"""
+    ext = os.path.splitext(source)[1].lower()
+    if not TREE_SITTER_AVAILABLE or ext not in GRAMMARS:
+        return None, None
+    parser = _get_parser(ext)
+    return (parser, GRAMMARS[ext][1]) if parser else (None, None)
+
+
+def describe_definition(node, language: str):
+    """Retorna (nó da definição, nome, tipo) ou None; desembrulha decorators/export/const f = () =>"""
+    if node.type == "decorated_definition":
+        inner = node.child_by_field_name("definition")
+        return describe_definition(inner, language) if inner else None
+
+    if node.type == "export_statement":
+        inner = node.child_by_field_name("declaration")
+        return describe_definition(inner, language) if inner else None
+
+    if node.type in ("lexical_declaration", "variable_declaration"):
+        declarators = [child for child in node.named_children if child.type == "variable_declarator"]
+        if len(declarators) == 1:
+            value = declarators[0].child_by_field_name("value")
+            name = declarators[0].child_by_field_name("name")
+            if value is not None and name is not None and value.type in FUNCTION_VALUE_TYPES:
+                return node, name.text.decode("utf-8", errors="replace"), "function"
+        return None
+
+    kind = DEFINITION_KINDS[language].get(node.type)
+    if not kind:
+        return None
+
+    name = node.child_by_field_name("name")
+    return node, name.text.decode("utf-8", errors="replace") if name else "", kind
+
+
+def _get_parser(ext: str) -> Optional["Parser"]:
+    if ext in _parsers:
+        return _parsers[ext]
+
+    module_name, _ = GRAMMARS[ext]
+    try:
+        module = importlib.import_module(module_name)
+        parser = Parser(Language(module.language()))
+    except Exception as e:
+        print(f"⚠️ Gramática {module_name} indisponível: {e}")
+        parser = None
+
+    _parsers[ext] = parser
+    return parser
+
+
+class _FileChunker:
+    """Percorre a árvore de um arquivo e gera chunks alinhados a funções/classes"""
+
+    def __init__(self, data: bytes, language: str, max_chars: int):
+        self.data = data
+        self.language = language
+        self.max_chars = max_chars
+        self.chunks: List[dict] = []
+
+    def _size(self, start: int, end: int) -> int:
+        return len(self.data[start:end].decode("utf-8", errors="replace"))
+
+    def _line(self, offset: int) -> int:
+        return self.data.count(b"\n", 0, offset) + 1
+
+    def _emit(self, start: int, end: int, symbol: str = "", kind: str = "code"):
+        raw = self.data[start:end]
+        stripped = raw.strip()
+        text = stripped.decode("utf-8", errors="replace")
+        # Sobras só de pontuação (ex.: "}" final de classe) não viram chunk
+        if not any(char.isalnum() for char in text):
+            return
+        first = start + (len(raw) - len(raw.lstrip()))
+        chunk = {
+            "content": text,
+            "kind": kind,
+            "start_line": self._line(first),
+            "end_line": self._line(first + len(stripped) - 1),
+        }
+        if symbol:
+            chunk["symbol"] = symbol
+        self.chunks.append(chunk)
+
+    def _definition(self, node):
+        return describe_definition(node, self.language)
+
+    def _nested_definitions(self, node) -> list:
+        body = node.child_by_field_name("body")
+        if body is None:
+            return []
+        return [child for child in body.named_children if self._definition(child)]
+
+    def _split_range(self, node, start: int, end: int, symbol: str, kind: str):
+        """Divide um nó grande agrupando filhos consecutivos; filhos grandes são divididos recursivamente"""
+        if self._size(start, end) <= self.max_chars:
+            self._emit(start, end, symbol, kind)
+            return
+
+        children = [child for child in node.children if child.end_byte > start and child.start_byte < end]
+        if not children:
+            self._split_lines(start, end, symbol, kind)
+            return
+
+        group_start = start
+        for child in children:
+            child_end = min(child.end_byte, end)
+            if self._size(group_start, child_end) <= self.max_chars:
+                continue
+
+            if self._size(child.start_byte, child_end) > self.max_chars:
+                # O trecho acumulado (ex.: assinatura) segue junto com o início do filho
+                self._split_range(child, group_start, child_end, symbol, kind)
+                group_start = child_end
+            else:
+                if group_start < child.start_byte:
+                    self._emit(group_start, child.start_byte, symbol, kind)
+                group_start = max(child.start_byte, start)
+
+        if group_start < end:
+            self._emit(group_start, end, symbol, kind)
+
+    def _split_lines(self, start: int, end: int, symbol: str, kind: str):
+        """Último recurso (ex.: string gigante): agrupa linhas inteiras"""
+        piece_start = start
+        offset = start
+        while offset < end:
+            newline = self.data.find(b"\n", offset, end)
+            line_end = end if newline == -1 else newline + 1
+            if piece_start < offset and self._size(piece_start, line_end) > self.max_chars:
+                self._emit(piece_start, offset, symbol, kind)
+                piece_start = offset
+            offset = line_end
+        self._emit(piece_start, end, symbol, kind)
+
+    def collect(self, nodes: list, scope: str = "", start: Optional[int] = None, end: Optional[int] = None,
+                lead_kind: str = "code"):
+        """Emite definições inteiras; o código entre elas vira chunks agrupados até o limite
+
+        `lead_kind` marca o primeiro trecho (ex.: cabeçalho e atributos de uma classe dividida).
+        """
+        pending_start = start if start is not None else (nodes[0].start_byte if nodes else 0)
+        region_end = end if end is not None else (nodes[-1].end_byte if nodes else 0)
+        region_start = pending_start
+        comments_start = None
+
+        def filler_kind():
+            return lead_kind if pending_start == region_start else "code"
+
+        for node in nodes:
+            if node.type in COMMENT_TYPES:
+                # Comentários colados na definição seguinte (docs/javadoc) vão junto com ela
+                if comments_start is None:
+                    comments_start = node.start_byte
+                continue
+
+            found = self._definition(node)
+            if not found:
+                comments_start = None
+                if self._size(pending_start, node.end_byte) > self.max_chars and pending_start < node.start_byte:
+                    self._emit(pending_start, node.start_byte, scope, filler_kind())
+                    pending_start = node.start_byte
+                if self._size(pending_start, node.end_byte) > self.max_chars:
+                    self._split_range(node, pending_start, node.end_byte, scope, filler_kind())
+                    pending_start = node.end_byte
+                continue
+
+            definition, name, kind = found
+            if kind == "function" and scope:
+                kind = "method"
+            symbol = f"{scope}.{name}" if scope and name else (name or scope)
+
+            definition_start = comments_start if comments_start is not None else node.start_byte
+            comments_start = None
+
+            if pending_start < definition_start:
+                self._emit(pending_start, definition_start, scope, filler_kind())
+
+            self._emit_definition(node, definition, definition_start, symbol, kind)
+            pending_start = node.end_byte
+
+        if pending_start < region_end:
+            self._emit(pending_start, region_end, scope, filler_kind())
+
+    def _emit_definition(self, node, definition, start: int, symbol: str, kind: str):
+        end = node.end_byte
+        if self._size(start, end) <= self.max_chars:
+            self._emit(start, end, symbol, kind)
+            return
+
+        nested = self._nested_definitions(definition) if kind in CONTAINER_KINDS else []
+        if nested:
+            # Classe grande: cabeçalho/atributos num chunk e cada método no seu
+            members = definition.child_by_field_name("body").named_children
+            self.collect(members, scope=symbol, start=start, end=end, lead_kind=kind)
+            return
+
+        self._split_range(node, start, end, symbol, kind)
+
+
+def chunk_source(source: str, text: str, max_chars: int) -> Optional[List[dict]]:
+    """Fragmenta um arquivo pela AST; None se a linguagem não é suportada ou o parse falhou"""
+    parser, language = get_parser(source)
+    if parser is None:
+        return None
+
+    try:
+        data = text.encode("utf-8", errors="surrogatepass")
+        tree = parser.parse(data)
+        root = tree.root_node
+        # Muitos erros de sintaxe: o corte por caracteres é mais previsível
+        if root.has_error and sum(1 for child in root.children if child.type == "ERROR") > 3:
+            return None
+
+        chunker = _FileChunker(data, language, max_chars)
+        chunker.collect(root.children, start=0, end=len(data))
+        return chunker.chunks
+    except Exception as e:
+        print(f"⚠️ Erro no parse de {source}: {e}")
+        return None
+
+
+def _chunk_job(args: tuple) -> tuple:
+    source, text, max_chars = args
+    return source, chunk_source(source, text, max_chars)
+
+
+def run_parallel(function, jobs: list, max_workers: int = 4, parallel_threshold: int = 8) -> list:
+    """Executa `function` (nível de módulo, picklável) em processos; poucos jobs rodam aqui mesmo"""
+    if max_workers <= 1 or len(jobs) < parallel_threshold:
+        return [function(job) for job in jobs]
+
+    try:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+            return list(executor.map(function, jobs, chunksize=max(1, len(jobs) // (max_workers * 4))))
+    except Exception as e:
+        print(f"⚠️ Parse paralelo indisponível ({e}), seguindo sequencial")
+        return [function(job) for job in jobs]
+
+
+def chunk_sources(files: Dict[str, str], max_chars: int, max_workers: int = 4) -> Dict[str, Optional[List[dict]]]:
+    """Fragmenta vários arquivos em paralelo"""
+    jobs = [(source, text, max_chars) for source, text in files.items()]
+    return dict(run_parallel(_chunk_job, jobs, max_workers=max_workers))
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from typing import Dict
+
+from watchdog.events import FileSystemEventHandler
+
+from source_walker import has_ignored_dir
+
+
+class AutoReindexer:
+    """Fila de eventos do watchdog com debounce/coalescência e worker de reindexação"""
+
+    def __init__(self, rag_engine, root: str, debounce: float = 2.0, max_delay: float = 30.0,
+                 full_scan_threshold: int = 1000):
+        self.rag_engine = rag_engine
+        self.root = os.path.abspath(root)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.full_scan_threshold = full_scan_threshold
+
+        self._pending: Dict[str, float] = {}
+        self._first_event = None
+        self._last_event = None
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._worker = None
+
+    def start(self):
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name="krag-auto-reindex", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._worker:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def notify(self, path: str):
+        """Registra um caminho alterado; chamado pela thread do observer, nunca bloqueia em I/O"""
+        absolute = os.path.abspath(path)
+        if absolute != self.root and has_ignored_dir(os.path.relpath(absolute, self.root)):
+            return
+
+        now = time.time()
+        with self._condition:
+            self._pending[absolute] = now
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+            self._condition.notify_all()
+
+    def pending_count(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def _take_batch(self):
+        """Espera o período de silêncio (ou o atraso máximo) e devolve os caminhos coalescidos"""
+        with self._condition:
+            while not self._stopped:
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+
+                now = time.time()
+                quiet_until = self._last_event + self.debounce
+                deadline = self._first_event + self.max_delay
+                if now >= quiet_until or now >= deadline:
+                    batch = list(self._pending)
+                    self._pending = {}
+                    self._first_event = None
+                    self._last_event = None
+                    return batch
+
+                self._condition.wait(timeout=min(quiet_until, deadline) - now)
+
+            return None
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+
+            try:
+                if len(batch) > self.full_scan_threshold:
+                    # Ex.: git checkout: uma varredura incremental completa sai mais barata
+                    print(f"📝 {len(batch)} mudanças, varredura incremental completa")
+                    self.rag_engine.index_documents(force_reindex=True)
+                else:
+                    print(f"📝 {len(batch)} mudanças detectadas")
+                    self.rag_engine.index_files(batch)
+                print("Reindexação automática OK!")
+            except Exception as e:
+                print(f"Erro auto-reindex: {e}")
+
+
+class ChangeHandler(FileSystemEventHandler):
+    """Repassa criações, alterações, movimentações e remoções para o AutoReindexer"""
+
+    def __init__(self, reindexer: AutoReindexer):
+        self.reindexer = reindexer
+
+    def on_created(self, event):
+        self.reindexer.notify(event.src_path)
+
+    def on_modified(self, event):
+        # Modificação de pasta só reflete entradas já notificadas individualmente
+        if not event.is_directory:
+            self.reindexer.notify(event.src_path)
+
+    def on_deleted(self, event):
+        self.reindexer.notify(event.src_path)
+
+    def on_moved(self, event):
+        self.reindexer.notify(event.src_path)
+        self.reindexer.notify(event.dest_path)
@@ -0,0 +1,101 @@
+"""Consultas em lote, sem a interface: lê perguntas em JSONL e grava as respostas em JSONL
+
+Cada linha de entrada é {"question": "...", "id": ..., "filters": {...}} (só "question" é obrigatório)
+ou apenas a pergunta entre aspas. Exemplo:
+
+    python app/batch_cli.py perguntas.jsonl -o respostas.jsonl --index
+"""
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import List
+
+
+def read_questions(path: str) -> List[dict]:
+    """Carrega o JSONL de perguntas ('-' lê da entrada padrão)"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    questions = []
+    try:
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Linha {number}: JSON inválido ({e})")
+
+            if isinstance(item, str):
+                item = {"question": item}
+            if not isinstance(item, dict) or "question" not in item:
+                raise ValueError(f"Linha {number}: esperado objeto com \"question\"")
+            item.setdefault("id", number)
+            questions.append(item)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return questions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="KRAG: perguntas em lote (JSONL → JSONL)")
+    parser.add_argument("input", help="arquivo JSONL com as perguntas ('-' para stdin)")
+    parser.add_argument("-o", "--output", default="-", help="arquivo JSONL de saída (padrão: stdout)")
+    parser.add_argument("--model", help="modelo LLM (padrão: DEFAULT_MODEL)")
+    parser.add_argument("--source", help="pasta do código-fonte (padrão: SOURCE_CODE_PATH)")
+    parser.add_argument("--index", action="store_true", help="atualiza o índice antes de perguntar")
+    parser.add_argument("--workers", type=int, help="buscas em paralelo (padrão: BATCH_WORKERS)")
+    parser.add_argument("--generations", type=int,
+                        help="gerações simultâneas no Ollama (padrão: BATCH_MAX_GENERATIONS)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    try:
+        questions = read_questions(args.input)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    to_file = args.output != "-"
+    output = open(args.output, "w", encoding="utf-8") if to_file else sys.stdout
+    errors = 0
+    started = time.time()
+
+    # Os logs do motor vão para stderr para não misturar com o JSONL
+    with redirect_stdout(sys.stderr):
+        from rag_engine import KRAGEngine
+
+        engine = KRAGEngine()
+        if args.model:
+            engine.config.DEFAULT_MODEL = args.model
+        if args.source:
+            engine.config.SOURCE_CODE_PATH = args.source
+        engine.initialize()
+
+        if args.index:
+            engine.index_documents(force_reindex=True)
+
+        try:
+            for done, result in enumerate(engine.query_batch(questions, args.workers, args.generations), start=1):
+                if result.get("error"):
+                    errors += 1
+                output.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                output.flush()
+                print(f"✅ {done}/{len(questions)} ({result.get('response_time', 0)}s) {result['id']}")
+        finally:
+            if to_file:
+                output.close()
+
+    elapsed = time.time() - started
+    rate = len(questions) / elapsed if elapsed else 0
+    print(f"🏁 {len(questions)} perguntas em {elapsed:.1f}s ({rate:.2f}/s), {errors} com erro", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+"""Benchmark reproduzível: gera um repositório sintético, indexa e mede a latência das consultas
+
+    python app/benchmark.py --files 500 --queries 50 -o resultados/base.json
+    python app/benchmark.py --files 500 --chunk-size 1200 --compare resultados/base.json
+
+Usa o Ollama de OLLAMA_BASE_URL, ou um Ollama falso embutido com --fake-ollama PERFIL (mede só o
+custo do próprio KRAG); o índice fica numa pasta temporária (ou --workdir).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+
+DEFAULT_MIX = "python=40,java=25,javascript=20,sql=5,markdown=10"
+
+EXTENSIONS = {"python": "py", "java": "java", "javascript": "js", "sql": "sql", "markdown": "md"}
+
+NOUNS = ["pedido", "cliente", "fatura", "estoque", "produto", "usuario", "pagamento", "entrega",
+         "relatorio", "cadastro", "desconto", "imposto", "contrato", "agenda", "conta"]
+VERBS = ["calcular", "validar", "buscar", "salvar", "gerar", "processar", "atualizar", "enviar",
+         "listar", "remover", "importar", "exportar"]
+
+
+def _name(rng: random.Random, camel: bool = False) -> str:
+    verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+    return f"{verb}{noun.capitalize()}" if camel else f"{verb}_{noun}"
+
+
+def _python_file(rng, module, functions, callees):
+    lines = [f'"""Módulo {module}"""', "import os", ""]
+    for function in functions:
+        callee = rng.choice(callees)
+        lines += [f"def {function}(dados, limite=10):",
+                  f'    """{function.replace("_", " ").capitalize()} com regras de {module}"""',
+                  "    total = 0",
+                  "    for item in dados[:limite]:",
+                  f"        total += {callee}(item) if item else 0",
+                  "    return total", "", ""]
+    lines += [f"class {module.capitalize()}Servico:",
+              "    def executar(self, dados):",
+              f"        return {functions[0]}(dados)", ""]
+    return "\n".join(lines)
+
+
+def _java_file(rng, module, functions, callees):
+    name = module.capitalize()
+    lines = [f"package br.com.legado.{module};", "", f"public class {name} {{", ""]
+    for function in functions:
+        callee = rng.choice(callees)
+        lines += [f"    public int {function}(List<Item> itens) {{",
+                  "        int total = 0;",
+                  "        for (Item item : itens) {",
+                  f"            total += {callee}(item);",
+                  "        }",
+                  "        return total;",
+                  "    }", ""]
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def _javascript_file(rng, module, functions, callees):
+    lines = [f"// Módulo {module}", ""]
+    for function in functions:
+        callee = rng.choice(callees)
+        lines += [f"function {function}(itens, limite = 10) {{",
+                  f"  return itens.slice(0, limite).map((item) => {callee}(item));",
+                  "}", ""]
+    lines.append(f"module.exports = {{ {', '.join(functions)} }};")
+    return "\n".join(lines)
+
+
+def _sql_file(rng, module, functions, callees):
+    lines = [f"CREATE TABLE {module} (id INT PRIMARY KEY, valor DECIMAL(10,2), status VARCHAR(20));", ""]
+    for function in functions:
+        lines += [f"CREATE PROCEDURE {function}()",
+                  "BEGIN",
+                  f"  UPDATE {module} SET status = 'ok' WHERE valor > {rng.randint(1, 999)};",
+                  "END;", ""]
+    return "\n".join(lines)
+
+
+def _markdown_file(rng, module, functions, callees):
+    lines = [f"# {module.capitalize()}", "", f"Documentação do módulo de {module}.", ""]
+    for function in functions:
+        lines += [f"## {function}", "",
+                  f"Responsável por {function.replace('_', ' ')}. Chama {rng.choice(callees)} "
+                  f"para cada item e respeita o limite configurado.", ""]
+    return "\n".join(lines)
+
+
+WRITERS = {"python": _python_file, "java": _java_file, "javascript": _javascript_file,
+           "sql": _sql_file, "markdown": _markdown_file}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        language, _, weight = part.partition("=")
+        language = language.strip().lower()
+        if language not in WRITERS:
+            raise ValueError(f"Linguagem desconhecida: {language} (use {', '.join(WRITERS)})")
+        mix[language] = float(weight or 1)
+    return mix
+
+
+def generate_repository(root: str, files: int, mix: Dict[str, float], functions_per_file: int = 8,
+                        seed: int = 42) -> dict:
+    """Cria `files` arquivos com a proporção de linguagens de `mix`; mesma semente → mesmo repositório"""
+    rng = random.Random(seed)
+    languages = list(mix)
+    weights = [mix[language] for language in languages]
+    symbols: List[str] = []
+    counts: Dict[str, int] = {}
+    total_bytes = 0
+
+    for index in range(files):
+        language = rng.choices(languages, weights)[0]
+        module = f"{rng.choice(NOUNS)}{index}"
+        camel = language in ("java", "javascript")
+        functions = [f"{_name(rng, camel)}{index}_{n}" for n in range(functions_per_file)]
+        callees = (symbols[-50:] if symbols else []) + ["len" if not camel else "valor"]
+
+        folder = "docs" if language == "markdown" else os.path.join("src", language, f"pkg{index % 20}")
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        path = os.path.join(root, folder, f"{module}.{EXTENSIONS[language]}")
+        content = WRITERS[language](rng, module, functions, callees)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+        if language != "markdown":
+            symbols.extend(functions)
+        counts[language] = counts.get(language, 0) + 1
+        total_bytes += len(content.encode("utf-8"))
+
+    return {"files": files, "bytes": total_bytes, "languages": counts, "symbols": symbols, "seed": seed}
+
+
+def make_questions(symbols: List[str], count: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    templates = ["O que faz {}?", "Como {} calcula o total?", "Quais regras existem em {}?",
+                 "Explique o fluxo de {}", "Onde está {}?", "Quem chama {}?"]
+    return [rng.choice(templates).format(rng.choice(symbols)) for _ in range(count)]
+
+
+def summarize(values: List[float]) -> dict:
+    """p50/p95/p99 (interpolação linear), média, mínimo e máximo em segundos"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def percentile(p):
+        position = (len(ordered) - 1) * p
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 4),
+        "min": round(ordered[0], 4),
+        "p50": round(percentile(0.50), 4),
+        "p95": round(percentile(0.95), 4),
+        "p99": round(percentile(0.99), 4),
+        "max": round(ordered[-1], 4)
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def _rate(amount: float, seconds: float) -> float:
+    return round(amount / seconds, 2) if seconds else 0.0
+
+
+def run_benchmark(args) -> dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="krag-bench-")
+    repository_path = os.path.join(workdir, "repo")
+    if os.path.exists(repository_path):
+        shutil.rmtree(repository_path)
+    shutil.rmtree(os.path.join(workdir, "chroma_db"), ignore_errors=True)
+
+    # Config lê o ambiente na importação: o índice vai para a pasta do benchmark
+    os.environ["CHROMA_DB_PATH"] = os.path.join(workdir, "chroma_db")
+    if args.model:
+        os.environ["DEFAULT_MODEL"] = args.model
+
+    from config import Config
+    from rag_engine import KRAGEngine
+
+    fake_server = None
+    if args.fake_ollama:
+        from fake_ollama import FakeOllamaServer
+        fake_server = FakeOllamaServer(profile=args.fake_ollama, models=[Config.DEFAULT_MODEL, Config.EMBEDDING_MODEL])
+        Config.OLLAMA_BASE_URL = fake_server.start()
+        print(f"🦙 Ollama falso ({args.fake_ollama}) em {fake_server.url}")
+
+    repository = generate_repository(repository_path, args.files, parse_mix(args.mix),
+                                     args.functions_per_file, args.seed)
+    print(f"🏗️ Repositório sintético: {repository['files']} arquivos, {repository['bytes'] / 1024:.0f}KB")
+
+    engine = KRAGEngine()
+    engine.config.SOURCE_CODE_PATH = os.path.join(repository_path, "src")
+    engine.config.DOCS_PATH = os.path.join(repository_path, "docs")
+    # Respostas repetidas viriam do cache e mascarariam a latência
+    engine.config.ANSWER_CACHE_ENABLED = False
+    if args.chunk_size:
+        overlap = args.chunk_overlap if args.chunk_overlap is not None else args.chunk_size // 5
+        engine._get_chunk_config = lambda: {"size": args.chunk_size, "overlap": overlap}
+    engine.initialize()
+
+    documents, load_time = _timed(engine.load_documents)
+    chunks, process_time = _timed(engine.process_documents, documents)
+    _, index_time = _timed(engine.index_documents, force_reindex=True)
+    _, noop_time = _timed(engine.index_documents, force_reindex=True)
+    indexed_chunks = engine.vectorstore._collection.count()
+
+    indexing = {
+        "load_documents": {"seconds": round(load_time, 3), "files_per_s": _rate(len(documents), load_time),
+                           "mb_per_s": _rate(repository["bytes"] / 1024 ** 2, load_time)},
+        "process_documents": {"seconds": round(process_time, 3), "chunks": len(chunks),
+                              "chunks_per_s": _rate(len(chunks), process_time)},
+        "index_documents": {"seconds": round(index_time, 3), "chunks": indexed_chunks,
+                            "chunks_per_s": _rate(indexed_chunks, index_time),
+                            "files_per_s": _rate(repository["files"], index_time)},
+        "reindex_unchanged": {"seconds": round(noop_time, 3)}
+    }
+
+    questions = make_questions(repository["symbols"], args.warmup + args.queries, args.seed)
+    totals: List[float] = []
+    first_tokens: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors = 0
+
+    for position, question in enumerate(questions):
+        if args.retrieval_only:
+            started = time.perf_counter()
+            filters, inferred = engine._resolve_filters(question, None)
+            candidates, timings, _ = engine._select_documents(question, filters, inferred)
+            packing_started = time.perf_counter()
+            engine._build_prompt(question, candidates)
+            timings["packing"] = time.perf_counter() - packing_started
+            result = {"timings": timings}
+            elapsed = time.perf_counter() - started
+        else:
+            started = time.perf_counter()
+            result = engine.query_stream(question)
+            for _ in result.get("tokens", ()):
+                pass
+            elapsed = time.perf_counter() - started
+            if result.get("answer", "").startswith("Erro:") or "\n\nErro:" in result.get("answer", ""):
+                errors += 1
+
+        if position < args.warmup:
+            continue
+        totals.append(elapsed)
+        if result.get("first_token_time") is not None:
+            first_tokens.append(result["first_token_time"])
+        for stage, seconds in result.get("timings", {}).items():
+            stages.setdefault(stage, []).append(seconds)
+        if result.get("symbol_lookup"):
+            stages.setdefault("symbol_answer", []).append(elapsed)
+
+    query = {
+        "mode": "retrieval" if args.retrieval_only else "full",
+        "queries": args.queries,
+        "errors": errors,
+        "total": summarize(totals),
+        "stages": {stage: summarize(values) for stage, values in sorted(stages.items())}
+    }
+    if first_tokens:
+        query["first_token"] = summarize(first_tokens)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": engine.get_current_model(),
+            "embedding_model": engine.config.EMBEDDING_MODEL,
+            "chunking": engine._get_chunk_config(),
+            "ast_chunking": engine._use_ast_chunking(),
+            "hybrid_search": engine.config.HYBRID_SEARCH,
+            "rerank": engine.config.RERANK_MODE if engine.config.RERANK_ENABLED else "off",
+            "embed_concurrency": engine.config.EMBED_CONCURRENCY,
+            "ollama": f"fake:{args.fake_ollama}" if fake_server else engine.config.OLLAMA_BASE_URL
+        },
+        "repository": {key: value for key, value in repository.items() if key != "symbols"},
+        "indexing": indexing,
+        "query": query
+    }
+
+    engine.shutdown()
+    if fake_server:
+        fake_server.stop()
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """Variação percentual das métricas principais em relação a uma execução anterior"""
+    metrics = [
+        ("load files/s", ("indexing", "load_documents", "files_per_s")),
+        ("process chunks/s", ("indexing", "process_documents", "chunks_per_s")),
+        ("index chunks/s", ("indexing", "index_documents", "chunks_per_s")),
+        ("query p50 (s)", ("query", "total", "p50")),
+        ("query p95 (s)", ("query", "total", "p95")),
+        ("query p99 (s)", ("query", "total", "p99")),
+    ]
+    lines = []
+    for label, path in metrics:
+        values = []
+        for data in (baseline, current):
+            for key in path:
+                data = data.get(key, {}) if isinstance(data, dict) else {}
+            values.append(data if isinstance(data, (int, float)) else None)
+        before, after = values
+        if before and after is not None:
+            lines.append(f"{label:18} {before:>10} → {after:>10} ({(after - before) / before * 100:+.1f}%)")
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="KRAG: benchmark de indexação e consultas")
+    parser.add_argument("--files", type=int, default=200, help="arquivos no repositório sintético")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"proporção de linguagens (padrão: {DEFAULT_MIX})")
+    parser.add_argument("--functions-per-file", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=30, help="consultas medidas")
+    parser.add_argument("--warmup", type=int, default=3, help="consultas descartadas antes da medição")
+    parser.add_argument("--retrieval-only", action="store_true", help="mede só busca + montagem do contexto")
+    parser.add_argument("--model", help="modelo LLM (padrão: DEFAULT_MODEL)")
+    parser.add_argument("--chunk-size", type=int, help="sobrescreve a tabela de chunk do modelo")
+    parser.add_argument("--chunk-overlap", type=int)
+    parser.add_argument("--fake-ollama", choices=["instant", "gpu", "cpu"],
+                        help="sobe um Ollama falso com esse perfil de latência")
+    parser.add_argument("--workdir", help="pasta para repositório e índice (mantida ao fim)")
+    parser.add_argument("--keep", action="store_true", help="não apaga a pasta temporária")
+    parser.add_argument("-o", "--output", help="grava o resultado em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    with redirect_stdout(sys.stderr):
+        results = run_benchmark(args)
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"💾 Resultado em {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n📊 Comparação com {args.compare} ({baseline.get('meta', {}).get('commit')})", file=sys.stderr)
+        for line in compare(results, baseline):
+            print(f"   {line}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
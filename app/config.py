@@ -9,14 +9,119 @@ class Config:
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "devstral:24b")
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+    # Tempo (s) que a lista de modelos/metadados do Ollama fica em cache
+    OLLAMA_CACHE_TTL = float(os.getenv("OLLAMA_CACHE_TTL", "10"))
+    # Intervalo (s) da verificação de saúde em background (Chroma + Ollama)
+    HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "60"))
+
+    # Escalonador das chamadas ao Ollama (prioridade: embedding da pergunta > geração > indexação)
+    # Limite = chamadas simultâneas; fila = pedidos aguardando antes de recusar; prazo = espera máx. (s); 0 = sem limite
+    OLLAMA_MAX_PARALLEL = int(os.getenv("OLLAMA_MAX_PARALLEL", "4"))
+    SCHEDULER_QUERY_EMBEDDING_LIMIT = int(os.getenv("SCHEDULER_QUERY_EMBEDDING_LIMIT", "2"))
+    SCHEDULER_QUERY_EMBEDDING_QUEUE = int(os.getenv("SCHEDULER_QUERY_EMBEDDING_QUEUE", "64"))
+    SCHEDULER_QUERY_EMBEDDING_DEADLINE = float(os.getenv("SCHEDULER_QUERY_EMBEDDING_DEADLINE", "30"))
+    SCHEDULER_GENERATION_LIMIT = int(os.getenv("SCHEDULER_GENERATION_LIMIT", "2"))
+    SCHEDULER_GENERATION_QUEUE = int(os.getenv("SCHEDULER_GENERATION_QUEUE", "32"))
+    SCHEDULER_GENERATION_DEADLINE = float(os.getenv("SCHEDULER_GENERATION_DEADLINE", "300"))
+    # Indexação nunca é recusada, só espera, e fica com no máximo OLLAMA_MAX_PARALLEL - 1 vagas (a que
+    # sobra é das perguntas); abaixo de EMBED_CONCURRENCY, os lotes do pipeline esperam a vez
+    SCHEDULER_INDEX_EMBEDDING_LIMIT = int(os.getenv("SCHEDULER_INDEX_EMBEDDING_LIMIT",
+                                                    str(max(1, OLLAMA_MAX_PARALLEL - 1))))
+
+    # Consultas em lote (batch_cli.py / query_batch)
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+    BATCH_MAX_GENERATIONS = int(os.getenv("BATCH_MAX_GENERATIONS", "2"))
+
+    # Métricas do sistema (amostragem em background)
+    SYSTEM_MONITOR_INTERVAL = float(os.getenv("SYSTEM_MONITOR_INTERVAL", "2"))
+    SYSTEM_MONITOR_HISTORY = int(os.getenv("SYSTEM_MONITOR_HISTORY", "150"))
+
+    # Pool de modelos (LLM pronto por modelo + pré-carregamento no Ollama)
+    MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "3"))
+    MODEL_KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m")
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "True").lower() == "true"
 
     # ChromaDB
     CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
 
+    # Cache de embeddings
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CHROMA_DB_PATH, "embedding_cache.sqlite"))
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+    # Traces por consulta (tempo por etapa + tokens do Ollama) em JSONL
+    QUERY_TRACE_ENABLED = os.getenv("QUERY_TRACE_ENABLED", "True").lower() == "true"
+    QUERY_TRACE_PATH = os.getenv("QUERY_TRACE_PATH", os.path.join(CHROMA_DB_PATH, "query_traces.jsonl"))
+    QUERY_TRACE_MAX_MB = int(os.getenv("QUERY_TRACE_MAX_MB", "20"))
+
+    # API HTTP (api_server.py; com API_ENABLED também sobe junto da interface)
+    API_ENABLED = os.getenv("API_ENABLED", "False").lower() == "true"
+    API_HOST = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    API_WORKERS = int(os.getenv("API_WORKERS", "8"))
+    API_QUEUE_SIZE = int(os.getenv("API_QUEUE_SIZE", "64"))
+    # Prazo padrão (s) de uma consulta esperando vaga no Ollama; o cliente pode mandar "deadline"
+    API_DEADLINE = float(os.getenv("API_DEADLINE", "60"))
+
+    # Métricas Prometheus (/metrics)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+    # Busca híbrida (BM25 + vetorial)
+    HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "True").lower() == "true"
+    HYBRID_FETCH_MULTIPLIER = int(os.getenv("HYBRID_FETCH_MULTIPLIER", "3"))
+    HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+    HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+
+    # Roteador de consultas: deduz filtros (tipo/linguagem/extensão) da pergunta
+    QUERY_ROUTER = os.getenv("QUERY_ROUTER", "True").lower() == "true"
+
+    # Índice de símbolos ("onde está X", "quem chama X" sem passar pelo LLM)
+    SYMBOL_LOOKUP = os.getenv("SYMBOL_LOOKUP", "True").lower() == "true"
+    SYMBOL_LOOKUP_EXPLAIN = os.getenv("SYMBOL_LOOKUP_EXPLAIN", "False").lower() == "true"
+    SYMBOL_LOOKUP_MAX_RESULTS = int(os.getenv("SYMBOL_LOOKUP_MAX_RESULTS", "30"))
+
+    # Reordenação pós-busca (deduplicação + MMR; RERANK_MODE: none, embedding ou llm)
+    RERANK_ENABLED = os.getenv("RERANK_ENABLED", "True").lower() == "true"
+    RERANK_MODE = os.getenv("RERANK_MODE", "none").lower()
+    RERANK_FETCH_MULTIPLIER = int(os.getenv("RERANK_FETCH_MULTIPLIER", "4"))
+    RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+    RERANK_DEDUPE_OVERLAP = float(os.getenv("RERANK_DEDUPE_OVERLAP", "0.5"))
+    RERANK_LLM_TOP = int(os.getenv("RERANK_LLM_TOP", "10"))
+
+    # Contexto do prompt: fração do num_ctx do modelo ocupada pelos trechos recuperados
+    CONTEXT_BUDGET_SHARE = float(os.getenv("CONTEXT_BUDGET_SHARE", "0.6"))
+    CONTEXT_CANDIDATE_MULTIPLIER = int(os.getenv("CONTEXT_CANDIDATE_MULTIPLIER", "2"))
+    CONTEXT_MIN_TRIM_TOKENS = int(os.getenv("CONTEXT_MIN_TRIM_TOKENS", "64"))
+
+    # Cache de respostas
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    # 0 desliga a busca semântica (ex.: 0.95 reaproveita perguntas quase idênticas)
+    ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
     # Processamento
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
     MAX_RESULTS = int(os.getenv("MAX_RESULTS", "5"))
+    LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", "16"))
+    # Chunks por função/classe (tree-sitter) para Python, Java e JavaScript
+    AST_CHUNKING = os.getenv("AST_CHUNKING", "True").lower() == "true"
+    CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "4"))
+
+    # Embeddings em lote (indexação)
+    EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+    EMBED_BATCH_MIN = int(os.getenv("EMBED_BATCH_MIN", "8"))
+    EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "256"))
+    EMBED_TARGET_LATENCY = float(os.getenv("EMBED_TARGET_LATENCY", "10"))
+
+    # Auto-reindexação (watchdog)
+    AUTO_REINDEX_DEBOUNCE = float(os.getenv("AUTO_REINDEX_DEBOUNCE", "2"))
+    AUTO_REINDEX_MAX_DELAY = float(os.getenv("AUTO_REINDEX_MAX_DELAY", "30"))
+    AUTO_REINDEX_FULL_SCAN_THRESHOLD = int(os.getenv("AUTO_REINDEX_FULL_SCAN_THRESHOLD", "1000"))
 
     # Paths
     SOURCE_CODE_PATH = "./data/source_code"
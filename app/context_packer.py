@@ -0,0 +1,304 @@
+import math
+import re
+from typing import Callable, List, Optional, Tuple
+
+from langchain.schema import Document
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens BPE para código/texto: palavras em pedaços de ~4 caracteres + pontuação"""
+    total = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        total += math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+    return total
+
+
+def _range(document: Document, start_key: str, end_key: str) -> Optional[Tuple[int, int]]:
+    start = document.metadata.get(start_key)
+    end = document.metadata.get(end_key)
+    if isinstance(start, int) and isinstance(end, int):
+        return start, end
+    return None
+
+
+def _char_range(document: Document) -> Optional[Tuple[int, int]]:
+    """Posição do chunk no arquivo em caracteres (fim exclusivo), gravada pelo splitter de caracteres"""
+    return _range(document, "start_char", "end_char")
+
+
+def _line_range(document: Document) -> Optional[Tuple[int, int]]:
+    return _range(document, "start_line", "end_line")
+
+
+def _slice(document: Document, start: int, end: int) -> Optional[Document]:
+    """Parte [start, end) (caracteres do arquivo) de um chunk com offsets, sem as bordas em branco"""
+    chunk_start, _ = _char_range(document)
+    text = document.page_content
+    begin, finish = max(0, start - chunk_start), max(0, end - chunk_start)
+    piece = text[begin:finish]
+    lead = len(piece) - len(piece.lstrip())
+    piece = piece.strip()
+    if not piece:
+        return None
+
+    metadata = dict(document.metadata)
+    metadata["start_char"] = chunk_start + begin + lead
+    metadata["end_char"] = metadata["start_char"] + len(piece)
+    if _line_range(document):
+        metadata["start_line"] = document.metadata["start_line"] + text.count("\n", 0, begin + lead)
+        metadata["end_line"] = metadata["start_line"] + piece.count("\n")
+    return Document(page_content=piece, metadata=metadata)
+
+
+def _slice_lines(document: Document, start: int, end: int) -> Optional[Document]:
+    """Linhas [start, end] (numeração do arquivo) de um chunk sem offsets de caracteres"""
+    first, last = _line_range(document)
+    start, end = max(start, first), min(end, last)
+    if start > end:
+        return None
+
+    lines = document.page_content.split("\n")[start - first:end - first + 1]
+    if not "".join(lines).strip():
+        return None
+    metadata = dict(document.metadata)
+    metadata["start_line"] = start
+    metadata["end_line"] = end
+    return Document(page_content="\n".join(lines), metadata=metadata)
+
+
+class _Span:
+    """Trecho contínuo de um arquivo no contexto (um ou mais chunks fundidos)
+
+    Com offsets de caracteres (splitter de caracteres, que corta no meio da linha e sobrepõe
+    chunks) a união é exata; só com faixa de linhas (AST, linhas inteiras e sem sobreposição)
+    funde apenas vizinhos que não se sobrepõem.
+    """
+
+    def __init__(self, document: Document, rank: int):
+        self.source = document.metadata.get("source", "")
+        self.start_line = document.metadata.get("start_line")
+        self.end_line = document.metadata.get("end_line")
+        self.start_char = document.metadata.get("start_char")
+        self.end_char = document.metadata.get("end_char")
+        self.lines = document.page_content.split("\n")
+        self.rank = rank
+        self.trimmed = False
+        self.documents = [document]
+
+    def has_lines(self) -> bool:
+        return isinstance(self.start_line, int) and isinstance(self.end_line, int)
+
+    def has_chars(self) -> bool:
+        return isinstance(self.start_char, int) and isinstance(self.end_char, int)
+
+    def _same_file(self, document: Document) -> bool:
+        return document.metadata.get("source", "") == self.source and self.has_lines() and \
+            _line_range(document) is not None
+
+    def overlaps(self, document: Document) -> bool:
+        """Conteúdo em comum com o chunk (repetiria texto se entrasse separado)"""
+        if not self._same_file(document):
+            return False
+        chars = _char_range(document)
+        if self.has_chars() and chars:
+            return chars[0] < self.end_char and chars[1] > self.start_char
+        start, end = _line_range(document)
+        return start <= self.end_line and end >= self.start_line
+
+    def touches(self, document: Document) -> bool:
+        """Pode ser fundido: sobreposto ou colado (com offsets) ou na linha vizinha sem sobrepor (só linhas)"""
+        if not self._same_file(document):
+            return False
+        chars = _char_range(document)
+        if self.has_chars() and chars:
+            # Um chunk do meio que não veio na busca pode estar na lacuna: só funde sem lacuna
+            return chars[0] <= self.end_char and chars[1] >= self.start_char
+        start, end = _line_range(document)
+        return start == self.end_line + 1 or end == self.start_line - 1
+
+    def merged_lines(self, document: Document) -> Tuple[List[str], dict]:
+        """Linhas da união com um chunk vizinho/sobreposto e a nova posição no arquivo"""
+        other = _Span(document, self.rank)
+        head, tail = (other, self) if (other.start_line, other.start_char or 0) < \
+            (self.start_line, self.start_char or 0) else (self, other)
+
+        if self.has_chars() and other.has_chars():
+            if tail.end_char <= head.end_char:
+                return head.lines, head.position()
+            text = head.text() + tail.text()[head.end_char - tail.start_char:]
+            position = dict(head.position(), end_line=head.start_line + text.count("\n"), end_char=tail.end_char)
+            return text.split("\n"), position
+
+        return head.lines + tail.lines, dict(head.position(), end_line=tail.end_line, start_char=None, end_char=None)
+
+    def position(self) -> dict:
+        return {"start_line": self.start_line, "end_line": self.end_line,
+                "start_char": self.start_char, "end_char": self.end_char}
+
+    def merge(self, document: Document):
+        self.lines, position = self.merged_lines(document)
+        self.start_line, self.end_line = position["start_line"], position["end_line"]
+        self.start_char, self.end_char = position["start_char"], position["end_char"]
+        self.documents.append(document)
+
+    def without_overlap(self, document: Document) -> Optional[Document]:
+        """O chunk sem a parte que este trecho já contém; None se não sobra nada novo"""
+        chars = _char_range(document)
+        if self.has_chars() and chars:
+            if chars[0] < self.start_char:
+                return _slice(document, chars[0], self.start_char) if chars[1] <= self.end_char else document
+            return _slice(document, self.end_char, chars[1])
+
+        start, end = _line_range(document)
+        if start < self.start_line:
+            return _slice_lines(document, start, self.start_line - 1) if end <= self.end_line else document
+        return _slice_lines(document, self.end_line + 1, end)
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def header(self) -> str:
+        if self.has_lines():
+            return f"# {self.source}:{self.start_line}-{self.end_line}"
+        return f"# {self.source}"
+
+    def to_document(self) -> Document:
+        metadata = dict(self.documents[0].metadata)
+        if self.has_lines():
+            metadata["start_line"] = self.start_line
+            metadata["end_line"] = self.end_line
+        if self.has_chars():
+            metadata["start_char"] = self.start_char
+            metadata["end_char"] = self.end_char
+        metadata["merged_chunks"] = len(self.documents)
+        if self.trimmed:
+            metadata["trimmed"] = True
+        return Document(page_content=self.text(), metadata=metadata)
+
+
+class ContextPacker:
+    """Preenche o contexto até um orçamento de tokens, na ordem de relevância
+
+    Chunks vizinhos/sobrepostos do mesmo arquivo são fundidos (sem repetir texto); o que não
+    pode ser fundido entra sem a parte já presente, e o primeiro chunk que não cabe inteiro é
+    cortado em fronteira de linha.
+    """
+
+    def __init__(self, budget_tokens: int, count_tokens: Callable[[str], int] = estimate_tokens,
+                 min_trim_tokens: int = 64):
+        self.budget_tokens = budget_tokens
+        self.count_tokens = count_tokens
+        self.min_trim_tokens = min_trim_tokens
+
+    def _span_cost(self, span: _Span) -> int:
+        return self.count_tokens(span.header()) + self.count_tokens(span.text()) + 2
+
+    def _trim(self, document: Document, rank: int, available: int) -> Optional[_Span]:
+        span = _Span(document, rank)
+        header_cost = self.count_tokens(span.header()) + 2
+        kept, used = [], header_cost
+
+        for line in span.lines:
+            cost = self.count_tokens(line) + 1
+            if used + cost > available:
+                break
+            kept.append(line)
+            used += cost
+
+        if not kept or used < self.min_trim_tokens:
+            return None
+
+        span.lines = kept
+        if span.has_lines():
+            span.end_line = span.start_line + len(kept) - 1
+        if span.has_chars():
+            span.end_char = span.start_char + len(span.text())
+        span.trimmed = True
+        return span
+
+    def _coalesce(self, spans: List[_Span], grown: _Span) -> int:
+        """Funde no trecho que cresceu os que ele passou a alcançar; devolve a variação de tokens"""
+        delta = 0
+        others = [span for span in spans if span is not grown and span.touches(grown.to_document())]
+        while others:
+            other = others.pop()
+            before = self._span_cost(grown) + self._span_cost(other)
+            grown.merge(other.to_document())
+            grown.documents[-1:] = other.documents
+            grown.rank = min(grown.rank, other.rank)
+            grown.trimmed = grown.trimmed or other.trimmed
+            spans.remove(other)
+            delta += self._span_cost(grown) - before
+            others = [span for span in spans if span is not grown and span.touches(grown.to_document())]
+        return delta
+
+    def pack(self, documents: List[Document]) -> Tuple[List[Document], dict]:
+        """Retorna (documentos do contexto, estatísticas)"""
+        spans: List[_Span] = []
+        used = 0
+        merged = 0
+        trimmed = 0
+        dropped = 0
+
+        for rank, document in enumerate(documents):
+            neighbour = next((span for span in spans if span.touches(document)), None)
+            if neighbour is not None:
+                before = self._span_cost(neighbour)
+                lines, _ = neighbour.merged_lines(document)
+                extra = self.count_tokens("\n".join(lines)) - self.count_tokens(neighbour.text())
+                if used + extra <= self.budget_tokens:
+                    neighbour.merge(document)
+                    used += self._span_cost(neighbour) - before
+                    used += self._coalesce(spans, neighbour)
+                    merged += 1
+                    continue
+
+            # Não coube fundido (ou não dá para fundir): entra só o que ainda não está no contexto
+            for span in spans:
+                if document is not None and span.overlaps(document):
+                    document = span.without_overlap(document)
+            if document is None:
+                merged += 1
+                continue
+
+            span = _Span(document, rank)
+            cost = self._span_cost(span)
+            if used + cost <= self.budget_tokens:
+                spans.append(span)
+                used += cost
+                continue
+
+            # Só o primeiro que não cabe é cortado; os seguintes ainda entram se couberem inteiros
+            remaining = self.budget_tokens - used
+            partial = None
+            if not trimmed and remaining >= self.min_trim_tokens:
+                partial = self._trim(document, rank, remaining)
+            if partial is not None:
+                spans.append(partial)
+                used += self._span_cost(partial)
+                trimmed += 1
+            else:
+                dropped += 1
+
+        spans.sort(key=lambda span: span.rank)
+        stats = {
+            "budget_tokens": self.budget_tokens,
+            "context_tokens": used,
+            "candidates": len(documents),
+            "chunks": len(spans),
+            "merged": merged,
+            "trimmed": trimmed,
+            "dropped": dropped
+        }
+        return [span.to_document() for span in spans], stats
+
+    @staticmethod
+    def render(documents: List[Document]) -> str:
+        """Texto do contexto, com a origem de cada trecho"""
+        parts = []
+        for document in documents:
+            span = _Span(document, 0)
+            parts.append(f"{span.header()}\n{document.page_content}")
+        return "\n\n".join(parts)
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+from langchain.embeddings.base import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings com cache persistente em SQLite, chaveado por (modelo, hash do texto)"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: str, max_entries: int = 200000):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _make_key(self, kind: str, text: str) -> str:
+        # Documentos e consultas recebem instruções diferentes no OllamaEmbeddings
+        digest = hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        return found
+
+    def _store(self, items: List[tuple]):
+        now = time.time()
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)",
+                [(key, self.model_name, array("f", vector).tobytes(), now) for key, vector in items]
+            )
+            self._entries += len(items)
+
+            if self._entries > self.max_entries:
+                self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = self._entries - int(self.max_entries * 0.9)
+                if excess > 0:
+                    # Remove os menos usados recentemente (LRU)
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                        (excess,)
+                    )
+                    self._entries -= excess
+
+            self._conn.commit()
+
+    def _embed_cached(self, kind: str, texts: List[str], embed_fn) -> List[List[float]]:
+        keys = [self._make_key(kind, text) for text in texts]
+        found = self._lookup(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = list(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_cached("doc", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_cached("query", [text], lambda items: [self.embeddings.embed_query(items[0])])[0]
+
+    def get_stats(self) -> dict:
+        """Contadores do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": self._entries,
+                "max_entries": self.max_entries
+            }
+
+    def clear(self, model_name: Optional[str] = None):
+        """Remove entradas (de um modelo ou todas)"""
+        with self._lock:
+            if model_name:
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model_name,))
+            else:
+                self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
@@ -0,0 +1,442 @@
+"""Servidor que imita a API do Ollama, para testes de carga e benchmarks sem GPU/rede
+
+Embeddings determinísticos (hash das palavras: textos parecidos → vetores parecidos), geração em
+streaming com latência simulada e gerenciamento de modelos em memória. Basta apontar
+OLLAMA_BASE_URL para ele:
+
+    python app/fake_ollama.py --port 11435 --profile cpu
+    OLLAMA_BASE_URL=http://localhost:11435 python app/benchmark.py --files 500
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_MODELS = ["gemma3:270m", "qwen3:0.6b", "gemma3:1b", "nomic-embed-text:latest"]
+
+# Latências em segundos; taxas em tokens/s. `parallel` imita OLLAMA_NUM_PARALLEL.
+PROFILES = {
+    "instant": {"embed_latency": 0.0, "embed_per_item": 0.0, "load_time": 0.0, "prompt_rate": 0,
+                "token_rate": 0, "parallel": 64, "jitter": 0.0},
+    "gpu": {"embed_latency": 0.005, "embed_per_item": 0.001, "load_time": 1.5, "prompt_rate": 2000,
+            "token_rate": 60, "parallel": 4, "jitter": 0.1},
+    "cpu": {"embed_latency": 0.02, "embed_per_item": 0.015, "load_time": 4.0, "prompt_rate": 150,
+            "token_rate": 12, "parallel": 1, "jitter": 0.15},
+}
+
+WORD_PATTERN = re.compile(r"\w+")
+KEEP_ALIVE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h)?$")
+KEEP_ALIVE_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+
+def count_tokens(text: str) -> int:
+    return len(WORD_PATTERN.findall(text)) + text.count("\n")
+
+
+def hashed_embedding(text: str, dimensions: int = 768) -> List[float]:
+    """Vetor normalizado a partir do hash de cada palavra (mesmo texto → mesmo vetor)"""
+    vector = [0.0] * dimensions
+    words = [word.lower() for word in WORD_PATTERN.findall(text)] or [text]
+    for word in words:
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def parse_keep_alive(value, default: float = 300.0) -> float:
+    """keep_alive do Ollama ("30m", "10s", 0, -1) em segundos; negativo = para sempre"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    text = str(value).strip()
+    if text.startswith("-"):
+        return float("inf")
+    match = KEEP_ALIVE_PATTERN.match(text)
+    return float(match.group(1)) * KEEP_ALIVE_UNITS[match.group(2)] if match else default
+
+
+class FakeOllama:
+    """Estado do servidor: modelos baixados/carregados, perfil de latência e contadores"""
+
+    def __init__(self, profile: str = "instant", models: Optional[List[str]] = None, dimensions: int = 768,
+                 answer_tokens: int = 40, seed: int = 0, **overrides):
+        self.settings = dict(PROFILES[profile], **{key: value for key, value in overrides.items()
+                                                   if value is not None})
+        self.profile = profile
+        self.models: Dict[str, dict] = {}
+        for name in models or DEFAULT_MODELS:
+            self.add_model(name)
+        self.dimensions = dimensions
+        self.answer_tokens = answer_tokens
+        self.seed = seed
+
+        self.loaded: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, int(self.settings["parallel"])))
+
+    def add_model(self, name: str):
+        digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+        family = name.split(":")[0]
+        size_hint = re.search(r"(\d+(?:\.\d+)?)([mb])", name.split(":")[-1])
+        parameters = float(size_hint.group(1)) * (1e6 if size_hint.group(2) == "m" else 1e9) if size_hint else 5e8
+        self.models[name] = {
+            "name": name,
+            "model": name,
+            "modified_at": "2024-01-01T00:00:00Z",
+            "size": int(parameters * 0.6),
+            "digest": digest,
+            "details": {"family": family, "format": "gguf", "parameter_size": name.split(":")[-1],
+                        "quantization_level": "Q4_K_M"}
+        }
+
+    def count(self, endpoint: str, amount: int = 1):
+        with self._lock:
+            self.counters[endpoint] = self.counters.get(endpoint, 0) + amount
+
+    def _sleep(self, seconds: float):
+        if seconds > 0:
+            jitter = self.settings["jitter"]
+            time.sleep(seconds * (1 + random.uniform(-jitter, jitter)) if jitter else seconds)
+
+    def ensure_loaded(self, name: str, keep_alive=None) -> float:
+        """Simula a carga do modelo na memória; retorna o tempo gasto (0 se já estava carregado)"""
+        now = time.time()
+        with self._lock:
+            expires = self.loaded.get(name)
+            already = expires is not None and expires > now
+        load_time = 0.0
+        if not already:
+            started = time.time()
+            self._sleep(self.settings["load_time"])
+            load_time = time.time() - started
+
+        duration = parse_keep_alive(keep_alive)
+        with self._lock:
+            if duration == 0:
+                self.loaded.pop(name, None)
+            else:
+                self.loaded[name] = time.time() + duration
+        return load_time
+
+    def running(self) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            for name in [name for name, expires in self.loaded.items() if expires <= now]:
+                del self.loaded[name]
+            entries = []
+            for name, expires in self.loaded.items():
+                expires_at = "2262-04-11T23:47:16Z" if expires == float("inf") else \
+                    time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires))
+                model = self.models.get(name, {"size": 0, "digest": ""})
+                entries.append({"name": name, "model": name, "size": model["size"], "digest": model["digest"],
+                                "expires_at": expires_at, "size_vram": 0})
+            return entries
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self._sleep(self.settings["embed_latency"] + self.settings["embed_per_item"] * len(texts))
+        return [hashed_embedding(text, self.dimensions) for text in texts]
+
+    def answer_words(self, model: str, prompt: str, limit: Optional[int]) -> List[str]:
+        """Resposta determinística: cita palavras da pergunta/contexto, sempre as mesmas para o mesmo prompt"""
+        rng = random.Random(f"{self.seed}:{model}:{prompt}")
+        words = [word for word in WORD_PATTERN.findall(prompt[-2000:]) if len(word) > 3] or ["resposta"]
+        count = self.answer_tokens if not limit or limit < 0 else min(self.answer_tokens, limit)
+        answer = ["Resposta", "simulada:"] + [rng.choice(words) for _ in range(max(0, count - 2))]
+        return answer[:count] if count else []
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOllama/0.1"
+
+    @property
+    def state(self) -> FakeOllama:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, payload, status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, message: str, status: int = 404):
+        self._send_json({"error": message}, status)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _stream_line(self, payload: dict):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.state.count(f"GET {path}")
+        if path == "/":
+            data = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif path == "/api/tags":
+            self._send_json({"models": list(self.state.models.values())})
+        elif path == "/api/ps":
+            self._send_json({"models": self.state.running()})
+        elif path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif path == "/fake/stats":
+            self._send_json({"profile": self.state.profile, "settings": self.state.settings,
+                             "counters": dict(self.state.counters), "loaded": list(self.state.loaded)})
+        else:
+            self._send_error("not found")
+
+    def do_DELETE(self):
+        body = self._read_json()
+        self.state.count("DELETE /api/delete")
+        name = body.get("name") or body.get("model")
+        if self.path != "/api/delete":
+            self._send_error("not found")
+        elif name not in self.state.models:
+            self._send_error(f"model '{name}' not found")
+        else:
+            del self.state.models[name]
+            self.state.loaded.pop(name, None)
+            self._send_json({})
+
+    def do_POST(self):
+        body = self._read_json()
+        path = self.path.split("?")[0]
+        self.state.count(f"POST {path}")
+
+        handlers = {
+            "/api/embeddings": self._embeddings,
+            "/api/embed": self._embed,
+            "/api/generate": self._generate,
+            "/api/show": self._show,
+            "/api/pull": self._pull,
+        }
+        handler = handlers.get(path)
+        if handler is None:
+            self._send_error("not found")
+            return
+        try:
+            handler(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _check_model(self, body: dict) -> Optional[str]:
+        name = body.get("model") or body.get("name") or ""
+        if name in self.state.models:
+            return name
+        # Ollama aceita o nome sem ":latest"
+        if f"{name}:latest" in self.state.models:
+            return f"{name}:latest"
+        self._send_error(f"model \"{name}\" not found, try pulling it first")
+        return None
+
+    def _embeddings(self, body: dict):
+        if self._check_model(body) is None:
+            return
+        self.state.count("embedded_texts")
+        self._send_json({"embedding": self.state.embed([body.get("prompt", "")])[0]})
+
+    def _embed(self, body: dict):
+        name = self._check_model(body)
+        if name is None:
+            return
+        texts = body.get("input", "")
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        self.state.count("embedded_texts", len(texts))
+        self._send_json({"model": name, "embeddings": self.state.embed(texts),
+                         "prompt_eval_count": sum(count_tokens(text) for text in texts)})
+
+    def _generate(self, body: dict):
+        name = self._check_model(body)
+        if name is None:
+            return
+        state = self.state
+        prompt = body.get("prompt") or ""
+        started = time.time()
+
+        with state._slots:
+            load_time = state.ensure_loaded(name, body.get("keep_alive"))
+            # Prompt vazio só carrega/descarrega o modelo
+            if not prompt:
+                self._send_json({"model": name, "response": "", "done": True, "done_reason": "load",
+                                 "load_duration": int(load_time * 1e9)})
+                return
+
+            options = body.get("options") or {}
+            words = state.answer_words(name, prompt, options.get("num_predict"))
+            prompt_tokens = count_tokens(prompt)
+            prompt_time = prompt_tokens / state.settings["prompt_rate"] if state.settings["prompt_rate"] else 0
+            token_time = 1 / state.settings["token_rate"] if state.settings["token_rate"] else 0
+
+            prompt_started = time.time()
+            state._sleep(prompt_time)
+            prompt_duration = time.time() - prompt_started
+            state.count("prompt_tokens", prompt_tokens)
+            state.count("generated_tokens", len(words))
+
+            final = {
+                "model": name, "response": "", "done": True, "done_reason": "stop",
+                "load_duration": int(load_time * 1e9),
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int(prompt_duration * 1e9),
+                "eval_count": len(words)
+            }
+
+            if body.get("stream", True) is False:
+                eval_started = time.time()
+                state._sleep(token_time * len(words))
+                final.update(response=" ".join(words), eval_duration=int((time.time() - eval_started) * 1e9),
+                             total_duration=int((time.time() - started) * 1e9))
+                self._send_json(final)
+                return
+
+            self._start_stream()
+            eval_started = time.time()
+            for position, word in enumerate(words):
+                state._sleep(token_time)
+                piece = word if position == 0 else f" {word}"
+                self._stream_line({"model": name, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                                   "response": piece, "done": False})
+            final.update(eval_duration=int((time.time() - eval_started) * 1e9),
+                         total_duration=int((time.time() - started) * 1e9))
+            self._stream_line(final)
+            self._end_stream()
+
+    def _show(self, body: dict):
+        name = self._check_model(body)
+        if name is None:
+            return
+        model = self.state.models[name]
+        self._send_json({
+            "modelfile": f"FROM {name}",
+            "parameters": "num_ctx 2048",
+            "template": "{{ .Prompt }}",
+            "details": model["details"],
+            "model_info": {"general.architecture": model["details"]["family"],
+                           f"{model['details']['family']}.context_length": 8192}
+        })
+
+    def _pull(self, body: dict):
+        name = body.get("name") or body.get("model") or ""
+        if not name:
+            self._send_error("missing model name", 400)
+            return
+        self.state.add_model(name)
+        if body.get("stream", True) is False:
+            self._send_json({"status": "success"})
+            return
+        self._start_stream()
+        for status in ("pulling manifest", "verifying sha256 digest", "writing manifest", "success"):
+            self._stream_line({"status": status})
+        self._end_stream()
+
+
+class FakeOllamaServer:
+    """Servidor em thread, para uso em testes e benchmarks: `with FakeOllamaServer() as url: ...`"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, verbose: bool = False, **options):
+        self.state = FakeOllama(**options)
+        self.httpd = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor falso do Ollama para testes offline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant", help="perfil de latência")
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="modelos já \"baixados\"")
+    parser.add_argument("--dimensions", type=int, default=768, help="tamanho dos embeddings")
+    parser.add_argument("--answer-tokens", type=int, default=40, help="tokens por resposta")
+    parser.add_argument("--seed", type=int, default=0)
+    for key in PROFILES["cpu"]:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, dest=key,
+                            help="sobrescreve o valor do perfil")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostra cada requisição")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    overrides = {key: getattr(args, key) for key in PROFILES["cpu"]}
+    server = FakeOllamaServer(
+        host=args.host, port=args.port, verbose=args.verbose, profile=args.profile,
+        models=[name.strip() for name in args.models.split(",") if name.strip()],
+        dimensions=args.dimensions, answer_tokens=args.answer_tokens, seed=args.seed, **overrides
+    )
+    print(f"🦙 Ollama falso em {server.url} (perfil {args.profile}: {server.state.settings})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
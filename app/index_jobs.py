@@ -0,0 +1,137 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class IndexJob:
+    """Estado de um job de indexação (atualizado pela thread de trabalho, lido pela UI)"""
+
+    def __init__(self, job_id: str, force_reindex: bool):
+        self.job_id = job_id
+        self.force_reindex = force_reindex
+        self.status = "queued"
+        self.phase = "aguardando"
+        self.files_scanned = 0
+        self.files_to_process = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.errors: List[str] = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.embedding_started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            if fields.get("phase") == "embedding" and self.embedding_started_at is None:
+                self.embedding_started_at = time.time()
+
+    def set_embedded(self, done: int, total: int):
+        """Callback de progresso do EmbeddingPipeline"""
+        with self._lock:
+            self.chunks_embedded = done
+            self.chunks_total = total
+
+    def add_error(self, message: str):
+        with self._lock:
+            self.errors.append(message)
+
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+
+            throughput = 0.0
+            if self.embedding_started_at and self.chunks_embedded:
+                throughput = self.chunks_embedded / max(now - self.embedding_started_at, 1e-6)
+
+            eta = None
+            remaining = self.chunks_total - self.chunks_embedded
+            if self.status == "running" and throughput > 0 and remaining > 0:
+                eta = remaining / throughput
+
+            progress = 0.0
+            if self.status == "completed":
+                progress = 1.0
+            elif self.chunks_total:
+                progress = self.chunks_embedded / self.chunks_total
+
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "phase": self.phase,
+                "force_reindex": self.force_reindex,
+                "files_scanned": self.files_scanned,
+                "files_to_process": self.files_to_process,
+                "chunks_total": self.chunks_total,
+                "chunks_embedded": self.chunks_embedded,
+                "progress": round(progress, 3),
+                "throughput": round(throughput, 2),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "elapsed_seconds": round(elapsed, 1),
+                "errors": list(self.errors),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at
+            }
+
+
+class IndexJobManager:
+    """Executa indexações em background, uma por vez, mantendo histórico recente"""
+
+    def __init__(self, rag_engine, max_history: int = 20):
+        self.rag_engine = rag_engine
+        self.max_history = max_history
+        self._jobs: "OrderedDict[str, IndexJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, force_reindex: bool = False) -> str:
+        """Inicia um job (ou devolve o que já está rodando)"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.is_active():
+                    return job.job_id
+
+            job = IndexJob(uuid.uuid4().hex[:12], force_reindex)
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+
+        thread = threading.Thread(target=self._run, args=(job,), name=f"krag-index-{job.job_id}", daemon=True)
+        thread.start()
+        return job.job_id
+
+    def _run(self, job: IndexJob):
+        job.update(status="running", phase="iniciando", started_at=time.time())
+        try:
+            self.rag_engine.index_documents(force_reindex=job.force_reindex, progress=job)
+            job.update(status="completed", phase="concluído", finished_at=time.time())
+        except Exception as e:
+            job.add_error(str(e))
+            job.update(status="failed", phase="erro", finished_at=time.time())
+
+    def get(self, job_id: Optional[str] = None) -> Optional[dict]:
+        """Estado de um job (ou do mais recente)"""
+        with self._lock:
+            if job_id:
+                job = self._jobs.get(job_id)
+            else:
+                job = next(reversed(self._jobs.values()), None)
+        return job.to_dict() if job else None
+
+    def active(self) -> Optional[dict]:
+        with self._lock:
+            job = next((job for job in self._jobs.values() if job.is_active()), None)
+        return job.to_dict() if job else None
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
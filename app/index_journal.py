@@ -0,0 +1,68 @@
+import json
+import os
+from typing import List
+
+
+class IndexJournal:
+    """Alterações desde o último snapshot de um índice, acrescentadas num JSONL ao lado dele
+
+    Cada operação precisa ser idempotente (reaplicar sobre um snapshot que já a contém não muda
+    nada): assim uma queda entre gravar o snapshot e apagar o journal não corrompe o índice.
+    O snapshot só é regravado quando o journal passa de `compact_ratio` das entradas do índice.
+    """
+
+    def __init__(self, snapshot_path: str, compact_ratio: float = 0.25, min_compact: int = 1000):
+        self.snapshot_path = snapshot_path
+        self.path = f"{snapshot_path}.journal"
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self.pending: List[list] = []
+        self.logged = 0
+        self.rewrite = False
+
+    def record(self, *operation):
+        self.pending.append(list(operation))
+
+    def invalidate(self):
+        """Estado em memória não deriva mais do snapshot (ex.: clear): só regravar resolve"""
+        self.pending = []
+        self.rewrite = True
+
+    def replay(self) -> List[list]:
+        """Operações já gravadas; uma última linha truncada (queda no meio da escrita) é ignorada"""
+        self.pending = []
+        self.rewrite = False
+        operations = []
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        operations.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Acrescentar depois dela colaria a próxima operação na linha quebrada
+                        self.rewrite = True
+                        break
+        self.logged = len(operations)
+        return operations
+
+    def needs_compaction(self, entries: int) -> bool:
+        if self.rewrite or not os.path.exists(self.snapshot_path):
+            return True
+        return self.logged + len(self.pending) > max(self.min_compact, entries * self.compact_ratio)
+
+    def append(self):
+        """Grava só as operações novas: custo proporcional à mudança, não ao índice"""
+        if not self.pending:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(operation) + "\n" for operation in self.pending))
+        self.logged += len(self.pending)
+        self.pending = []
+
+    def truncate(self):
+        """Chamado depois que o snapshot novo foi gravado"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.pending = []
+        self.logged = 0
+        self.rewrite = False
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def hash_content(text: str) -> str:
+    """Hash SHA-256 de um texto"""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def make_chunk_id(source: str, content: str, occurrence: int = 0) -> str:
+    """ID estável do chunk, derivado do arquivo e do conteúdo"""
+    digest = hashlib.sha256()
+    digest.update(source.encode("utf-8", errors="surrogatepass"))
+    digest.update(b"\0")
+    digest.update(content.encode("utf-8", errors="surrogatepass"))
+    digest.update(f"\0{occurrence}".encode("utf-8"))
+    return digest.hexdigest()[:40]
+
+
+class IndexManifest:
+    """Manifesto persistente dos arquivos indexados (caminho, tamanho, mtime, hash, chunks)"""
+
+    FILENAME = "krag_manifest.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.FILENAME)
+        self.files: Dict[str, dict] = {}
+        self.settings: dict = {}
+        self.version = 0
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """Carrega o manifesto do disco"""
+        with self._lock:
+            self.files = {}
+            self.settings = {}
+
+            if not os.path.exists(self.path):
+                return
+
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+
+                if data.get("format_version") != self.FORMAT_VERSION:
+                    print("⚠️ Manifesto em formato antigo, será recriado")
+                    return
+
+                self.files = data.get("files", {})
+                self.settings = data.get("settings", {})
+                self.version = data.get("index_version", 0)
+            except Exception as e:
+                print(f"⚠️ Erro ao ler manifesto: {e}")
+                self.files = {}
+                self.settings = {}
+
+    def save(self):
+        """Grava o manifesto de forma atômica"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            data = {
+                "format_version": self.FORMAT_VERSION,
+                "updated_at": time.time(),
+                "index_version": self.version,
+                "settings": self.settings,
+                "files": self.files
+            }
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def reset(self, settings: dict):
+        """Esvazia o manifesto (índice recriado do zero)"""
+        with self._lock:
+            self.files = {}
+            self.settings = dict(settings)
+            self.version += 1
+
+    def bump_version(self):
+        """Marca que o conteúdo do índice mudou (invalida caches de resposta)"""
+        with self._lock:
+            self.version += 1
+
+    def requires_rebuild(self, settings: dict) -> bool:
+        """Troca de modelo de embedding invalida todos os vetores"""
+        return self.settings.get("embedding_model") != settings.get("embedding_model")
+
+    def chunking_changed(self, settings: dict) -> bool:
+        """Troca de configuração de chunking invalida todos os chunks"""
+        return self.settings.get("chunking") != settings.get("chunking")
+
+    def get(self, path: str) -> dict:
+        with self._lock:
+            return self.files.get(path, {})
+
+    def set_file(self, path: str, size: int, mtime: float, content_hash: str, chunk_ids: List[str]):
+        with self._lock:
+            self.files[path] = {
+                "size": size,
+                "mtime": mtime,
+                "hash": content_hash,
+                "chunk_ids": list(chunk_ids)
+            }
+
+    def remove_file(self, path: str):
+        with self._lock:
+            self.files.pop(path, None)
+
+    def update_settings(self, settings: dict):
+        with self._lock:
+            self.settings = dict(settings)
+
+    def diff(self, current: Dict[str, dict], force_all: bool = False,
+             scope: Optional[Iterable[str]] = None) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """Compara arquivos atuais com o manifesto: (novos, alterados, inalterados, removidos)
+
+        Com `scope`, só caminhos do escopo podem ser considerados removidos.
+        """
+        with self._lock:
+            added, changed, unchanged = [], [], []
+
+            for path, info in current.items():
+                entry = self.files.get(path)
+                if entry is None:
+                    added.append(path)
+                elif force_all or entry.get("hash") != info.get("hash"):
+                    changed.append(path)
+                else:
+                    unchanged.append(path)
+
+            candidates = self.files if scope is None else [path for path in scope if path in self.files]
+            deleted = [path for path in candidates if path not in current]
+            return added, changed, unchanged, deleted
+
+    def total_chunks(self) -> int:
+        with self._lock:
+            return sum(len(entry.get("chunk_ids", [])) for entry in self.files.values())
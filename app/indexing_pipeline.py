@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+
+
+class AdaptiveBatchSizer:
+    """Ajusta o tamanho do lote de embeddings pela vazão e latência medidas"""
+
+    def __init__(self, initial: int = 32, minimum: int = 8, maximum: int = 256, target_latency: float = 10.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.size = max(minimum, min(initial, maximum))
+        self.best_throughput = 0.0
+        self.last_throughput = 0.0
+        self.last_latency = 0.0
+        self._lock = threading.Lock()
+
+    def next_size(self) -> int:
+        with self._lock:
+            return self.size
+
+    def record(self, batch_size: int, latency: float):
+        """Registra um lote concluído e recalcula o próximo tamanho"""
+        if batch_size <= 0 or latency <= 0:
+            return
+
+        with self._lock:
+            throughput = batch_size / latency
+            self.last_throughput = throughput
+            self.last_latency = latency
+
+            if latency > self.target_latency * 1.5:
+                # Lote lento demais: corta pela metade
+                self.size = int(self.size * 0.5)
+            elif throughput < self.best_throughput * 0.8:
+                # Vazão caiu: recua um pouco
+                self.size = int(self.size * 0.75)
+            elif latency < self.target_latency and throughput >= self.best_throughput * 0.95:
+                # Ainda há folga e a vazão não piorou: cresce
+                self.size = int(self.size * 1.5) + 1
+
+            self.size = max(self.minimum, min(self.size, self.maximum))
+            # Decaimento para reagir a mudanças de carga no Ollama
+            self.best_throughput = max(self.best_throughput * 0.98, throughput)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "batch_size": self.size,
+                "throughput": round(self.last_throughput, 2),
+                "latency": round(self.last_latency, 2)
+            }
+
+
+class EmbeddingPipeline:
+    """Mantém N lotes de embedding em paralelo enquanto uma thread grava no Chroma"""
+
+    def __init__(self, embeddings, collection, sizer: AdaptiveBatchSizer, concurrency: int = 4):
+        self.embeddings = embeddings
+        self.collection = collection
+        self.sizer = sizer
+        self.concurrency = max(1, concurrency)
+
+    def _embed_batch(self, batch: List[Tuple[str, Document]]):
+        start = time.time()
+        vectors = self.embeddings.embed_documents([doc.page_content for _, doc in batch])
+        return vectors, time.time() - start
+
+    def _writer(self, write_queue: queue.Queue, failed: Set[str], lock: threading.Lock,
+                progress: dict, on_progress: Optional[Callable[[int, int], None]]):
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+
+            batch, vectors = item
+            try:
+                self.collection.upsert(
+                    ids=[chunk_id for chunk_id, _ in batch],
+                    embeddings=vectors,
+                    metadatas=[doc.metadata for _, doc in batch],
+                    documents=[doc.page_content for _, doc in batch]
+                )
+                with lock:
+                    progress["done"] += len(batch)
+            except Exception as e:
+                print(f"⚠️ Erro ao gravar lote: {e}")
+                with lock:
+                    failed.update(chunk_id for chunk_id, _ in batch)
+
+            if on_progress:
+                on_progress(progress["done"], progress["total"])
+
+    def run(self, items: List[Tuple[str, Document]],
+            on_progress: Optional[Callable[[int, int], None]] = None) -> Set[str]:
+        """Embute e grava todos os itens; retorna os IDs que falharam"""
+        failed: Set[str] = set()
+        if not items:
+            return failed
+
+        lock = threading.Lock()
+        progress = {"done": 0, "total": len(items)}
+        write_queue: queue.Queue = queue.Queue(maxsize=self.concurrency * 2)
+        writer = threading.Thread(
+            target=self._writer,
+            args=(write_queue, failed, lock, progress, on_progress),
+            daemon=True
+        )
+        writer.start()
+
+        position = 0
+        batch_number = 0
+        in_flight = {}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                while position < len(items) or in_flight:
+                    while position < len(items) and len(in_flight) < self.concurrency:
+                        size = self.sizer.next_size()
+                        batch = items[position:position + size]
+                        position += len(batch)
+                        batch_number += 1
+                        print(f"Lote {batch_number} ({len(batch)} chunks, {position}/{len(items)})")
+                        in_flight[executor.submit(self._embed_batch, batch)] = batch
+
+                    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch = in_flight.pop(future)
+                        try:
+                            vectors, latency = future.result()
+                            self.sizer.record(len(batch), latency)
+                            write_queue.put((batch, vectors))
+                        except Exception as e:
+                            print(f"⚠️ Erro no lote: {e}")
+                            with lock:
+                                failed.update(chunk_id for chunk_id, _ in batch)
+        finally:
+            write_queue.put(None)
+            writer.join()
+
+        return failed
@@ -0,0 +1,213 @@
+import gzip
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from index_journal import IndexJournal
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*|\d+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+QUOTED_PATTERN = re.compile(r"[`'\"]([A-Za-z_$][\w$]*)[`'\"]")
+
+
+def split_identifier(identifier: str) -> List[str]:
+    """Quebra camelCase/PascalCase/snake_case em partes"""
+    parts = []
+    for piece in identifier.replace("$", "_").split("_"):
+        parts.extend(CAMEL_PATTERN.findall(piece))
+    return [part.lower() for part in parts if part]
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenizador para código: identificador completo + suas partes"""
+    tokens = []
+    for identifier in IDENTIFIER_PATTERN.findall(text):
+        full = identifier.lower()
+        if len(full) > 1:
+            tokens.append(full)
+
+        parts = split_identifier(identifier)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1 and part != full)
+
+    return tokens
+
+
+def find_identifier_query(question: str) -> Optional[str]:
+    """Retorna o identificador quando a pergunta é só ele (ex.: `UserService` ou calc_total)"""
+    stripped = question.strip().strip("?!.").strip()
+    quoted = QUOTED_PATTERN.fullmatch(stripped)
+    if quoted:
+        return quoted.group(1)
+
+    if re.fullmatch(r"[A-Za-z_$][\w$]*", stripped):
+        # Palavra comum não conta, precisa ter cara de código
+        if "_" in stripped or re.search(r"[a-z][A-Z]", stripped):
+            return stripped
+
+    return None
+
+
+def find_quoted_identifiers(question: str) -> List[str]:
+    """Identificadores entre crases/aspas numa pergunta em linguagem natural"""
+    return list(dict.fromkeys(QUOTED_PATTERN.findall(question)))
+
+
+class LexicalIndex:
+    """Índice invertido BM25 sobre o texto dos chunks, persistido junto ao Chroma"""
+
+    FILENAME = "lexical_index.json.gz"
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75):
+        self.path = os.path.join(directory, self.FILENAME)
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_metadata: Dict[str, dict] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.total_length = 0
+        self.journal = IndexJournal(self.path)
+        self._lock = threading.RLock()
+        self.load()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def load(self):
+        with self._lock:
+            self._reset()
+            if not os.path.exists(self.path):
+                self.journal.invalidate()
+                return
+
+            try:
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.postings = data.get("postings", {})
+                self.doc_lengths = data.get("doc_lengths", {})
+                self.doc_metadata = data.get("doc_metadata", {})
+                self.doc_terms = data.get("doc_terms", {})
+                self.total_length = sum(self.doc_lengths.values())
+
+                for operation in self.journal.replay():
+                    if operation[0] == "add":
+                        self._add_counts(operation[1], operation[2], operation[3])
+                    elif operation[0] == "remove":
+                        self._remove(operation[1])
+            except Exception as e:
+                print(f"⚠️ Erro ao ler índice léxico: {e}")
+                self.clear()
+
+    def save(self):
+        """Acrescenta as mudanças ao journal; o snapshot completo só é regravado na compactação"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if not self.journal.needs_compaction(len(self.doc_lengths)):
+                self.journal.append()
+                return
+
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({
+                    "postings": self.postings,
+                    "doc_lengths": self.doc_lengths,
+                    "doc_metadata": self.doc_metadata,
+                    "doc_terms": self.doc_terms
+                }, f)
+            os.replace(tmp_path, self.path)
+            self.journal.truncate()
+
+    def _reset(self):
+        self.postings = {}
+        self.doc_lengths = {}
+        self.doc_metadata = {}
+        self.doc_terms = {}
+        self.total_length = 0
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.journal.invalidate()
+
+    def add(self, chunk_id: str, text: str, metadata: Optional[dict] = None):
+        metadata = metadata or {}
+        counts = dict(Counter(tokenize(text)))
+        metadata = {key: metadata[key] for key in ("source", "type", "language", "extension") if key in metadata}
+        with self._lock:
+            self._add_counts(chunk_id, counts, metadata)
+            self.journal.record("add", chunk_id, counts, metadata)
+
+    def remove(self, chunk_id: str):
+        with self._lock:
+            if chunk_id in self.doc_lengths:
+                self._remove(chunk_id)
+                self.journal.record("remove", chunk_id)
+
+    def _add_counts(self, chunk_id: str, counts: Dict[str, int], metadata: dict):
+        if chunk_id in self.doc_lengths:
+            self._remove(chunk_id)
+
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, {})[chunk_id] = frequency
+
+        length = sum(counts.values())
+        self.doc_lengths[chunk_id] = length
+        self.total_length += length
+        self.doc_metadata[chunk_id] = metadata
+        self.doc_terms[chunk_id] = list(counts)
+
+    def _remove(self, chunk_id: str):
+        if chunk_id not in self.doc_lengths:
+            return
+
+        for term in self.doc_terms.pop(chunk_id, []):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self.postings[term]
+
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+        self.doc_metadata.pop(chunk_id, None)
+
+    def _matches(self, chunk_id: str, where: Optional[dict]) -> bool:
+        if not where:
+            return True
+        metadata = self.doc_metadata.get(chunk_id, {})
+        return all(metadata.get(key) == value for key, value in where.items())
+
+    def search(self, query: str, k: int = 5, where: Optional[dict] = None,
+               exact_term: bool = False) -> List[Tuple[str, float]]:
+        """BM25; com `exact_term`, usa só o identificador completo da consulta"""
+        with self._lock:
+            if not self.doc_lengths:
+                return []
+
+            terms = [query.lower()] if exact_term else list(dict.fromkeys(tokenize(query)))
+            total_docs = len(self.doc_lengths)
+            average_length = self.total_length / total_docs if total_docs else 1.0
+            scores: Dict[str, float] = {}
+
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * self.doc_lengths[chunk_id] / average_length
+                    score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + score
+
+            ranked = sorted(
+                ((chunk_id, score) for chunk_id, score in scores.items() if self._matches(chunk_id, where)),
+                key=lambda item: item[1],
+                reverse=True
+            )
+            return ranked[:k]
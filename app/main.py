@@ -1,9 +1,10 @@
 import streamlit as st
 import os
 import pandas as pd
-import psutil
 import time
 from rag_engine import KRAGEngine
+from model_manager import ModelManager
+from api_server import start_in_background
 
 # Configuração da página
 st.set_page_config(
@@ -18,13 +19,19 @@ st.set_page_config(
 def init_rag():
     engine = KRAGEngine()
     engine.initialize()
+    if engine.config.API_ENABLED:
+        start_in_background(engine, engine.config.API_HOST, engine.config.API_PORT)
     return engine
 
 
+def reset_rag(engine):
+    """Descarta o motor do cache; o próximo init_rag cria outro (threads e /metrics do antigo são liberados)"""
+    engine.shutdown()
+    st.cache_resource.clear()
+
+
 def show_download_progress_inline(model_name: str, rag_engine):
     """Mostra progresso de download inline na sidebar"""
-    import requests
-
     status_container = st.empty()
 
     try:
@@ -32,22 +39,15 @@ def show_download_progress_inline(model_name: str, rag_engine):
             st.caption("📦 Baixando...")
             progress = st.progress(0)
 
-            check_response = requests.get(f"{rag_engine.config.OLLAMA_BASE_URL}/api/tags", timeout=5)
-            if check_response.status_code == 200:
-                existing = [m["name"] for m in check_response.json().get("models", [])]
-                if model_name in existing:
-                    progress.progress(100)
-                    time.sleep(0.5)
-                    status_container.empty()
-                    return True
+            if model_name in rag_engine.ollama.model_names(refresh=True):
+                progress.progress(100)
+                time.sleep(0.5)
+                status_container.empty()
+                return True
 
             progress.progress(30)
 
-            pull_response = requests.post(
-                f"{rag_engine.config.OLLAMA_BASE_URL}/api/pull",
-                json={"name": model_name},
-                timeout=300
-            )
+            pull_response = rag_engine.ollama.pull(model_name)
 
             if pull_response.status_code == 200:
                 progress.progress(100)
@@ -199,6 +199,124 @@ def show_folder_selector():
             st.rerun()
 
 
+def show_index_job_status(rag_engine):
+    """Mostra andamento do job de indexação em background"""
+    job = rag_engine.get_index_job()
+    if not job:
+        return
+
+    if job["status"] in ("queued", "running"):
+        st.progress(job["progress"], text=f"🔄 {job['phase'].capitalize()}...")
+        st.caption(f"📂 {job['files_scanned']:,} arquivos | "
+                   f"🧩 {job['chunks_embedded']:,}/{job['chunks_total']:,} chunks")
+
+        if job["throughput"] > 0:
+            eta = job.get("eta_seconds")
+            eta_text = f" | ⏳ ~{eta:.0f}s restantes" if eta else ""
+            st.caption(f"⚡ {job['throughput']:.1f} chunks/s{eta_text}")
+    else:
+        # Job terminou: um rerun completo atualiza contagens e chat
+        if st.session_state.get("index_job_acknowledged") != job["job_id"]:
+            st.session_state.index_job_acknowledged = job["job_id"]
+            st.rerun()
+
+        if job["status"] == "completed":
+            st.caption(f"✅ Última indexação: {job['elapsed_seconds']}s | {job['chunks_embedded']:,} chunks novos")
+        else:
+            st.caption("❌ Última indexação falhou")
+
+    for error in job["errors"][-3:]:
+        st.caption(f"⚠️ {error}")
+
+
+def render_index_job_status(rag_engine):
+    """Atualiza o status a cada segundo apenas enquanto há job ativo"""
+    if rag_engine.index_jobs.active():
+        st.fragment(show_index_job_status, run_every=1)(rag_engine)
+    else:
+        show_index_job_status(rag_engine)
+
+
+def show_model_readiness(rag_engine, model_name: str):
+    """Estado do modelo na memória do Ollama (pré-carregamento em background)"""
+    status = rag_engine.model_manager.get_status().get(model_name)
+    if not status:
+        st.caption(ModelManager.READINESS_LABELS["cold"])
+        return
+
+    details = f" em {status['load_time']}s" if status["status"] == "ready" and status["load_time"] else ""
+    st.caption(f"{status['label']}{details}")
+    if status["error"]:
+        st.caption(f"⚠️ {status['error']}")
+
+
+def render_model_readiness(rag_engine, model_name: str):
+    """Atualiza a cada 2s apenas enquanto o modelo está carregando"""
+    if rag_engine.model_manager.readiness(model_name) == "loading":
+        st.fragment(show_model_readiness, run_every=2)(rag_engine, model_name)
+    else:
+        show_model_readiness(rag_engine, model_name)
+
+
+def render_system_history(monitor):
+    """Sparklines das últimas amostras de CPU/RAM"""
+    history = pd.DataFrame({
+        "CPU %": monitor.history("cpu_percent"),
+        "RAM %": monitor.history("ram_percent")
+    })
+    if len(history) < 2:
+        st.caption("⏳ Coletando amostras...")
+        return
+    st.line_chart(history, height=120)
+
+    krag_history = monitor.history("krag_rss_mb")
+    ollama_history = monitor.history("ollama_rss_mb")
+    memory = {"KRAG MB": krag_history}
+    if len(ollama_history) == len(krag_history):
+        memory["Ollama MB"] = ollama_history
+    st.line_chart(pd.DataFrame(memory), height=120)
+
+
+STAGE_LABELS = {
+    "symbol_lookup": "Índice de símbolos",
+    "cache_lookup": "Cache de respostas",
+    "rewrite": "Reescrita da pergunta",
+    "query_embedding": "Embedding da pergunta",
+    "vector_search": "Busca vetorial",
+    "lexical_search": "Busca BM25",
+    "retrieval": "Busca (total)",
+    "dedupe": "Deduplicação",
+    "embeddings": "Embeddings (rerank)",
+    "rerank": "Rerank",
+    "mmr": "MMR",
+    "packing": "Montagem do prompt",
+    "generation_wait": "Fila do LLM",
+    "model_load": "Carga do modelo",
+    "prompt_eval": "Leitura do prompt",
+    "decode": "Geração dos tokens",
+    "generation": "LLM (total)"
+}
+
+
+def show_query_trace(result: dict):
+    """Tempo por etapa e tokens reais (metadados do Ollama) de uma consulta"""
+    timings = result.get("timings", {})
+    if not timings:
+        return
+
+    with st.expander("⏱️ Etapas"):
+        rows = [{"Etapa": STAGE_LABELS.get(stage, stage), "Tempo (s)": seconds} for stage, seconds in timings.items()]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+        usage = result.get("usage", {})
+        if usage.get("completion_tokens"):
+            st.caption(f"🔤 Prompt: {usage.get('prompt_tokens') or 0:,} tokens "
+                       f"({usage.get('prompt_tokens_per_s', '?')} tok/s) | "
+                       f"Resposta: {usage['completion_tokens']:,} tokens ({usage.get('tokens_per_s', '?')} tok/s)")
+        if result.get("trace_id"):
+            st.caption(f"🧾 trace {result['trace_id']}")
+
+
 def show_model_removal_progress(model_name: str, rag_engine):
     """Mostra progresso de remoção do modelo"""
     progress_container = st.empty()
@@ -272,7 +390,9 @@ def main():
 
                 # Modelo atual
                 if "selected_model" not in st.session_state:
-                    st.session_state.selected_model = available[0] if available else "gemma3:1b"
+                    engine_model = rag.get_current_model()
+                    st.session_state.selected_model = engine_model if engine_model in available or not available \
+                        else available[0]
 
                 current_model = st.session_state.selected_model
 
@@ -281,6 +401,7 @@ def main():
                 info = rag.get_model_info(current_model)
                 st.success(f"🎯 **{current_model}**")
                 st.caption(f"💾 {info.get('ram_usage', '?')} | ⚡ {info.get('speed', '?')}")
+                render_model_readiness(rag, current_model)
 
                 # DISPONÍVEIS PARA TROCAR
                 others = [m for m in available if m != current_model]
@@ -288,10 +409,12 @@ def main():
                     st.markdown("**✅ DISPONÍVEIS:**")
                     for model in others:
                         # Nome do modelo
-                        st.markdown(f"✅ **{model}**")
+                        readiness = rag.model_manager.readiness(model)
+                        badge = " 🔥" if readiness == "ready" else " ⏳" if readiness == "loading" else ""
+                        st.markdown(f"✅ **{model}**{badge}")
 
                         # Botões em sequência horizontal compacta
-                        col1, col2 = st.columns(2)
+                        col1, col2, col3 = st.columns(3)
                         with col1:
                             if st.button("🔄 Ativar", key=f"activate_{model}", use_container_width=True):
                                 with st.spinner(f"Ativando {model}..."):
@@ -302,6 +425,12 @@ def main():
                                     else:
                                         st.error(msg)
                         with col2:
+                            if st.button("🔥 Aquecer", key=f"warm_{model}", use_container_width=True,
+                                         disabled=readiness in ("ready", "loading"),
+                                         help="Carrega o modelo no Ollama em background"):
+                                rag.model_manager.warm_up(model)
+                                st.rerun()
+                        with col3:
                             if st.button("🗑️ Remover", key=f"remove_{model}", use_container_width=True):
                                 st.session_state.removing_model = model
                                 st.rerun()
@@ -326,7 +455,7 @@ def main():
                                     st.success(f"✅ {model} baixado!")
                                     if "downloading_model" in st.session_state:
                                         del st.session_state.downloading_model
-                                    st.cache_resource.clear()
+                                    reset_rag(rag)
                                     st.rerun()
                                 else:
                                     if "downloading_model" in st.session_state:
@@ -351,7 +480,7 @@ def main():
                                     st.success(f"🎉 {model} removido com sucesso!")
                                     # Limpar estado e forçar refresh
                                     del st.session_state.removing_model
-                                    st.cache_resource.clear()
+                                    reset_rag(rag)
                                     st.rerun()
                                 else:
                                     # Manter o estado para mostrar erro
@@ -436,21 +565,22 @@ def main():
                 action_text = "🔄 Reindexar"
                 help_text = "Força nova indexação"
 
+            if stats.get("last_index_time"):
+                last_index = time.strftime("%d/%m %H:%M:%S", time.localtime(stats["last_index_time"]))
+                st.caption(f"🕒 Última atualização: {last_index} | versão {stats.get('index_version', 0)}")
+
             # Botão único inteligente
-            if st.button(action_text, help=help_text, use_container_width=True):
+            job_running = rag.index_jobs.active() is not None
+            if st.button(action_text, help=help_text, use_container_width=True, disabled=job_running):
                 force_reindex = total_docs > 0  # Se já tem docs, força reindex
+                rag.start_index_job(force_reindex=force_reindex)
+                st.rerun()
 
-                with st.spinner("🔄 Processando..."):
-                    try:
-                        rag.index_documents(force_reindex=force_reindex)
-                        st.success("✅ Concluído!")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"❌ Erro: {e}")
+            render_index_job_status(rag)
 
             # Botão para limpar
             if total_docs > 0:
-                if st.button("🗑️ Limpar Índice", help="Remove todos os documentos"):
+                if st.button("🗑️ Limpar Índice", help="Remove todos os documentos", disabled=job_running):
                     with st.spinner("🗑️ Limpando..."):
                         try:
                             rag.clear_index()
@@ -463,18 +593,57 @@ def main():
         with st.expander("📊 **Sistema**", expanded=False):
             # Métricas do sistema
             try:
-                # CPU e Memória
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory = psutil.virtual_memory()
+                # CPU e Memória (última amostra do monitor em background)
+                system = rag.system_monitor.latest()
 
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.metric("CPU", f"{cpu_percent:.1f}%")
+                    st.metric("CPU", f"{system['cpu_percent']:.1f}%")
                     st.metric("Documentos", stats.get("total_documents", 0))
                 with col2:
-                    st.metric("RAM", f"{memory.percent:.1f}%")
+                    st.metric("RAM", f"{system['ram_percent']:.1f}%")
                     st.metric("Tokens ~", f"{stats.get('total_documents', 0) * 200:,}")
 
+                ollama_rss = system.get("ollama_rss_mb")
+                ollama_text = f" | 🦙 Ollama: {ollama_rss:,.0f}MB" if ollama_rss is not None else ""
+                st.caption(f"🧩 KRAG: {system['krag_rss_mb']:,.0f}MB{ollama_text}")
+
+                if st.toggle("📈 Histórico", key="show_system_history"):
+                    render_system_history(rag.system_monitor)
+
+                # Cache de embeddings
+                cache_stats = stats.get("embedding_cache", {})
+                if cache_stats:
+                    st.caption(f"🧠 Cache de embeddings: {cache_stats.get('hit_rate', 0) * 100:.0f}% acertos "
+                               f"| {cache_stats.get('entries', 0):,} vetores")
+
+                answer_cache_stats = stats.get("answer_cache", {})
+                if answer_cache_stats:
+                    st.caption(f"♻️ Cache de respostas: {answer_cache_stats.get('hit_rate', 0) * 100:.0f}% acertos "
+                               f"| {answer_cache_stats.get('entries', 0)} respostas")
+
+                health = stats.get("health", {})
+                if health.get("checked_at"):
+                    health_icon = {"ok": "🟢", "degraded": "🟡", "error": "🔴"}.get(health["status"], "⚪")
+                    checked_ago = time.time() - health["checked_at"]
+                    st.caption(f"{health_icon} Saúde: {health['status']} | verificado há {checked_ago:.0f}s "
+                               f"({health['latency_ms']:.0f}ms)")
+                    if health.get("error"):
+                        st.caption(f"⚠️ {health['error']}")
+
+                ollama_stats = stats.get("ollama", {})
+                if ollama_stats.get("requests"):
+                    st.caption(f"🌐 Ollama: {ollama_stats['requests']} chamadas | "
+                               f"{ollama_stats['avg_latency_ms']:.0f}ms média | {ollama_stats['errors']} erros | "
+                               f"cache {ollama_stats['cache_hit_rate'] * 100:.0f}%")
+
+                scheduler_stats = stats.get("scheduler", {})
+                if scheduler_stats.get("active") or scheduler_stats.get("waiting"):
+                    classes = scheduler_stats["classes"]
+                    st.caption(f"🚦 Fila Ollama: {scheduler_stats['active']}/{scheduler_stats['max_parallel']} em uso | "
+                               f"aguardando: {classes['generation']['waiting']} gerações, "
+                               f"{classes['index_embedding']['waiting']} lotes de indexação")
+
                 # Informações do modelo atual
                 model_info = stats.get("model_info", {})
                 if model_info:
@@ -482,11 +651,15 @@ def main():
                     st.caption(f"RAM Necessária: {model_info.get('ram_usage', '?')}")
                     st.caption(f"Velocidade: {model_info.get('speed', '?')}")
 
-                # Tokens consumidos (simulado)
+                # Tokens consumidos (contagem do Ollama)
                 if "total_tokens_used" not in st.session_state:
                     st.session_state.total_tokens_used = 0
 
                 st.metric("Tokens Consumidos", f"{st.session_state.total_tokens_used:,}")
+                query_stats = stats.get("queries", {})
+                if query_stats.get("avg_tokens_per_s"):
+                    st.caption(f"⚡ {query_stats['avg_tokens_per_s']} tok/s em média "
+                               f"(últimas {query_stats['queries']} consultas)")
 
             except Exception as e:
                 st.error(f"❌ Erro nas métricas: {e}")
@@ -517,80 +690,74 @@ def main():
         st.markdown("## 📊 Todos os Modelos Ollama")
 
         try:
-            import requests
-            response = requests.get(f"{rag.config.OLLAMA_BASE_URL}/api/tags", timeout=5)
-
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-
-                if models:
-                    # Criar tabela com ações
-                    data = []
-                    for model in models:
-                        size_gb = model.get('size', 0) / (1024 ** 3)
-                        name = model['name']
-
-                        # Status
-                        our_models = ["gemma3:270m", "qwen3:0.6b", "gemma3:1b", "deepseek-r1:1.5b",
-                                      "qwen3:1.7b", "qwen2.5:3b", "gemma3:4b"]
-                        status = "🎯 KRAG" if name in our_models else "📦 Outro"
-
-                        # Verificar se é o modelo ativo
-                        current_model = rag.get_current_model()
-                        if name == current_model:
-                            status += " (ATIVO)"
-
-                        data.append({
-                            "Status": status,
-                            "Modelo": name,
-                            "Tamanho": f"{size_gb:.1f}GB",
-                            "Família": name.split(':')[0]
-                        })
-
-                    df = pd.DataFrame(data)
-                    st.dataframe(df, use_container_width=True)
-
-                    # Ações rápidas
-                    st.markdown("### 🎛️ Ações Rápidas")
-
-                    # Seletor de modelo para remoção
-                    non_active_models = [row["Modelo"] for row in data
-                                         if "(ATIVO)" not in row["Status"]]
-
-                    if non_active_models:
-                        col1, col2 = st.columns(2)
-
-                        with col1:
-                            selected_for_removal = st.selectbox(
-                                "Remover modelo:",
-                                [""] + non_active_models,
-                                help="Selecione um modelo para remover"
-                            )
+            models = rag.ollama.list_models()
+
+            if models:
+                # Criar tabela com ações
+                data = []
+                for model in models:
+                    size_gb = model.get('size', 0) / (1024 ** 3)
+                    name = model['name']
+
+                    # Status
+                    our_models = ["gemma3:270m", "qwen3:0.6b", "gemma3:1b", "deepseek-r1:1.5b",
+                                  "qwen3:1.7b", "qwen2.5:3b", "gemma3:4b"]
+                    status = "🎯 KRAG" if name in our_models else "📦 Outro"
+
+                    # Verificar se é o modelo ativo
+                    current_model = rag.get_current_model()
+                    if name == current_model:
+                        status += " (ATIVO)"
+
+                    data.append({
+                        "Status": status,
+                        "Modelo": name,
+                        "Tamanho": f"{size_gb:.1f}GB",
+                        "Família": name.split(':')[0]
+                    })
 
-                        with col2:
-                            if selected_for_removal and st.button("🗑️ Remover Selecionado"):
-                                with st.spinner(f"Removendo {selected_for_removal}..."):
-                                    success, msg = rag.remove_model(selected_for_removal)
-                                    if success:
-                                        st.success(f"✅ {selected_for_removal} removido!")
-                                        st.cache_resource.clear()
-                                        st.rerun()
-                                    else:
-                                        st.error(f"❌ {msg}")
+                df = pd.DataFrame(data)
+                st.dataframe(df, use_container_width=True)
+
+                # Ações rápidas
+                st.markdown("### 🎛️ Ações Rápidas")
+
+                # Seletor de modelo para remoção
+                non_active_models = [row["Modelo"] for row in data
+                                     if "(ATIVO)" not in row["Status"]]
+
+                if non_active_models:
+                    col1, col2 = st.columns(2)
+
+                    with col1:
+                        selected_for_removal = st.selectbox(
+                            "Remover modelo:",
+                            [""] + non_active_models,
+                            help="Selecione um modelo para remover"
+                        )
+
+                    with col2:
+                        if selected_for_removal and st.button("🗑️ Remover Selecionado"):
+                            with st.spinner(f"Removendo {selected_for_removal}..."):
+                                success, msg = rag.remove_model(selected_for_removal)
+                                if success:
+                                    st.success(f"✅ {selected_for_removal} removido!")
+                                    reset_rag(rag)
+                                    st.rerun()
+                                else:
+                                    st.error(f"❌ {msg}")
 
-                    # Métricas atualizadas
-                    total_size = sum([float(row["Tamanho"].replace("GB", "")) for row in data])
-                    krag_count = len([row for row in data if "KRAG" in row["Status"]])
+                # Métricas atualizadas
+                total_size = sum([float(row["Tamanho"].replace("GB", "")) for row in data])
+                krag_count = len([row for row in data if "KRAG" in row["Status"]])
 
-                    col1, col2, col3 = st.columns(3)
-                    col1.metric("Total", len(models))
-                    col2.metric("KRAG", krag_count)
-                    col3.metric("Espaço", f"{total_size:.1f}GB")
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Total", len(models))
+                col2.metric("KRAG", krag_count)
+                col3.metric("Espaço", f"{total_size:.1f}GB")
 
-                else:
-                    st.warning("Nenhum modelo encontrado")
             else:
-                st.error("Erro de conexão com Ollama")
+                st.warning("Nenhum modelo encontrado")
 
         except Exception as e:
             st.error(f"Erro: {e}")
@@ -693,14 +860,12 @@ def main():
         with col1:
             st.info("📁 Coloque arquivos em `data/source_code/`")
         with col2:
-            if st.button("📊 Indexar Agora", type="primary"):
-                with st.spinner("🔄 Indexando..."):
-                    try:
-                        rag.index_documents(force_reindex=False)
-                        st.success("✅ Indexado!")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"❌ Erro: {e}")
+            job_running = rag.index_jobs.active() is not None
+            if st.button("📊 Indexar Agora", type="primary", disabled=job_running):
+                rag.start_index_job(force_reindex=False)
+                st.rerun()
+
+        render_index_job_status(rag)
         return
 
     # Chat
@@ -748,6 +913,27 @@ def main():
                             filename = source.split("/")[-1] if "/" in source else source
                             st.text(f"📄 {filename}")
 
+    # Filtros explícitos (sem eles, o roteador deduz da pergunta)
+    with st.expander("🎯 Filtros de busca"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            type_labels = {"": "Todos", "source_code": "Código", "documentation": "Documentação",
+                           "configuration": "Configuração"}
+            filter_type = st.selectbox("Tipo", list(type_labels), format_func=type_labels.get, key="filter_type")
+        with col2:
+            languages = ["", "python", "java", "javascript", "typescript", "php", "sql", "csharp",
+                         "go", "ruby", "kotlin", "cpp", "c", "rust", "html", "css"]
+            filter_language = st.selectbox("Linguagem", languages, format_func=lambda value: value or "Todas",
+                                           key="filter_language")
+        with col3:
+            filter_extension = st.text_input("Extensão", placeholder="ex.: yml", key="filter_extension")
+
+    search_filters = {
+        "type": filter_type,
+        "language": filter_language,
+        "extension": filter_extension.strip()
+    }
+
     # Input do chat
     if prompt := st.chat_input("Pergunte sobre o sistema..."):
         # Adicionar pergunta
@@ -761,47 +947,58 @@ def main():
         with st.chat_message("assistant"):
             current_model = st.session_state.get("selected_model", "gemma3:1b")
 
-            with st.spinner(f"🤔 {current_model} analisando..."):
-                try:
-                    result = rag.query(prompt)
+            try:
+                with st.spinner(f"🤔 {current_model} analisando..."):
+                    result = rag.query_stream(prompt, filters=search_filters)
 
+                if "tokens" in result:
+                    st.write_stream(result["tokens"])
+                else:
                     st.write(result["answer"])
 
-                    # Tempo e estatísticas
-                    response_time = result.get("response_time", 0)
-                    if response_time > 0:
-                        color = "🟢" if response_time < 5 else "🟡" if response_time < 15 else "🔴"
-                        st.caption(f"{color} {response_time}s")
-
-                        # Atualizar tokens consumidos (estimativa)
-                        estimated_tokens = len(prompt) + len(result["answer"])
-                        st.session_state.total_tokens_used += estimated_tokens
-
-                    # Histórico
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": result["answer"],
-                        "sources": result.get("sources", []),
-                        "response_time": response_time
-                    })
+                # Tempo e estatísticas
+                response_time = result.get("response_time", 0)
+                if response_time > 0 or result.get("cached") or result.get("symbol_lookup"):
+                    color = "🟢" if response_time < 5 else "🟡" if response_time < 15 else "🔴"
+                    first_token = result.get("first_token_time")
+                    first_token_text = f" | ⚡ 1º token: {first_token}s" if first_token else ""
+                    tokens_per_s = result.get("usage", {}).get("tokens_per_s")
+                    speed_text = f" | 🔤 {tokens_per_s} tok/s" if tokens_per_s else ""
+                    cached_text = " | ♻️ cache" if result.get("cached") else ""
+                    symbol_text = " | 🏷️ índice de símbolos" if result.get("symbol_lookup") else ""
+                    filters_text = "".join(f" | 🎯 {key}={value}" for key, value in result.get("filters", {}).items())
+                    st.caption(f"{color} {response_time}s{first_token_text}{speed_text}{cached_text}{symbol_text}{filters_text}")
+
+                    # Atualizar tokens consumidos (prompt + resposta, informados pelo Ollama)
+                    st.session_state.total_tokens_used += result.get("usage", {}).get("total_tokens", 0)
+
+                show_query_trace(result)
+
+                # Histórico
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": result["answer"],
+                    "sources": result.get("sources", []),
+                    "response_time": response_time
+                })
 
-                    # Fontes
-                    if result.get("sources"):
-                        with st.expander("📋 Fontes"):
-                            for source in result["sources"]:
-                                filename = source.split("/")[-1] if "/" in source else source
-                                st.text(f"📄 {filename}")
-
-                except Exception as e:
-                    error_msg = f"❌ Erro: {str(e)}"
-                    st.error(error_msg)
-
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": error_msg,
-                        "sources": [],
-                        "response_time": 0
-                    })
+                # Fontes
+                if result.get("sources"):
+                    with st.expander("📋 Fontes"):
+                        for source in result["sources"]:
+                            filename = source.split("/")[-1] if "/" in source else source
+                            st.text(f"📄 {filename}")
+
+            except Exception as e:
+                error_msg = f"❌ Erro: {str(e)}"
+                st.error(error_msg)
+
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": error_msg,
+                    "sources": [],
+                    "response_time": 0
+                })
 
     # Sugestões rápidas
     if len(st.session_state.messages) <= 1:
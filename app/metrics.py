@@ -0,0 +1,262 @@
+import threading
+from typing import Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# Consultas vão de ~10ms (cache) a minutos (modelo grande na CPU)
+QUERY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+INDEX_BUCKETS = (0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+SPEED_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Gerações abertas e erros do LLM, registrado direto no Ollama do langchain"""
+
+    def __init__(self, metrics: "KRAGMetrics", model_name: str):
+        self.metrics = metrics
+        self.model_name = model_name
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.metrics.generations_in_flight.labels(self.model_name).inc()
+
+    def on_llm_end(self, response, **kwargs):
+        self.metrics.generations_in_flight.labels(self.model_name).dec()
+
+    def on_llm_error(self, error, **kwargs):
+        self.metrics.generations_in_flight.labels(self.model_name).dec()
+        self.metrics.llm_errors.labels(self.model_name).inc()
+
+
+class EngineCollector:
+    """Valores que o motor já mantém em memória, lidos só na hora do scrape"""
+
+    def __init__(self, rag_engine):
+        self.rag_engine = rag_engine
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        engine = self.rag_engine
+        snapshot = engine.stats_monitor.snapshot()
+
+        yield GaugeMetricFamily("krag_index_chunks", "Chunks no índice vetorial", value=snapshot["document_count"])
+        yield GaugeMetricFamily("krag_index_files", "Arquivos no manifesto do índice", value=len(engine.manifest.files))
+        yield GaugeMetricFamily("krag_index_version", "Versão do conteúdo do índice", value=engine.get_index_version())
+        yield GaugeMetricFamily("krag_healthy", "1 se Chroma e Ollama respondem", value=int(snapshot["health"]["status"] == "ok"))
+
+        caches = {"answer": engine.answer_cache.get_stats()}
+        if hasattr(engine.embeddings, "get_stats"):
+            caches["embedding"] = engine.embeddings.get_stats()
+        hits = CounterMetricFamily("krag_cache_hits", "Acertos de cache", labels=["cache"])
+        misses = CounterMetricFamily("krag_cache_misses", "Faltas de cache", labels=["cache"])
+        entries = GaugeMetricFamily("krag_cache_entries", "Entradas em cache", labels=["cache"])
+        for name, stats in caches.items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            entries.add_metric([name], stats["entries"])
+        yield hits
+        yield misses
+        yield entries
+
+        requests = CounterMetricFamily("krag_ollama_requests", "Chamadas à API do Ollama (gestão de modelos)",
+                                       labels=["endpoint"])
+        errors = CounterMetricFamily("krag_ollama_request_errors", "Chamadas à API do Ollama com erro",
+                                     labels=["endpoint"])
+        for endpoint, stats in engine.ollama.get_stats()["endpoints"].items():
+            requests.add_metric([endpoint], stats["requests"])
+            errors.add_metric([endpoint], stats["errors"])
+        yield requests
+        yield errors
+
+        scheduler = engine.scheduler.get_stats()["classes"]
+        active = GaugeMetricFamily("krag_scheduler_active", "Chamadas ao Ollama em andamento por classe",
+                                   labels=["class"])
+        waiting = GaugeMetricFamily("krag_scheduler_waiting", "Chamadas aguardando vaga no Ollama por classe",
+                                    labels=["class"])
+        refused = CounterMetricFamily("krag_scheduler_rejected", "Chamadas recusadas pelo escalonador",
+                                      labels=["class", "reason"])
+        for kind, stats in scheduler.items():
+            active.add_metric([kind], stats["active"])
+            waiting.add_metric([kind], stats["waiting"])
+            refused.add_metric([kind, "overloaded"], stats["rejected"])
+            refused.add_metric([kind, "deadline"], stats["expired"])
+        yield active
+        yield waiting
+        yield refused
+
+        loaded = GaugeMetricFamily("krag_model_ready", "1 se o modelo está carregado no Ollama", labels=["model"])
+        for model, status in engine.model_manager.get_status().items():
+            loaded.add_metric([model], int(status["status"] == "ready"))
+        yield loaded
+
+
+# Um só endpoint /metrics por processo: a UI recria o motor (cache do Streamlit) e o novo
+# passa a ser o exposto, sem disputar a porta com o antigo
+_server_lock = threading.Lock()
+_server = None
+_active: Optional["KRAGMetrics"] = None
+
+
+class _ActiveRegistry:
+    """Registro entregue ao servidor HTTP: repassa o scrape ao motor ativo no momento"""
+
+    def collect(self):
+        metrics = _active
+        return metrics.registry.collect() if metrics else []
+
+    def restricted_registry(self, names):
+        metrics = _active
+        return metrics.registry.restricted_registry(names) if metrics else self
+
+
+class KRAGMetrics:
+    """Registro Prometheus do motor, servido em HTTP (/metrics) numa thread própria
+
+    Sem o prometheus_client instalado, todos os métodos viram no-op.
+    """
+
+    def __init__(self, rag_engine):
+        self.enabled = PROMETHEUS_AVAILABLE
+        self.port = None
+        if not self.enabled:
+            return
+
+        # Registro próprio: vários motores no mesmo processo (benchmark, testes) não colidem
+        self.registry = CollectorRegistry()
+        self.registry.register(EngineCollector(rag_engine))
+
+        self.query_duration = Histogram(
+            "krag_query_duration_seconds", "Tempo total da consulta",
+            ["model", "path"], buckets=QUERY_BUCKETS, registry=self.registry
+        )
+        self.first_token = Histogram(
+            "krag_query_first_token_seconds", "Tempo até o primeiro token (streaming)",
+            ["model"], buckets=QUERY_BUCKETS, registry=self.registry
+        )
+        self.stage_duration = Histogram(
+            "krag_query_stage_seconds", "Tempo por etapa da consulta",
+            ["stage"], buckets=STAGE_BUCKETS, registry=self.registry
+        )
+        self.queries_in_flight = Gauge(
+            "krag_queries_in_flight", "Consultas em andamento", registry=self.registry
+        )
+        self.tokens = Counter(
+            "krag_llm_tokens", "Tokens processados pelo LLM (contagem do Ollama)",
+            ["model", "kind"], registry=self.registry
+        )
+        self.tokens_per_second = Histogram(
+            "krag_llm_tokens_per_second", "Velocidade de geração por consulta",
+            ["model"], buckets=SPEED_BUCKETS, registry=self.registry
+        )
+        self.generations_in_flight = Gauge(
+            "krag_llm_generations_in_flight", "Chamadas ao LLM abertas no Ollama",
+            ["model"], registry=self.registry
+        )
+        self.llm_errors = Counter(
+            "krag_llm_errors", "Chamadas ao LLM com erro", ["model"], registry=self.registry
+        )
+        self.index_duration = Histogram(
+            "krag_index_duration_seconds", "Duração de cada indexação (completa ou incremental)",
+            buckets=INDEX_BUCKETS, registry=self.registry
+        )
+        self.index_chunks = Counter(
+            "krag_index_chunks_processed", "Chunks embutidos, removidos ou que falharam na indexação",
+            ["operation"], registry=self.registry
+        )
+        self.index_files = Counter(
+            "krag_index_files_processed", "Arquivos (re)fragmentados na indexação", registry=self.registry
+        )
+        self.index_throughput = Gauge(
+            "krag_index_chunks_per_second", "Chunks embutidos por segundo na última indexação",
+            registry=self.registry
+        )
+
+    def start_server(self, port: int, host: str = "0.0.0.0") -> bool:
+        """Expõe este motor em /metrics; o servidor sobe uma vez por processo e porta ocupada só gera aviso"""
+        global _server, _active
+        if not self.enabled:
+            print("⚠️ prometheus_client não instalado, métricas desativadas")
+            return False
+
+        with _server_lock:
+            if _server is None:
+                try:
+                    httpd, _ = start_http_server(port, addr=host, registry=_ActiveRegistry())
+                except OSError as e:
+                    print(f"⚠️ Métricas indisponíveis na porta {port}: {e}")
+                    return False
+                _server = (httpd, port)
+                print(f"📈 Métricas em http://{host}:{port}/metrics")
+            elif _server[1] != port:
+                print(f"⚠️ Métricas já servidas na porta {_server[1]} neste processo")
+
+            _active = self
+            self.port = _server[1]
+            return True
+
+    def stop_server(self):
+        """Deixa de expor este motor; sem outro motor ativo, fecha o servidor e libera a porta"""
+        global _server, _active
+        with _server_lock:
+            if _active is not self:
+                return
+            _active = None
+            self.port = None
+            if _server:
+                httpd, _ = _server
+                httpd.shutdown()
+                httpd.server_close()
+                _server = None
+
+    def llm_callback(self, model_name: str) -> Optional[LLMMetricsHandler]:
+        return LLMMetricsHandler(self, model_name) if self.enabled else None
+
+    def query_started(self):
+        if self.enabled:
+            self.queries_in_flight.inc()
+
+    def query_finished(self):
+        if self.enabled:
+            self.queries_in_flight.dec()
+
+    def observe_query(self, trace: dict):
+        """Alimenta os histogramas a partir do trace da consulta"""
+        if not self.enabled:
+            return
+
+        model = trace["model"]
+        if trace.get("response_time") is not None:
+            self.query_duration.labels(model, trace["path"]).observe(trace["response_time"])
+        if trace.get("first_token_time") is not None:
+            self.first_token.labels(model).observe(trace["first_token_time"])
+        for stage, seconds in trace["stages"].items():
+            self.stage_duration.labels(stage).observe(seconds)
+
+        usage = trace.get("usage") or {}
+        if usage.get("prompt_tokens"):
+            self.tokens.labels(model, "prompt").inc(usage["prompt_tokens"])
+        if usage.get("completion_tokens"):
+            self.tokens.labels(model, "completion").inc(usage["completion_tokens"])
+        if usage.get("tokens_per_s"):
+            self.tokens_per_second.labels(model).observe(usage["tokens_per_s"])
+
+    def observe_index(self, seconds: float, files: int, embedded: int, removed: int, failed: int):
+        if not self.enabled:
+            return
+
+        self.index_duration.observe(seconds)
+        self.index_files.inc(files)
+        self.index_chunks.labels("embedded").inc(embedded)
+        self.index_chunks.labels("removed").inc(removed)
+        self.index_chunks.labels("failed").inc(failed)
+        if embedded and seconds:
+            self.index_throughput.set(embedded / seconds)
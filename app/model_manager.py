@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from ollama_scheduler import GENERATION
+
+
+class ModelManager:
+    """Pool LRU de modelos (LLM já montado e k do modelo) com pré-carregamento em background no Ollama"""
+
+    READINESS_LABELS = {
+        "ready": "🔥 Carregado",
+        "loading": "⏳ Carregando...",
+        "cold": "❄️ Não carregado",
+        "error": "❌ Falha ao carregar"
+    }
+
+    def __init__(self, rag_engine, max_models: int = 3, keep_alive: str = "30m"):
+        self.rag_engine = rag_engine
+        self.max_models = max(1, max_models)
+        self.keep_alive = keep_alive
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _new_entry(self, model_name: str) -> dict:
+        return {
+            "model": model_name,
+            "llm": self.rag_engine._create_optimized_llm(model_name),
+            "k": self.rag_engine._get_optimal_k_for_model(model_name),
+            "status": "cold",
+            "error": None,
+            "load_time": None,
+            "loaded_at": None,
+            "last_used": time.time()
+        }
+
+    def get(self, model_name: str) -> dict:
+        """Entrada do pool (criada se preciso)"""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None:
+                entry = self._new_entry(model_name)
+                self._entries[model_name] = entry
+
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(model_name)
+            self._evict(keep=model_name)
+            return entry
+
+    def _evict(self, keep: str):
+        """Descarta os menos usados, nunca o modelo ativo nem o pedido agora"""
+        protected = {keep, self.rag_engine.get_current_model()}
+        while len(self._entries) > self.max_models:
+            oldest = next((name for name in self._entries if name not in protected), None)
+            if oldest is None:
+                break
+            del self._entries[oldest]
+
+    def forget(self, model_name: str):
+        """Tira do pool um modelo removido do Ollama"""
+        with self._lock:
+            self._entries.pop(model_name, None)
+
+    def warm_up(self, model_name: str, force: bool = False):
+        """Carrega o modelo na memória do Ollama em background (prompt vazio + keep_alive)"""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None:
+                entry = self._new_entry(model_name)
+                self._entries[model_name] = entry
+                self._evict(keep=model_name)
+
+            if entry["status"] == "loading" or (entry["status"] == "ready" and not force):
+                return
+            entry["status"] = "loading"
+            entry["error"] = None
+
+        thread = threading.Thread(target=self._load, args=(model_name,), name=f"krag-warmup-{model_name}", daemon=True)
+        thread.start()
+
+    def _load(self, model_name: str):
+        started = time.time()
+        try:
+            # Carregar o modelo ocupa o Ollama como uma geração: disputa as mesmas vagas do escalonador
+            with self.rag_engine.scheduler.slot(GENERATION):
+                response = self.rag_engine.ollama.generate(
+                    {"model": model_name, "prompt": "", "keep_alive": self.keep_alive, "stream": False},
+                    timeout=600
+                )
+            response.raise_for_status()
+            self._set_status(model_name, "ready", load_time=time.time() - started, loaded_at=time.time())
+            print(f"🔥 {model_name} carregado em {time.time() - started:.1f}s")
+        except Exception as e:
+            self._set_status(model_name, "error", error=str(e))
+            print(f"⚠️ Erro ao pré-carregar {model_name}: {e}")
+
+    def _set_status(self, model_name: str, status: str, **fields):
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None:
+                return
+            entry["status"] = status
+            entry.update(fields)
+
+    def mark_used(self, model_name: str):
+        """Uma geração bem-sucedida também deixa o modelo carregado"""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry and entry["status"] != "ready":
+                entry["status"] = "ready"
+                entry["loaded_at"] = time.time()
+
+    def refresh_loaded(self, loaded: set):
+        """Sincroniza com os modelos que o Ollama reporta em memória (/api/ps)"""
+        with self._lock:
+            for name, entry in self._entries.items():
+                if name in loaded and entry["status"] in ("cold", "error"):
+                    entry["status"] = "ready"
+                elif name not in loaded and entry["status"] == "ready":
+                    # keep_alive expirou ou o Ollama descarregou
+                    entry["status"] = "cold"
+
+    def readiness(self, model_name: str) -> str:
+        with self._lock:
+            entry = self._entries.get(model_name)
+            return entry["status"] if entry else "cold"
+
+    def get_status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {
+                    "status": entry["status"],
+                    "label": self.READINESS_LABELS.get(entry["status"], entry["status"]),
+                    "load_time": round(entry["load_time"], 1) if entry["load_time"] else None,
+                    "error": entry["error"]
+                }
+                for name, entry in reversed(self._entries.items())
+            }
+
+    def label(self, model_name: str) -> str:
+        return self.READINESS_LABELS.get(self.readiness(model_name), "")
@@ -0,0 +1,147 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OllamaClient:
+    """Cliente HTTP compartilhado para as chamadas de controle do Ollama (tags, show, ps, pull, delete)
+
+    Mantém conexões abertas (keep-alive), guarda por alguns segundos as respostas de leitura e
+    contabiliza latência/erros por endpoint.
+    """
+
+    def __init__(self, base_url: str, cache_ttl: float = 10.0, timeout: float = 5.0, pool_size: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._cache: Dict[str, tuple] = {}
+        self._endpoints: Dict[str, dict] = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._lock = threading.RLock()
+
+    def request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """Requisição crua (sem cache), com latência e erros contabilizados"""
+        started = time.time()
+        error = None
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}",
+                                            timeout=timeout or self.timeout, **kwargs)
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+            return response
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self._record(f"{method.upper()} {path}", time.time() - started, error)
+
+    def _record(self, endpoint: str, elapsed: float, error: Optional[str]):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                "requests": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0, "last_error": None
+            })
+            stats["requests"] += 1
+            stats["total_time"] += elapsed
+            stats["max_time"] = max(stats["max_time"], elapsed)
+            if error:
+                stats["errors"] += 1
+                stats["last_error"] = error
+
+    def _cached(self, key: str, loader: Callable[[], object], refresh: bool = False):
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and not refresh and now - cached[0] < self.cache_ttl:
+                self._cache_hits += 1
+                return cached[1]
+            self._cache_misses += 1
+
+        # Erros não entram no cache: a próxima chamada tenta de novo
+        value = loader()
+        with self._lock:
+            self._cache[key] = (time.time(), value)
+        return value
+
+    def _get_json(self, method: str, path: str, **kwargs) -> dict:
+        response = self.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def invalidate(self, prefix: str = ""):
+        """Descarta respostas guardadas (todas, ou só as de um endpoint)"""
+        with self._lock:
+            for key in [key for key in self._cache if key.startswith(prefix)]:
+                del self._cache[key]
+
+    def list_models(self, refresh: bool = False) -> List[dict]:
+        """Modelos baixados (/api/tags)"""
+        return self._cached("tags", lambda: self._get_json("GET", "/api/tags").get("models", []), refresh)
+
+    def model_names(self, refresh: bool = False) -> List[str]:
+        return [model["name"] for model in self.list_models(refresh)]
+
+    def get_model(self, model_name: str, refresh: bool = False) -> Optional[dict]:
+        """Entrada de /api/tags de um modelo (tamanho, digest, detalhes)"""
+        return next((model for model in self.list_models(refresh) if model["name"] == model_name), None)
+
+    def show_model(self, model_name: str, refresh: bool = False) -> dict:
+        """Metadados do modelo (/api/show: parâmetros, template, contexto)"""
+        return self._cached(f"show:{model_name}",
+                            lambda: self._get_json("POST", "/api/show", json={"name": model_name}), refresh)
+
+    def running_models(self, refresh: bool = False) -> List[dict]:
+        """Modelos carregados na memória (/api/ps)"""
+        return self._cached("ps", lambda: self._get_json("GET", "/api/ps").get("models", []), refresh)
+
+    def generate(self, payload: dict, timeout: Optional[float] = None) -> requests.Response:
+        response = self.request("POST", "/api/generate", timeout=timeout, json=payload)
+        # Uma geração pode carregar/descarregar modelos
+        self.invalidate("ps")
+        return response
+
+    def pull(self, model_name: str, timeout: float = 300) -> requests.Response:
+        try:
+            return self.request("POST", "/api/pull", timeout=timeout, json={"name": model_name, "stream": False})
+        finally:
+            self.invalidate()
+
+    def delete(self, model_name: str, timeout: float = 30) -> requests.Response:
+        try:
+            return self.request("DELETE", "/api/delete", timeout=timeout, json={"name": model_name})
+        finally:
+            self.invalidate()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            total_requests = sum(stats["requests"] for stats in self._endpoints.values())
+            total_errors = sum(stats["errors"] for stats in self._endpoints.values())
+            total_time = sum(stats["total_time"] for stats in self._endpoints.values())
+            lookups = self._cache_hits + self._cache_misses
+
+            return {
+                "requests": total_requests,
+                "errors": total_errors,
+                "avg_latency_ms": round(total_time / total_requests * 1000, 1) if total_requests else 0.0,
+                "cache_hits": self._cache_hits,
+                "cache_hit_rate": self._cache_hits / lookups if lookups else 0.0,
+                "endpoints": {
+                    endpoint: {
+                        "requests": stats["requests"],
+                        "errors": stats["errors"],
+                        "avg_ms": round(stats["total_time"] / stats["requests"] * 1000, 1),
+                        "max_ms": round(stats["max_time"] * 1000, 1),
+                        "last_error": stats["last_error"]
+                    }
+                    for endpoint, stats in self._endpoints.items()
+                }
+            }
@@ -0,0 +1,170 @@
+import bisect
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from langchain.embeddings.base import Embeddings
+
+# Classes em ordem de prioridade: embedding da pergunta é curto e precede a geração da mesma consulta
+QUERY_EMBEDDING = "query_embedding"
+GENERATION = "generation"
+INDEX_EMBEDDING = "index_embedding"
+PRIORITIES = {QUERY_EMBEDDING: 0, GENERATION: 1, INDEX_EMBEDDING: 2}
+
+
+class RequestRejected(Exception):
+    """Chamada ao Ollama recusada pelo escalonador (fila cheia ou prazo esgotado)"""
+
+
+class Overloaded(RequestRejected):
+    pass
+
+
+class DeadlineExceeded(RequestRejected):
+    pass
+
+
+class OllamaScheduler:
+    """Controle de admissão das chamadas ao Ollama, com prioridade por classe
+
+    Uma vaga é liberada sempre para o pedido mais prioritário que cabe no limite da sua classe.
+    Indexação fica com no máximo `max_parallel - 1` vagas, então perguntas nunca esperam atrás do lote.
+    `queue_limits` recusa na hora (Overloaded) quando já há muitos aguardando; `deadlines` (s)
+    é o tempo máximo de espera por uma vaga (DeadlineExceeded). 0 = sem limite.
+    """
+
+    def __init__(self, max_parallel: int, limits: Dict[str, int], queue_limits: Optional[Dict[str, int]] = None,
+                 deadlines: Optional[Dict[str, float]] = None):
+        self.max_parallel = max(1, max_parallel)
+        self.limits = {kind: max(1, limits.get(kind, self.max_parallel)) for kind in PRIORITIES}
+        if self.max_parallel > 1:
+            # Indexação nunca ocupa todas as vagas: sobra ao menos uma para as perguntas
+            self.limits[INDEX_EMBEDDING] = min(self.limits[INDEX_EMBEDDING], self.max_parallel - 1)
+        self.queue_limits = {kind: (queue_limits or {}).get(kind, 0) for kind in PRIORITIES}
+        self.deadlines = {kind: (deadlines or {}).get(kind, 0) for kind in PRIORITIES}
+
+        self._condition = threading.Condition()
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self._active = {kind: 0 for kind in PRIORITIES}
+        self._stats = {kind: {"admitted": 0, "rejected": 0, "expired": 0, "wait_time": 0.0, "max_wait": 0.0}
+                       for kind in PRIORITIES}
+        self._local = threading.local()
+
+    @contextmanager
+    def deadline_scope(self, deadline_at: Optional[float]):
+        """Prazo (time.monotonic) da requisição inteira para as chamadas feitas nesta thread"""
+        previous = getattr(self._local, "deadline_at", None)
+        self._local.deadline_at = deadline_at
+        try:
+            yield
+        finally:
+            self._local.deadline_at = previous
+
+    def _resolve_deadline(self, kind: str, deadline_at: Optional[float]) -> Optional[float]:
+        candidates = [deadline_at, getattr(self._local, "deadline_at", None)]
+        if self.deadlines[kind]:
+            candidates.append(time.monotonic() + self.deadlines[kind])
+        candidates = [value for value in candidates if value is not None]
+        return min(candidates) if candidates else None
+
+    def _can_admit(self, ticket: tuple) -> bool:
+        """Simula a distribuição das vagas livres pela fila, em ordem de prioridade"""
+        free = self.max_parallel - sum(self._active.values())
+        class_free = {kind: self.limits[kind] - self._active[kind] for kind in PRIORITIES}
+        for waiting in self._waiting:
+            if free <= 0:
+                return False
+            kind = waiting[2]
+            if class_free[kind] > 0:
+                if waiting is ticket:
+                    return True
+                free -= 1
+                class_free[kind] -= 1
+        return False
+
+    def acquire(self, kind: str, deadline_at: Optional[float] = None) -> float:
+        """Espera uma vaga da classe; retorna o tempo de espera (s)"""
+        started = time.monotonic()
+        deadline_at = self._resolve_deadline(kind, deadline_at)
+
+        with self._condition:
+            queued = sum(1 for waiting in self._waiting if waiting[2] == kind)
+            if self.queue_limits[kind] and queued >= self.queue_limits[kind]:
+                self._stats[kind]["rejected"] += 1
+                raise Overloaded(f"Ollama sobrecarregado: {queued} pedidos de {kind} na fila")
+
+            ticket = (PRIORITIES[kind], next(self._sequence), kind)
+            bisect.insort(self._waiting, ticket)
+            while not self._can_admit(ticket):
+                remaining = deadline_at - time.monotonic() if deadline_at is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(ticket)
+                    self._stats[kind]["expired"] += 1
+                    # A vaga que este pedido "reservava" na simulação pode servir a outro
+                    self._condition.notify_all()
+                    raise DeadlineExceeded(f"Prazo esgotado esperando vaga no Ollama ({kind})")
+                self._condition.wait(remaining)
+
+            self._waiting.remove(ticket)
+            self._active[kind] += 1
+            waited = time.monotonic() - started
+            stats = self._stats[kind]
+            stats["admitted"] += 1
+            stats["wait_time"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+            return waited
+
+    def release(self, kind: str):
+        with self._condition:
+            self._active[kind] -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, kind: str, deadline_at: Optional[float] = None):
+        self.acquire(kind, deadline_at)
+        try:
+            yield
+        finally:
+            self.release(kind)
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            classes = {}
+            for kind in PRIORITIES:
+                stats = self._stats[kind]
+                classes[kind] = {
+                    "active": self._active[kind],
+                    "waiting": sum(1 for waiting in self._waiting if waiting[2] == kind),
+                    "limit": self.limits[kind],
+                    "queue_limit": self.queue_limits[kind],
+                    "admitted": stats["admitted"],
+                    "rejected": stats["rejected"],
+                    "expired": stats["expired"],
+                    "avg_wait_ms": round(stats["wait_time"] / stats["admitted"] * 1000, 1) if stats["admitted"] else 0.0,
+                    "max_wait_ms": round(stats["max_wait"] * 1000, 1)
+                }
+            return {
+                "max_parallel": self.max_parallel,
+                "active": sum(self._active.values()),
+                "waiting": len(self._waiting),
+                "classes": classes
+            }
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeddings passando pelo escalonador: pergunta com prioridade alta, documentos como lote"""
+
+    def __init__(self, embeddings: Embeddings, scheduler: OllamaScheduler):
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.scheduler.slot(INDEX_EMBEDDING):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self.scheduler.slot(QUERY_EMBEDDING):
+            return self.embeddings.embed_query(text)
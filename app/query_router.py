@@ -0,0 +1,91 @@
+import re
+from typing import Optional
+
+# Metadados gravados em cada chunk por process_documents
+LANGUAGE_BY_EXTENSION = {
+    "py": "python", "java": "java", "js": "javascript", "jsx": "javascript",
+    "ts": "typescript", "tsx": "typescript", "php": "php", "rb": "ruby",
+    "go": "go", "cpp": "cpp", "c": "c", "h": "c",
+    "cs": "csharp", "kt": "kotlin", "swift": "swift",
+    "rs": "rust", "html": "html", "css": "css", "sql": "sql"
+}
+
+TYPE_BY_EXTENSION = {
+    "source_code": {"py", "java", "js", "jsx", "ts", "tsx", "php", "rb", "go", "cpp", "c", "h",
+                    "cs", "kt", "swift", "rs", "sql"},
+    "documentation": {"md", "txt", "rst"},
+    "configuration": {"json", "yaml", "yml", "xml", "properties", "conf", "ini", "env"},
+}
+
+FILTER_KEYS = ("type", "language", "extension")
+
+# Palavras da pergunta → filtro (ordem importa: mais específico primeiro)
+LANGUAGE_KEYWORDS = [
+    (r"python", "python"), (r"java(?!\s*script)", "java"), (r"javascript|node\.?js", "javascript"),
+    (r"typescript", "typescript"), (r"php", "php"), (r"ruby", "ruby"), (r"golang", "go"),
+    (r"c#|csharp", "csharp"), (r"c\+\+|cpp", "cpp"), (r"kotlin", "kotlin"), (r"swift", "swift"),
+    (r"rust", "rust"), (r"sql|stored procedures?", "sql"),
+]
+TYPE_KEYWORDS = [
+    (r"configura(?:ção|cao|ções|coes)|config|settings|propriedades|vari[aá]veis de ambiente", "configuration"),
+    (r"documenta(?:ção|cao)|docs|readme|manual", "documentation"),
+]
+EXTENSION_PATTERN = re.compile(r"(?<![\w/])\*?\.([a-z0-9]{1,10})\b", re.IGNORECASE)
+
+
+def get_chunk_metadata(source: str) -> dict:
+    """type/language/extension de um arquivo"""
+    filename = source.replace("\\", "/").rsplit("/", 1)[-1]
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+    file_type = "other"
+    for candidate, extensions in TYPE_BY_EXTENSION.items():
+        if ext in extensions:
+            file_type = candidate
+            break
+
+    return {
+        "type": file_type,
+        "language": LANGUAGE_BY_EXTENSION.get(ext, "unknown"),
+        "extension": ext
+    }
+
+
+def infer_filters(question: str) -> dict:
+    """Deduz um filtro da pergunta (extensão > linguagem > tipo); {} quando nada é explícito"""
+    known_extensions = set().union(*TYPE_BY_EXTENSION.values())
+    for ext in EXTENSION_PATTERN.findall(question):
+        if ext.lower() in known_extensions:
+            return {"extension": ext.lower()}
+
+    lowered = question.lower()
+    for pattern, language in LANGUAGE_KEYWORDS:
+        if re.search(rf"(?<![\w#+])(?:{pattern})(?![\w#+])", lowered):
+            return {"language": language}
+
+    for pattern, file_type in TYPE_KEYWORDS:
+        if re.search(rf"(?<!\w)(?:{pattern})(?!\w)", lowered):
+            return {"type": file_type}
+
+    return {}
+
+
+def clean_filters(filters: Optional[dict]) -> dict:
+    """Mantém só chaves conhecidas com valor preenchido"""
+    if not filters:
+        return {}
+    cleaned = {}
+    for key in FILTER_KEYS:
+        value = filters.get(key)
+        if value:
+            cleaned[key] = str(value).lower().lstrip(".") if key == "extension" else value
+    return cleaned
+
+
+def to_chroma_where(filters: dict) -> Optional[dict]:
+    """Filtro no formato do Chroma ($and quando há mais de uma chave)"""
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return dict(filters)
+    return {"$and": [{key: value} for key, value in filters.items()]}
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import List, Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+NANOSECONDS = 1e9
+
+
+def add_timing(timings: Optional[dict], stage: str, seconds: float):
+    """Soma o tempo de uma etapa (a mesma etapa pode rodar mais de uma vez, ex.: busca sem filtro)"""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class OllamaUsageHandler(BaseCallbackHandler):
+    """Guarda os metadados da última resposta do Ollama (contagens e durações em ns)"""
+
+    def __init__(self):
+        self.info = {}
+
+    def on_llm_end(self, response, **kwargs):
+        try:
+            self.info = dict(response.generations[0][0].generation_info or {})
+        except (IndexError, AttributeError):
+            self.info = {}
+
+    def usage(self) -> dict:
+        """Tokens reais e velocidade de prefill/decode; vazio se o Ollama não informou"""
+        info = self.info
+        if not info:
+            return {}
+
+        prompt_tokens = info.get("prompt_eval_count")
+        completion_tokens = info.get("eval_count")
+        prompt_seconds = (info.get("prompt_eval_duration") or 0) / NANOSECONDS
+        eval_seconds = (info.get("eval_duration") or 0) / NANOSECONDS
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": (prompt_tokens or 0) + (completion_tokens or 0),
+            "prompt_eval_seconds": round(prompt_seconds, 3),
+            "eval_seconds": round(eval_seconds, 3),
+            "load_seconds": round((info.get("load_duration") or 0) / NANOSECONDS, 3),
+            "total_seconds": round((info.get("total_duration") or 0) / NANOSECONDS, 3)
+        }
+        if prompt_tokens and prompt_seconds:
+            usage["prompt_tokens_per_s"] = round(prompt_tokens / prompt_seconds, 1)
+        if completion_tokens and eval_seconds:
+            usage["tokens_per_s"] = round(completion_tokens / eval_seconds, 1)
+        return usage
+
+    def stage_timings(self) -> dict:
+        """Etapas que só o Ollama enxerga: carga do modelo, prefill (prompt) e decode"""
+        usage = self.usage()
+        stages = {}
+        for stage, key in (("model_load", "load_seconds"), ("prompt_eval", "prompt_eval_seconds"),
+                           ("decode", "eval_seconds")):
+            if usage.get(key):
+                stages[stage] = usage[key]
+        return stages
+
+
+def build_trace(question: str, model: str, path: str, result: dict, timings: dict,
+                usage: Optional[dict] = None, error: Optional[str] = None) -> dict:
+    """Registro de uma consulta: caminho (rag/cache/symbol/error), tempos por etapa e tokens"""
+    return {
+        "id": uuid.uuid4().hex[:12],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "question": question,
+        "model": model,
+        "path": path,
+        "response_time": result.get("response_time"),
+        "first_token_time": result.get("first_token_time"),
+        "stages": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        "usage": usage or {},
+        "context": result.get("context", {}),
+        "filters": result.get("filters", {}),
+        "sources": len(result.get("sources", [])),
+        "error": error
+    }
+
+
+class QueryTraceLog:
+    """Traces em JSONL (só acrescenta; gira para .1 ao passar do tamanho máximo) e os últimos em memória"""
+
+    def __init__(self, path: Optional[str], max_bytes: int = 20 * 1024 * 1024, keep_recent: int = 50):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.recent = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+
+    def append(self, trace: dict):
+        with self._lock:
+            self.recent.append(trace)
+            if not self.path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace, ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                print(f"⚠️ Erro ao gravar trace: {e}")
+
+    def get_recent(self, limit: int = 20) -> List[dict]:
+        with self._lock:
+            return list(self.recent)[-limit:]
+
+    def get_summary(self) -> dict:
+        """Médias das consultas recentes que passaram pelo LLM"""
+        with self._lock:
+            traces = [trace for trace in self.recent if trace["path"] == "rag"]
+        if not traces:
+            return {"queries": 0}
+
+        stages = {}
+        for trace in traces:
+            for stage, seconds in trace["stages"].items():
+                stages.setdefault(stage, []).append(seconds)
+        speeds = [trace["usage"]["tokens_per_s"] for trace in traces if trace["usage"].get("tokens_per_s")]
+        return {
+            "queries": len(traces),
+            "avg_stages": {stage: round(sum(values) / len(values), 3) for stage, values in stages.items()},
+            "avg_tokens_per_s": round(sum(speeds) / len(speeds), 1) if speeds else None,
+            "total_tokens": sum(trace["usage"].get("total_tokens", 0) for trace in traces)
+        }
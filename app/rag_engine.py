@@ -1,14 +1,36 @@
 import os
-from typing import List, Optional
-from langchain.document_loaders import DirectoryLoader, TextLoader
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from typing import Iterable, Iterator, List, Optional, Union
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import Chroma
 from langchain.embeddings import OllamaEmbeddings
 from langchain.llms import Ollama
-from langchain.chains import RetrievalQA
 from langchain.schema import Document
-from langchain.prompts import PromptTemplate
 from config import Config
+from answer_cache import AnswerCache
+from context_packer import ContextPacker, estimate_tokens
+from ast_chunker import TREE_SITTER_AVAILABLE, chunk_sources, is_supported
+from embedding_cache import CachedEmbeddings
+from indexing_pipeline import AdaptiveBatchSizer, EmbeddingPipeline
+from index_jobs import IndexJobManager
+from index_manifest import IndexManifest, hash_content, make_chunk_id
+from lexical_index import LexicalIndex, find_identifier_query, find_quoted_identifiers
+from metrics import KRAGMetrics
+from model_manager import ModelManager
+from ollama_client import OllamaClient
+from ollama_scheduler import (GENERATION, INDEX_EMBEDDING, QUERY_EMBEDDING, OllamaScheduler, RequestRejected,
+                              ScheduledEmbeddings)
+from query_trace import OllamaUsageHandler, QueryTraceLog, add_timing, build_trace
+from query_router import clean_filters, get_chunk_metadata, infer_filters, to_chroma_where
+from reranker import Reranker
+from stats_monitor import StatsMonitor
+from system_monitor import SystemMonitor
+from symbol_index import SymbolIndex, extract_all, parse_symbol_question
+from source_walker import (SOURCE_EXTENSIONS, DOC_EXTENSIONS, walk_files, read_text_files,
+                           is_indexable, has_ignored_dir)
 
 
 class KRAGEngine:
@@ -17,46 +39,180 @@ class KRAGEngine:
         self.embeddings = None
         self.vectorstore = None
         self.llm = None
-        self.qa_chain = None
         self.file_watcher = None
-        self.last_index_time = None
+        self.manifest = IndexManifest(self.config.CHROMA_DB_PATH)
+        self.lexical_index = LexicalIndex(self.config.CHROMA_DB_PATH)
+        self.reranker = None
+        self.symbol_index = SymbolIndex(self.config.CHROMA_DB_PATH)
+        self.retrieval_k = self.config.MAX_RESULTS
+        self.ollama = OllamaClient(self.config.OLLAMA_BASE_URL, cache_ttl=self.config.OLLAMA_CACHE_TTL)
+        self.scheduler = OllamaScheduler(
+            self.config.OLLAMA_MAX_PARALLEL,
+            limits={
+                QUERY_EMBEDDING: self.config.SCHEDULER_QUERY_EMBEDDING_LIMIT,
+                GENERATION: self.config.SCHEDULER_GENERATION_LIMIT,
+                INDEX_EMBEDDING: self.config.SCHEDULER_INDEX_EMBEDDING_LIMIT
+            },
+            queue_limits={
+                QUERY_EMBEDDING: self.config.SCHEDULER_QUERY_EMBEDDING_QUEUE,
+                GENERATION: self.config.SCHEDULER_GENERATION_QUEUE
+            },
+            deadlines={
+                QUERY_EMBEDDING: self.config.SCHEDULER_QUERY_EMBEDDING_DEADLINE,
+                GENERATION: self.config.SCHEDULER_GENERATION_DEADLINE
+            }
+        )
+        index_slots = self.scheduler.limits[INDEX_EMBEDDING]
+        if index_slots < self.config.EMBED_CONCURRENCY:
+            print(f"⚠️ Indexação limitada a {index_slots} chamadas simultâneas ao Ollama (vagas reservadas às "
+                  f"perguntas): só {index_slots} dos {self.config.EMBED_CONCURRENCY} lotes (EMBED_CONCURRENCY) "
+                  f"rodam em paralelo")
+        self.model_manager = ModelManager(
+            self,
+            max_models=self.config.MODEL_POOL_SIZE,
+            keep_alive=self.config.MODEL_KEEP_ALIVE
+        )
+        self.stats_monitor = StatsMonitor(self, interval=self.config.HEALTH_CHECK_INTERVAL)
+        self.system_monitor = SystemMonitor(
+            interval=self.config.SYSTEM_MONITOR_INTERVAL,
+            history_size=self.config.SYSTEM_MONITOR_HISTORY
+        )
+        self.query_traces = QueryTraceLog(
+            self.config.QUERY_TRACE_PATH if self.config.QUERY_TRACE_ENABLED else None,
+            max_bytes=self.config.QUERY_TRACE_MAX_MB * 1024 * 1024
+        )
+        self.metrics = KRAGMetrics(self)
+        self._index_lock = threading.RLock()
+        self.auto_reindexer = None
+        self.index_jobs = IndexJobManager(self)
+        self.answer_cache = AnswerCache(
+            max_entries=self.config.ANSWER_CACHE_MAX_ENTRIES,
+            ttl=self.config.ANSWER_CACHE_TTL,
+            similarity_threshold=self.config.ANSWER_CACHE_SIMILARITY
+        )
+        self.batch_sizer = AdaptiveBatchSizer(
+            initial=self.config.EMBED_BATCH_SIZE,
+            minimum=self.config.EMBED_BATCH_MIN,
+            maximum=self.config.EMBED_BATCH_MAX,
+            target_latency=self.config.EMBED_TARGET_LATENCY
+        )
 
     def initialize(self):
         """Inicializa todos os componentes do RAG"""
         print("🚀 Inicializando KRAG...")
 
-        self.embeddings = OllamaEmbeddings(
-            base_url=self.config.OLLAMA_BASE_URL,
-            model=self.config.EMBEDDING_MODEL
+        # O escalonador fica abaixo do cache: acertos de cache não entram na fila do Ollama
+        self.embeddings = ScheduledEmbeddings(
+            OllamaEmbeddings(
+                base_url=self.config.OLLAMA_BASE_URL,
+                model=self.config.EMBEDDING_MODEL
+            ),
+            self.scheduler
         )
 
-        self.llm = self._create_optimized_llm(self.config.DEFAULT_MODEL)
+        if self.config.EMBEDDING_CACHE_ENABLED:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model_name=self.config.EMBEDDING_MODEL,
+                path=self.config.EMBEDDING_CACHE_PATH,
+                max_entries=self.config.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+
+        self.reranker = Reranker(
+            self._fetch_chunk_embeddings,
+            self.embeddings.embed_query,
+            mode=self.config.RERANK_MODE,
+            mmr_lambda=self.config.RERANK_MMR_LAMBDA,
+            dedupe_overlap=self.config.RERANK_DEDUPE_OVERLAP,
+            llm_top=self.config.RERANK_LLM_TOP
+        )
 
         self.vectorstore = Chroma(
             persist_directory=self.config.CHROMA_DB_PATH,
             embedding_function=self.embeddings
         )
 
-        template = self._get_optimized_template(self.config.DEFAULT_MODEL)
-        prompt = PromptTemplate(
-            input_variables=["context", "question"],
-            template=template
-        )
+        self._activate_model(self.config.DEFAULT_MODEL)
+        if self.config.MODEL_WARMUP:
+            self.model_manager.warm_up(self.config.DEFAULT_MODEL)
 
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(
-                search_kwargs={"k": self.config.MAX_RESULTS}
-            ),
-            return_source_documents=True,
-            chain_type_kwargs={"prompt": prompt}
-        )
+        if self.config.HYBRID_SEARCH:
+            self._sync_lexical_index()
+
+        if self.config.SYMBOL_LOOKUP:
+            self._sync_symbol_index()
+
+        self.stats_monitor.refresh_counts()
+        self.stats_monitor.start()
+        self.system_monitor.start()
+        if self.config.METRICS_ENABLED:
+            self.metrics.start_server(self.config.METRICS_PORT, self.config.METRICS_HOST)
 
         print("KRAG inicializado com sucesso!")
 
-    def _create_optimized_llm(self, model_name: str):
-        """Cria LLM com parâmetros otimizados"""
+    def _sync_lexical_index(self):
+        """Reconstrói o índice léxico a partir do Chroma se estiver ausente ou defasado"""
+        try:
+            if len(self.lexical_index) == self.manifest.total_chunks():
+                return
+
+            print("🔤 Reconstruindo índice léxico a partir do Chroma...")
+            self.lexical_index.clear()
+            collection = self.vectorstore._collection
+            offset, page_size = 0, 1000
+            while True:
+                page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+                ids = page.get("ids", [])
+                if not ids:
+                    break
+                for chunk_id, text, metadata in zip(ids, page["documents"], page["metadatas"]):
+                    self.lexical_index.add(chunk_id, text or "", metadata)
+                offset += len(ids)
+
+            self.lexical_index.save()
+            print(f"🔤 Índice léxico: {len(self.lexical_index)} chunks")
+        except Exception as e:
+            print(f"⚠️ Erro ao reconstruir índice léxico: {e}")
+
+    def _sync_symbol_index(self):
+        """Extrai os símbolos dos arquivos do manifesto se o índice estiver ausente ou defasado"""
+        try:
+            if set(self.symbol_index.files) == set(self.manifest.files):
+                return
+
+            print("🏷️ Reconstruindo índice de símbolos...")
+            self.symbol_index.clear()
+            contents = read_text_files(
+                [path for path in self.manifest.files if os.path.exists(path)],
+                max_workers=self.config.LOADER_WORKERS,
+                max_chars=self._get_max_document_size()
+            )
+            for source, symbols in extract_all(contents, max_workers=self.config.CHUNK_WORKERS).items():
+                self.symbol_index.set_file(source, symbols)
+
+            self.symbol_index.save()
+            print(f"🏷️ Índice de símbolos: {self.symbol_index.get_stats()}")
+        except Exception as e:
+            print(f"⚠️ Erro ao reconstruir índice de símbolos: {e}")
+
+    def _reset_collection(self):
+        """Apaga a coleção do Chroma e recria a vectorstore"""
+        try:
+            self.vectorstore.delete_collection()
+        except:
+            pass
+
+        self.vectorstore = Chroma(
+            persist_directory=self.config.CHROMA_DB_PATH,
+            embedding_function=self.embeddings
+        )
+        self._activate_model(self.get_current_model())
+        self.lexical_index.clear()
+        self.symbol_index.clear()
+        self.stats_monitor.refresh_counts()
+
+    def _get_model_params(self, model_name: str) -> dict:
+        """Parâmetros de geração (inclui num_ctx) para cada modelo"""
         model_configs = {
             "gemma3:270m": {
                 "temperature": 0.2,
@@ -109,7 +265,7 @@ class KRAGEngine:
             }
         }
 
-        config = model_configs.get(model_name, {
+        return model_configs.get(model_name, {
             "temperature": 0.1,
             "top_k": 40,
             "top_p": 0.9,
@@ -117,12 +273,25 @@ class KRAGEngine:
             "num_ctx": 2048,
         })
 
+    def _create_optimized_llm(self, model_name: str):
+        """Cria LLM com parâmetros otimizados"""
+        config = self._get_model_params(model_name)
+        callback = self.metrics.llm_callback(model_name)
+
         return Ollama(
             base_url=self.config.OLLAMA_BASE_URL,
             model=model_name,
+            keep_alive=self.config.MODEL_KEEP_ALIVE,
+            callbacks=[callback] if callback else None,
             **config
         )
 
+    def _activate_model(self, model_name: str):
+        """Passa a usar o LLM do pool para o modelo (sem recriar nada que já exista)"""
+        entry = self.model_manager.get(model_name)
+        self.llm = entry["llm"]
+        self.retrieval_k = entry["k"]
+
     def _get_optimized_template(self, model_name: str) -> str:
         """Retorna template otimizado para cada modelo"""
         if model_name in ["gemma3:270m", "qwen3:0.6b"]:
@@ -241,83 +410,64 @@ RESPOSTA:"""
             "quality": "Unknown"
         })
 
-    def load_documents(self) -> List[Document]:
-        """Carrega documentos da pasta configurada"""
-        documents = []
+    def _get_max_document_size(self) -> int:
+        """Tamanho máximo (caracteres) de arquivo para o modelo atual"""
+        max_sizes = {
+            "gemma3:270m": 15000, "qwen3:0.6b": 20000,
+            "gemma3:1b": 25000, "deepseek-r1:1.5b": 30000,
+            "qwen3:1.7b": 40000, "qwen2.5:3b": 50000, "gemma3:4b": 60000
+        }
 
-        patterns = [
-            "**/*.py", "**/*.java", "**/*.php", "**/*.rb",
-            "**/*.go", "**/*.cpp", "**/*.c", "**/*.h",
-            "**/*.cs", "**/*.kt", "**/*.swift", "**/*.rs",
-            "**/*.js", "**/*.ts", "**/*.jsx", "**/*.tsx",
-            "**/*.vue", "**/*.html", "**/*.css", "**/*.scss",
-            "**/*.json", "**/*.xml", "**/*.yaml", "**/*.yml",
-            "**/*.sql", "**/*.properties", "**/*.conf",
-            "**/*.env", "**/*.ini", "**/*.md", "**/*.txt", "**/*.rst"
-        ]
+        return max_sizes.get(self.get_current_model(), 30000)
 
-        ignore_patterns = [
-            "**/node_modules/**", "**/venv/**", "**/env/**",
-            "**/.git/**", "**/build/**", "**/dist/**",
-            "**/*.log", "**/*.tmp", "**/target/**", "**/.pytest_cache/**"
-        ]
+    def scan_source_files(self) -> dict:
+        """Lista arquivos indexáveis (caminho → tamanho/mtime) em uma única passada"""
+        files = {}
 
         source_path = self.config.SOURCE_CODE_PATH
         if os.path.exists(source_path):
             print(f"Carregando de: {source_path}")
-
-            for pattern in patterns:
-                try:
-                    loader = DirectoryLoader(
-                        source_path,
-                        glob=pattern,
-                        loader_cls=TextLoader,
-                        loader_kwargs={"encoding": "utf-8"},
-                        silent_errors=True,
-                        exclude=ignore_patterns
-                    )
-                    docs = loader.load()
-
-                    max_sizes = {
-                        "gemma3:270m": 15000, "qwen3:0.6b": 20000,
-                        "gemma3:1b": 25000, "deepseek-r1:1.5b": 30000,
-                        "qwen3:1.7b": 40000, "qwen2.5:3b": 50000, "gemma3:4b": 60000
-                    }
-
-                    current_model = self.get_current_model()
-                    max_size = max_sizes.get(current_model, 30000)
-
-                    filtered_docs = [doc for doc in docs if len(doc.page_content) < max_size]
-                    documents.extend(filtered_docs)
-
-                except Exception as e:
-                    print(f"⚠️ Erro em {pattern}: {e}")
-                    continue
+            files.update(walk_files(source_path, SOURCE_EXTENSIONS))
 
         docs_path = self.config.DOCS_PATH
         if os.path.exists(docs_path):
             print(f"📚 Carregando docs de: {docs_path}")
-            for pattern in ["**/*.md", "**/*.txt", "**/*.rst"]:
-                try:
-                    loader = DirectoryLoader(
-                        docs_path,
-                        glob=pattern,
-                        loader_cls=TextLoader,
-                        loader_kwargs={"encoding": "utf-8"},
-                        silent_errors=True
-                    )
-                    documents.extend(loader.load())
-                except Exception as e:
-                    print(f"⚠️ Erro em docs {pattern}: {e}")
-                    continue
+            files.update(walk_files(docs_path, DOC_EXTENSIONS))
+
+        return files
+
+    def load_documents(self, paths: Optional[List[str]] = None) -> List[Document]:
+        """Carrega documentos da pasta configurada (ou apenas os caminhos informados)"""
+        if paths is None:
+            paths = list(self.scan_source_files())
+
+        # Limite por modelo só para o código; documentação (DOCS_PATH) entra inteira
+        docs_root = os.path.normpath(self.config.DOCS_PATH) + os.sep
+        doc_paths = [path for path in paths if os.path.normpath(path).startswith(docs_root)]
+        code_paths = [path for path in paths if not os.path.normpath(path).startswith(docs_root)]
+
+        oversized = []
+        contents = read_text_files(
+            code_paths,
+            max_workers=self.config.LOADER_WORKERS,
+            max_chars=self._get_max_document_size(),
+            oversized=oversized
+        )
+        contents.update(read_text_files(doc_paths, max_workers=self.config.LOADER_WORKERS))
+        if oversized:
+            print(f"⚠️ {len(oversized)} arquivos ignorados por passarem de "
+                  f"{self._get_max_document_size()} caracteres")
+
+        documents = [
+            Document(page_content=content, metadata={"source": path})
+            for path, content in contents.items()
+        ]
 
         print(f"📄 Total carregado: {len(documents)}")
         return documents
 
-    def process_documents(self, documents: List[Document]) -> List[Document]:
-        """Processa e fragmenta documentos"""
-        print("Fragmentando documentos...")
-
+    def _get_chunk_config(self) -> dict:
+        """Tamanho/sobreposição de chunk para o modelo atual"""
         current_model = self.get_current_model()
         chunk_configs = {
             "gemma3:270m": {"size": 600, "overlap": 100},
@@ -329,144 +479,393 @@ RESPOSTA:"""
             "gemma3:4b": {"size": 1400, "overlap": 280}
         }
 
-        config = chunk_configs.get(current_model, {"size": 1000, "overlap": 200})
+        return chunk_configs.get(current_model, {"size": 1000, "overlap": 200})
+
+    def process_documents(self, documents: List[Document]) -> List[Document]:
+        """Processa e fragmenta documentos"""
+        print("Fragmentando documentos...")
+
+        config = self._get_chunk_config()
+
+        chunks = []
+        if self._use_ast_chunking():
+            ast_chunks, documents = self._split_with_ast(documents, config)
+            chunks.extend(ast_chunks)
 
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=config["size"],
             chunk_overlap=config["overlap"],
+            add_start_index=True,
             separators=["\n\nclass ", "\n\ndef ", "\n\nfunction ", "\n\npublic ", "\n\nimport ", "\n\n", "\n", " ", ""]
         )
 
-        chunks = text_splitter.split_documents(documents)
+        chunks.extend(text_splitter.split_documents(documents))
+        texts = {doc.metadata.get("source", ""): doc.page_content for doc in documents}
 
         for chunk in chunks:
             source_path = chunk.metadata.get("source", "")
 
-            if source_path.endswith(('.py', '.java', '.js', '.php', '.cpp', '.c', '.h')):
-                chunk.metadata["type"] = "source_code"
-            elif source_path.endswith(('.md', '.txt', '.rst')):
-                chunk.metadata["type"] = "documentation"
-            elif source_path.endswith(('.json', '.yaml', '.yml', '.xml')):
-                chunk.metadata["type"] = "configuration"
-            else:
-                chunk.metadata["type"] = "other"
-
-            filename = os.path.basename(source_path)
-            chunk.metadata["filename"] = filename
-
-            ext = filename.split('.')[-1] if '.' in filename else ''
-            language_map = {
-                'py': 'python', 'java': 'java', 'js': 'javascript',
-                'ts': 'typescript', 'php': 'php', 'rb': 'ruby',
-                'go': 'go', 'cpp': 'cpp', 'c': 'c', 'h': 'c',
-                'cs': 'csharp', 'kt': 'kotlin', 'swift': 'swift',
-                'rs': 'rust', 'html': 'html', 'css': 'css'
-            }
-            chunk.metadata["language"] = language_map.get(ext, 'unknown')
+            # Faixa de linhas (a AST já preenche) e, para o splitter de caracteres, que corta no meio
+            # da linha, os offsets no arquivo: chunks vizinhos são fundidos no contexto sem repetir texto
+            start_index = chunk.metadata.pop("start_index", None)
+            if "start_line" not in chunk.metadata and start_index is not None and start_index >= 0:
+                start_line = texts.get(source_path, "").count("\n", 0, start_index) + 1
+                chunk.metadata["start_line"] = start_line
+                chunk.metadata["end_line"] = start_line + chunk.page_content.count("\n")
+                chunk.metadata["start_char"] = start_index
+                chunk.metadata["end_char"] = start_index + len(chunk.page_content)
+
+            chunk.metadata.update(get_chunk_metadata(source_path))
+            chunk.metadata["filename"] = os.path.basename(source_path)
 
         print(f"Chunks criados: {len(chunks)}")
         return chunks
 
-    def index_documents(self, force_reindex: bool = False):
-        """Indexa documentos no ChromaDB"""
-        try:
-            existing_count = 0
-            try:
-                existing_count = self.vectorstore._collection.count()
-            except:
-                existing_count = 0
+    def _use_ast_chunking(self) -> bool:
+        return self.config.AST_CHUNKING and TREE_SITTER_AVAILABLE
+
+    def _split_with_ast(self, documents: List[Document], config: dict) -> tuple:
+        """Fragmenta pela AST os arquivos suportados; devolve (chunks, documentos restantes)"""
+        supported = {}
+        remaining = []
+        for doc in documents:
+            source = doc.metadata.get("source", "")
+            if is_supported(source):
+                supported[source] = doc
+            else:
+                remaining.append(doc)
 
-            if not force_reindex and existing_count > 0:
-                print("📚 Índice já existe.")
-                return
+        if not supported:
+            return [], remaining
 
-            print("📄 Indexando documentos...")
+        # Sem sobreposição entre chunks da AST, então cabe uma unidade inteira maior
+        results = chunk_sources(
+            {source: doc.page_content for source, doc in supported.items()},
+            max_chars=config["size"] * 2,
+            max_workers=self.config.CHUNK_WORKERS
+        )
 
-            if force_reindex or existing_count == 0:
-                print("🗑️ Recriando índice...")
+        chunks = []
+        for source, doc in supported.items():
+            pieces = results.get(source)
+            if pieces is None:
+                # Parse falhou: divisão por caracteres
+                remaining.append(doc)
+                continue
+
+            for piece in pieces:
+                metadata = dict(doc.metadata)
+                metadata.update({key: value for key, value in piece.items() if key != "content"})
+                chunks.append(Document(page_content=piece["content"], metadata=metadata))
+
+        print(f"🌳 {len(supported)} arquivos fragmentados pela AST")
+        return chunks, remaining
+
+    def _get_index_settings(self) -> dict:
+        """Configurações que, se mudarem, invalidam chunks/vetores existentes"""
+        chunking = dict(self._get_chunk_config())
+        chunking["ast"] = self._use_ast_chunking()
+        # Versão dos metadados (type/language/extension, offsets) gravados nos chunks
+        chunking["metadata"] = 3
+        return {
+            "embedding_model": self.config.EMBEDDING_MODEL,
+            "chunking": chunking
+        }
+
+    def _assign_chunk_ids(self, chunks: List[Document]) -> List[str]:
+        """Gera IDs estáveis (arquivo + conteúdo) para cada chunk"""
+        occurrences = {}
+        ids = []
+
+        for chunk in chunks:
+            source = chunk.metadata.get("source", "")
+            key = (source, chunk.page_content)
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            ids.append(make_chunk_id(source, chunk.page_content, occurrence))
+
+        return ids
+
+    def index_documents(self, force_reindex: bool = False, progress=None):
+        """Indexa documentos no ChromaDB (incremental por arquivo)
+
+        `progress` é opcional (ex.: IndexJob) e recebe as atualizações de andamento.
+        """
+        with self._index_lock:
+            try:
+                existing_count = 0
                 try:
-                    self.vectorstore.delete_collection()
+                    existing_count = self.vectorstore._collection.count()
                 except:
-                    pass
+                    existing_count = 0
+
+                if not force_reindex and existing_count > 0:
+                    print("📚 Índice já existe.")
+                    return
+
+                print("📄 Indexando documentos...")
+
+                settings = self._get_index_settings()
+                if existing_count == 0 or not self.manifest.files or self.manifest.requires_rebuild(settings):
+                    print("🗑️ Recriando índice...")
+                    self._reset_collection()
+                    self.manifest.reset(settings)
 
-                self.vectorstore = Chroma(
-                    persist_directory=self.config.CHROMA_DB_PATH,
-                    embedding_function=self.embeddings
-                )
+                if progress:
+                    progress.update(phase="varrendo arquivos")
 
-            documents = self.load_documents()
-            if not documents:
-                print("⚠️ Nenhum documento encontrado!")
+                files = self.scan_source_files()
+                if progress:
+                    progress.update(files_scanned=len(files))
+
+                if not files and not self.manifest.files:
+                    print("⚠️ Nenhum documento encontrado!")
+                    return
+
+                self._apply_changes(files, progress=progress)
+
+            except Exception as e:
+                print(f"Erro na indexação: {e}")
+                self.stats_monitor.refresh_counts()
+                raise e
+
+    def _to_index_path(self, path: str) -> Optional[tuple]:
+        """Converte um caminho (ex.: de evento do watchdog) para a chave do manifesto e extensões aceitas"""
+        absolute = os.path.abspath(path)
+        roots = [
+            (self.config.SOURCE_CODE_PATH, SOURCE_EXTENSIONS),
+            (self.config.DOCS_PATH, DOC_EXTENSIONS)
+        ]
+
+        for root, extensions in roots:
+            root_abs = os.path.abspath(root)
+            if absolute == root_abs or absolute.startswith(root_abs + os.sep):
+                relative = os.path.relpath(absolute, root_abs)
+                return os.path.normpath(os.path.join(root, relative)), relative, extensions
+
+        return None
+
+    def index_files(self, paths: List[str]):
+        """Aplica ao índice apenas os caminhos informados (criados, alterados, movidos ou removidos)"""
+        with self._index_lock:
+            settings = self._get_index_settings()
+            if (not self.manifest.files or self.manifest.requires_rebuild(settings)
+                    or self.manifest.chunking_changed(settings)):
+                self.index_documents(force_reindex=True)
                 return
 
-            chunks = self.process_documents(documents)
-            if not chunks:
-                print("⚠️ Nenhum chunk criado!")
+            files = {}
+            scope = set()
+
+            for path in paths:
+                resolved = self._to_index_path(path)
+                if not resolved:
+                    continue
+                key, relative, extensions = resolved
+
+                # Tudo o que o manifesto conhecia sob esse caminho entra no escopo
+                scope.add(key)
+                prefix = key + os.sep
+                scope.update(known for known in list(self.manifest.files) if known.startswith(prefix))
+
+                if os.path.isdir(key):
+                    if not has_ignored_dir(relative):
+                        found = walk_files(key, extensions)
+                        files.update(found)
+                        scope.update(found)
+                elif os.path.isfile(key) and is_indexable(relative, extensions):
+                    try:
+                        stat = os.stat(key)
+                        files[key] = {"size": stat.st_size, "mtime": stat.st_mtime}
+                    except OSError:
+                        pass
+
+            if not scope:
                 return
 
-            batch_sizes = {
-                "gemma3:270m": 25, "qwen3:0.6b": 30, "gemma3:1b": 40,
-                "deepseek-r1:1.5b": 50, "qwen3:1.7b": 75, "qwen2.5:3b": 100, "gemma3:4b": 150
+            print(f"🔄 Atualizando {len(scope)} caminhos no índice...")
+            self._apply_changes(files, scope=scope)
+
+    def _apply_changes(self, files: dict, scope: Optional[set] = None, progress=None):
+        """Sincroniza índice e manifesto com os arquivos encontrados (todos, ou só os do escopo)"""
+        started = time.time()
+        settings = self._get_index_settings()
+        rechunk_all = self.manifest.chunking_changed(settings)
+        if rechunk_all:
+            print("✂️ Configuração de chunks mudou, refragmentando tudo")
+
+        # Arquivos com mesmo tamanho/mtime do manifesto nem são lidos
+        current = {}
+        to_read = []
+        for source, info in files.items():
+            entry = self.manifest.get(source)
+            if not rechunk_all and entry and entry.get("size") == info["size"] and entry.get("mtime") == info["mtime"]:
+                current[source] = {"size": info["size"], "mtime": info["mtime"], "hash": entry.get("hash")}
+            else:
+                to_read.append(source)
+
+        if progress:
+            progress.update(phase="lendo arquivos")
+
+        documents = self.load_documents(to_read)
+
+        docs_by_source = {}
+        for doc in documents:
+            source = doc.metadata.get("source", "")
+            docs_by_source.setdefault(source, []).append(doc)
+            current[source] = {
+                "size": files[source]["size"],
+                "mtime": files[source]["mtime"],
+                "hash": hash_content(doc.page_content)
             }
 
-            current_model = self.get_current_model()
-            batch_size = batch_sizes.get(current_model, 50)
+        added, changed, unchanged, deleted = self.manifest.diff(current, force_all=rechunk_all, scope=scope)
+        print(f"🔍 Novos: {len(added)} | Alterados: {len(changed)} | "
+              f"Removidos: {len(deleted)} | Inalterados: {len(unchanged)}")
+
+        for source in unchanged:
+            entry = self.manifest.get(source)
+            info = current[source]
+            self.manifest.set_file(source, info["size"], info["mtime"], info["hash"], entry.get("chunk_ids", []))
+
+        stale_ids = []
+        for source in deleted:
+            stale_ids.extend(self.manifest.get(source).get("chunk_ids", []))
+
+        to_process = added + changed
+        if progress:
+            progress.update(phase="fragmentando", files_to_process=len(to_process))
+
+        chunks = []
+        if to_process:
+            chunks = self.process_documents([doc for source in to_process for doc in docs_by_source[source]])
+
+        chunk_ids = self._assign_chunk_ids(chunks)
+
+        ids_by_source = {source: [] for source in to_process}
+        for chunk, chunk_id in zip(chunks, chunk_ids):
+            ids_by_source[chunk.metadata.get("source", "")].append(chunk_id)
+
+        pending = []
+        for source in to_process:
+            old_ids = set(self.manifest.get(source).get("chunk_ids", []))
+            new_ids = set(ids_by_source[source])
+            stale_ids.extend(old_ids - new_ids)
+            if rechunk_all:
+                # Mesmo texto pode ter metadados novos; o cache de embeddings evita recalcular vetores
+                pending.extend(ids_by_source[source])
+            else:
+                pending.extend(chunk_id for chunk_id in ids_by_source[source] if chunk_id not in old_ids)
 
-            for i in range(0, len(chunks), batch_size):
-                batch = chunks[i:i + batch_size]
-                print(f"Lote {i // batch_size + 1}/{(len(chunks) // batch_size) + 1}")
-                try:
-                    self.vectorstore.add_documents(batch)
-                except Exception as e:
-                    print(f"⚠️ Erro no lote: {e}")
-                    continue
+        pending_set = set(pending)
+        pending_chunks = [(chunk_id, chunk) for chunk, chunk_id in zip(chunks, chunk_ids) if chunk_id in pending_set]
 
-            try:
-                self.vectorstore.persist()
-            except:
-                pass
+        if stale_ids or pending_chunks:
+            self.manifest.bump_version()
 
-            print("Indexação concluída!")
+        if stale_ids:
+            print(f"🧹 Removendo {len(stale_ids)} chunks obsoletos")
+            for i in range(0, len(stale_ids), 500):
+                self.vectorstore.delete(ids=stale_ids[i:i + 500])
 
-        except Exception as e:
-            print(f"Erro na indexação: {e}")
-            raise e
+        print(f"🧩 Chunks a embutir: {len(pending_chunks)} de {len(chunks)}")
+        if progress:
+            progress.update(phase="embedding", chunks_total=len(pending_chunks))
+
+        pipeline = EmbeddingPipeline(
+            self.embeddings,
+            self.vectorstore._collection,
+            self.batch_sizer,
+            concurrency=self.config.EMBED_CONCURRENCY
+        )
+        failed_ids = pipeline.run(pending_chunks, on_progress=progress.set_embedded if progress else None)
+
+        sources_by_id = {chunk_id: chunk.metadata.get("source", "") for chunk_id, chunk in pending_chunks}
+        failed_sources = {sources_by_id[chunk_id] for chunk_id in failed_ids}
+
+        for source in to_process:
+            if source in failed_sources:
+                continue
+            info = current[source]
+            self.manifest.set_file(source, info["size"], info["mtime"], info["hash"], ids_by_source[source])
+
+        for source in deleted:
+            self.manifest.remove_file(source)
+
+        self.manifest.update_settings(settings)
+        self.manifest.save()
+
+        if stale_ids or pending_chunks:
+            for chunk_id in stale_ids:
+                self.lexical_index.remove(chunk_id)
+            for chunk_id, chunk in pending_chunks:
+                if chunk_id not in failed_ids:
+                    self.lexical_index.add(chunk_id, chunk.page_content, chunk.metadata)
+            self.lexical_index.save()
+
+        if self.config.SYMBOL_LOOKUP and (to_process or deleted):
+            symbols = extract_all(
+                {source: docs_by_source[source][0].page_content for source in to_process},
+                max_workers=self.config.CHUNK_WORKERS
+            )
+            for source, entries in symbols.items():
+                self.symbol_index.set_file(source, entries)
+            for source in deleted:
+                self.symbol_index.remove_file(source)
+            self.symbol_index.save()
 
-    def clear_index(self):
-        """Limpa o índice"""
         try:
-            print("Limpando índice...")
-            self.vectorstore.delete_collection()
+            self.vectorstore.persist()
+        except:
+            pass
+
+        if failed_sources:
+            print(f"⚠️ {len(failed_sources)} arquivos serão reprocessados na próxima indexação")
+            if progress:
+                progress.add_error(f"{len(failed_ids)} chunks de {len(failed_sources)} arquivos falharam")
+
+        self.stats_monitor.mark_indexed()
+        self.metrics.observe_index(
+            time.time() - started,
+            files=len(to_process),
+            embedded=len(pending_chunks) - len(failed_ids),
+            removed=len(stale_ids),
+            failed=len(failed_ids)
+        )
+        print("Indexação concluída!")
 
-            self.vectorstore = Chroma(
-                persist_directory=self.config.CHROMA_DB_PATH,
-                embedding_function=self.embeddings
-            )
+    def start_index_job(self, force_reindex: bool = False) -> str:
+        """Dispara a indexação em background e retorna o ID do job"""
+        return self.index_jobs.start(force_reindex=force_reindex)
 
-            template = self._get_optimized_template(self.get_current_model())
-            prompt = PromptTemplate(input_variables=["context", "question"], template=template)
+    def get_index_job(self, job_id: Optional[str] = None) -> Optional[dict]:
+        """Estado de um job de indexação (ou do mais recente)"""
+        return self.index_jobs.get(job_id)
 
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=self.vectorstore.as_retriever(search_kwargs={"k": self.config.MAX_RESULTS}),
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": prompt}
-            )
+    def clear_index(self):
+        """Limpa o índice"""
+        with self._index_lock:
+            try:
+                print("Limpando índice...")
+                self._reset_collection()
 
-            print("Índice limpo!")
-            return True
+                self.manifest.reset(self._get_index_settings())
+                self.manifest.save()
+                self.lexical_index.save()
+                self.symbol_index.save()
 
-        except Exception as e:
-            print(f"Erro ao limpar: {e}")
-            return False
+                print("Índice limpo!")
+                return True
 
-    def query(self, question: str) -> dict:
-        """Faz consulta no RAG"""
-        if not self.qa_chain:
+            except Exception as e:
+                print(f"Erro ao limpar: {e}")
+                return False
+
+    def _check_index(self) -> Optional[dict]:
+        """Retorna uma resposta pronta quando não há o que consultar"""
+        if self.vectorstore is None or self.llm is None:
             raise Exception("RAG não inicializado")
 
-        # Verificar documentos
         try:
             doc_count = self.vectorstore._collection.count()
             if doc_count == 0:
@@ -482,31 +881,646 @@ RESPOSTA:"""
                 "response_time": 0
             }
 
+        return None
+
+    def _vector_search(self, question: str, k: int, filters: Optional[dict] = None,
+                       timings: Optional[dict] = None) -> List[tuple]:
+        """Busca vetorial direta no Chroma: [(chunk_id, Document, distância)]"""
+        started = time.time()
+        embedding = self.embeddings.embed_query(question)
+        add_timing(timings, "query_embedding", time.time() - started)
+
+        started = time.time()
+        results = self.vectorstore._collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            where=to_chroma_where(filters),
+            include=["documents", "metadatas", "distances"]
+        )
+        add_timing(timings, "vector_search", time.time() - started)
+
+        hits = []
+        for chunk_id, text, metadata, distance in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]):
+            metadata = dict(metadata or {})
+            metadata["chunk_id"] = chunk_id
+            hits.append((chunk_id, Document(page_content=text or "", metadata=metadata), distance))
+        return hits
+
+    def _get_documents_by_ids(self, chunk_ids: List[str]) -> dict:
+        """Carrega chunks do Chroma por ID, sem embedding"""
+        if not chunk_ids:
+            return {}
+
+        page = self.vectorstore._collection.get(ids=chunk_ids, include=["documents", "metadatas"])
+        documents = {}
+        for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            metadata = dict(metadata or {})
+            metadata["chunk_id"] = chunk_id
+            documents[chunk_id] = Document(page_content=text or "", metadata=metadata)
+        return documents
+
+    def _retrieve_documents(self, question: str, k: Optional[int] = None,
+                            filters: Optional[dict] = None, timings: Optional[dict] = None) -> List[Document]:
+        """Busca os chunks relevantes: BM25 + vetorial combinados por Reciprocal Rank Fusion
+
+        `filters` (type/language/extension) é aplicado nas duas buscas, antes do ranking.
+        `timings` recebe o tempo de cada sub-etapa (embedding da pergunta, busca vetorial, BM25).
+        """
+        k = k or self.retrieval_k
+
+        if not self.config.HYBRID_SEARCH or not len(self.lexical_index):
+            return [doc for _, doc, _ in self._vector_search(question, k, filters, timings)]
+
+        # Busca por identificador exato dispensa o embedding da pergunta
+        identifier = find_identifier_query(question)
+        if identifier:
+            started = time.time()
+            hits = self.lexical_index.search(identifier, k, where=filters, exact_term=True)
+            add_timing(timings, "lexical_search", time.time() - started)
+            if hits:
+                documents = self._get_documents_by_ids([chunk_id for chunk_id, _ in hits])
+                return [documents[chunk_id] for chunk_id, _ in hits if chunk_id in documents]
+
+        fetch_k = k * self.config.HYBRID_FETCH_MULTIPLIER
+        vector_hits = self._vector_search(question, fetch_k, filters, timings)
+        started = time.time()
+        lexical_hits = self.lexical_index.search(question, fetch_k, where=filters)
+        # Identificador citado (ex.: "como a função `login` trata erros?") reforça quem o contém, sem
+        # abrir mão da busca vetorial
+        exact_hits = [self.lexical_index.search(quoted, fetch_k, where=filters, exact_term=True)
+                      for quoted in find_quoted_identifiers(question)]
+        add_timing(timings, "lexical_search", time.time() - started)
+
+        fused = {}
+        for rank, (chunk_id, _, _) in enumerate(vector_hits):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + self.config.HYBRID_VECTOR_WEIGHT / (60 + rank + 1)
+        for hits in [lexical_hits] + exact_hits:
+            for rank, (chunk_id, _) in enumerate(hits):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + self.config.HYBRID_LEXICAL_WEIGHT / (60 + rank + 1)
+
+        top_ids = sorted(fused, key=fused.get, reverse=True)[:k]
+
+        documents = {chunk_id: doc for chunk_id, doc, _ in vector_hits}
+        documents.update(self._get_documents_by_ids([chunk_id for chunk_id in top_ids if chunk_id not in documents]))
+
+        results = []
+        for chunk_id in top_ids:
+            if chunk_id in documents:
+                documents[chunk_id].metadata["retrieval_score"] = round(fused[chunk_id], 5)
+                results.append(documents[chunk_id])
+        return results
+
+    def _get_context_budget(self, template: str, question: str) -> int:
+        """Tokens disponíveis para os trechos: fração do num_ctx menos template e pergunta"""
+        num_ctx = self._get_model_params(self.get_current_model())["num_ctx"]
+        fixed = estimate_tokens(template.format(context="", question=question))
+        return max(0, int(num_ctx * self.config.CONTEXT_BUDGET_SHARE) - fixed)
+
+    def _build_prompt(self, question: str, documents: List[Document]) -> tuple:
+        """Monta o prompt final com o contexto empacotado no orçamento: (prompt, documentos usados, estatísticas)"""
+        template = self._get_optimized_template(self.get_current_model())
+        packer = ContextPacker(
+            self._get_context_budget(template, question),
+            min_trim_tokens=self.config.CONTEXT_MIN_TRIM_TOKENS
+        )
+        packed, stats = packer.pack(documents)
+        print(f"📦 Contexto: {stats['chunks']} trechos, ~{stats['context_tokens']}/{stats['budget_tokens']} tokens "
+              f"(fundidos: {stats['merged']}, cortados: {stats['trimmed']}, descartados: {stats['dropped']})")
+        return template.format(context=ContextPacker.render(packed), question=question), packed, stats
+
+    def _get_candidate_count(self) -> int:
+        """Candidatos da busca; o orçamento de tokens decide quantos entram no prompt"""
+        return self.retrieval_k * self.config.CONTEXT_CANDIDATE_MULTIPLIER
+
+    def _fetch_chunk_embeddings(self, documents: List[Document]) -> list:
+        """Vetores já gravados no Chroma para os chunks (sem chamar o Ollama)"""
+        chunk_ids = [doc.metadata.get("chunk_id") for doc in documents]
+        found = {}
+        known = [chunk_id for chunk_id in chunk_ids if chunk_id]
+        if known:
+            page = self.vectorstore._collection.get(ids=known, include=["embeddings"])
+            found = dict(zip(page["ids"], page["embeddings"]))
+        return [found.get(chunk_id) if chunk_id else None for chunk_id in chunk_ids]
+
+    def _resolve_filters(self, question: str, filters: Optional[dict]) -> tuple:
+        """Filtros explícitos (UI/API) ou deduzidos da pergunta: (filtros, deduzidos?)"""
+        explicit = clean_filters(filters)
+        if explicit:
+            return explicit, False
+        if self.config.QUERY_ROUTER:
+            return infer_filters(question), True
+        return {}, False
+
+    def _select_documents(self, question: str, filters: Optional[dict] = None, inferred: bool = False,
+                          timings: Optional[dict] = None) -> tuple:
+        """Busca com sobra, deduplica/diversifica e devolve (candidatos, tempos por etapa, filtros aplicados)
+
+        `retrieval` é o total da busca; `query_embedding`, `vector_search` e `lexical_search` detalham.
+        """
+        timings = {} if timings is None else timings
+        target = self._get_candidate_count()
+        rerank = self.config.RERANK_ENABLED and self.reranker is not None
+
+        started = time.time()
+        fetch_k = max(target, self.retrieval_k * self.config.RERANK_FETCH_MULTIPLIER) if rerank else target
+        documents = self._retrieve_documents(question, fetch_k, filters, timings)
+        if not documents and filters and inferred:
+            # Filtro deduzido não casou com nada: busca sem filtro
+            print(f"🎯 Filtro {filters} sem resultados, buscando em tudo")
+            filters = {}
+            documents = self._retrieve_documents(question, fetch_k, timings=timings)
+        timings["retrieval"] = time.time() - started
+
+        if rerank:
+            try:
+                with self.scheduler.slot(GENERATION) if self.reranker.mode == "llm" else nullcontext():
+                    documents, stage_timings = self.reranker.rerank(question, documents, target, llm=self.llm)
+                timings.update(stage_timings)
+            except Exception as e:
+                print(f"⚠️ Erro no rerank, usando ordem da busca: {e}")
+                documents = documents[:target]
+
+        return documents, timings, filters
+
+    @contextmanager
+    def _llm_slot(self, generation_slot=None, deadline_at: Optional[float] = None):
+        """Vaga para gerar: limite do chamador (ex.: lote) e fila de prioridade do Ollama"""
+        with generation_slot or nullcontext():
+            with self.scheduler.slot(GENERATION, deadline_at):
+                yield
+
+    def _format_timings(self, timings: dict) -> dict:
+        return {stage: round(seconds, 3) for stage, seconds in timings.items()}
+
+    def _record_trace(self, question: str, path: str, result: dict, timings: dict,
+                      usage: Optional[OllamaUsageHandler] = None, error: Optional[str] = None):
+        """Completa o resultado com tempos/tokens e grava o trace (path: rag, cache, symbol ou error)"""
+        if usage is not None:
+            timings.update(usage.stage_timings())
+            result["usage"] = usage.usage()
+        result["timings"] = self._format_timings(timings)
+        trace = build_trace(question, self.get_current_model(), path, result, timings, result.get("usage"), error)
+        result["trace_id"] = trace["id"]
+        self.query_traces.append(trace)
+        self.metrics.observe_query(trace)
+
+    def get_index_version(self) -> int:
+        """Versão do conteúdo do índice (muda a cada indexação que altera chunks)"""
+        return self.manifest.version
+
+    def _cache_question(self, question: str, filters: Optional[dict]) -> str:
+        """Filtros explícitos mudam a resposta, então fazem parte da chave do cache"""
+        explicit = clean_filters(filters)
+        if not explicit:
+            return question
+        return question + " " + " ".join(f"[{key}={value}]" for key, value in sorted(explicit.items()))
+
+    def _lookup_answer_cache(self, question: str) -> tuple:
+        """Consulta o cache de respostas; retorna (resultado, embedding da pergunta)"""
+        if not self.config.ANSWER_CACHE_ENABLED:
+            return None, None
+
+        embedding = None
+        if self.answer_cache.semantic_enabled:
+            try:
+                embedding = self.embeddings.embed_query(question)
+            except Exception as e:
+                print(f"⚠️ Cache semântico indisponível: {e}")
+
+        cached = self.answer_cache.get(question, self.get_current_model(), self.get_index_version(), embedding)
+        return cached, embedding
+
+    def _store_answer_cache(self, question: str, index_version: int, result: dict, embedding=None):
+        if not self.config.ANSWER_CACHE_ENABLED:
+            return
+
+        self.answer_cache.put(
+            question,
+            self.get_current_model(),
+            index_version,
+            {"answer": result["answer"], "sources": result["sources"]},
+            embedding
+        )
+
+    def _format_symbol_entries(self, entries: List[dict], describe) -> List[str]:
+        limit = self.config.SYMBOL_LOOKUP_MAX_RESULTS
+        lines = [f"- `{entry['source']}:{entry['line']}` · {describe(entry)}" for entry in entries[:limit]]
+        if len(entries) > limit:
+            lines.append(f"- ... e mais {len(entries) - limit}")
+        return lines
+
+    def _answer_symbol_question(self, question: str, start_time: float) -> tuple:
+        """Responde "onde está X" / "quem chama X" direto do índice de símbolos: (resultado, prompt de explicação)"""
+        if not self.config.SYMBOL_LOOKUP:
+            return None, None
+
+        parsed = parse_symbol_question(question)
+        if not parsed:
+            return None, None
+
+        intent, name = parsed
+        definitions = self.symbol_index.find_definitions(name)
+        references = self.symbol_index.find_references(name) if intent == "references" or not definitions else []
+        if not definitions and not references:
+            return None, None
+
+        def describe_definition(entry):
+            return f"{entry['kind']} `{entry['symbol']}` (linhas {entry['line']}-{entry['end_line']})"
+
+        def describe_reference(entry):
+            return f"em `{entry['caller']}`" if entry.get("caller") else "no nível do módulo"
+
+        lines = []
+        if intent == "definition" and definitions:
+            shown = definitions
+            lines.append(f"**`{name}`** definido em {len(definitions)} local(is):")
+            lines.extend(self._format_symbol_entries(definitions, describe_definition))
+        elif references:
+            shown = references
+            files = {entry["source"] for entry in references}
+            if intent == "definition":
+                lines.append(f"Definição de **`{name}`** não encontrada no índice.")
+            lines.append(f"**`{name}`** é chamado em {len(references)} local(is), {len(files)} arquivo(s):")
+            lines.extend(self._format_symbol_entries(references, describe_reference))
+        else:
+            shown = definitions
+            lines.append(f"Nenhuma chamada de **`{name}`** encontrada no índice. Definido em:")
+            lines.extend(self._format_symbol_entries(definitions, describe_definition))
+
+        sources = list(dict.fromkeys(entry["source"] for entry in shown))
+        result = {
+            "answer": "\n".join(lines),
+            "sources": sources,
+            "response_time": round(time.time() - start_time, 3),
+            "symbol_lookup": True
+        }
+
+        explain_prompt = None
+        if self.config.SYMBOL_LOOKUP_EXPLAIN and definitions:
+            snippet = self._read_definition_snippet(definitions[0])
+            if snippet:
+                explain_prompt = (f"Explique em no máximo 3 frases, em português, o que faz `{name}`.\n\n"
+                                  f"CÓDIGO ({definitions[0]['source']}):\n{snippet}\n\nRESPOSTA:")
+
+        return result, explain_prompt
+
+    def _read_definition_snippet(self, entry: dict, max_lines: int = 80) -> str:
+        """Trecho do arquivo com a definição (para a explicação opcional)"""
+        try:
+            with open(entry["source"], "r", encoding="utf-8", errors="ignore") as f:
+                lines = f.readlines()
+            end_line = min(entry["end_line"], entry["line"] + max_lines - 1)
+            return "".join(lines[entry["line"] - 1:end_line])[:self._get_chunk_config()["size"] * 4]
+        except Exception:
+            return ""
+
+    def query(self, question: str, filters: Optional[dict] = None, generation_slot=None,
+              deadline: Optional[float] = None) -> dict:
+        """Faz consulta no RAG (`filters`: type/language/extension; sem eles, o roteador deduz da pergunta)
+
+        `deadline` (s) limita a espera por vagas no Ollama; esgotado, levanta DeadlineExceeded.
+        """
+        return self._run_query(question, filters, generation_slot, deadline)
+
+    def _run_query(self, question: str, filters: Optional[dict] = None, generation_slot=None,
+                   deadline: Optional[float] = None) -> dict:
+        """Fluxo do `query`; `generation_slot` (semáforo) limita as chamadas simultâneas ao LLM"""
+        deadline_at = time.monotonic() + deadline if deadline else None
+        self.metrics.query_started()
+        try:
+            with self.scheduler.deadline_scope(deadline_at):
+                return self._answer_query(question, filters, generation_slot)
+        finally:
+            self.metrics.query_finished()
+
+    def _answer_query(self, question: str, filters: Optional[dict], generation_slot) -> dict:
+        empty_result = self._check_index()
+        if empty_result:
+            return empty_result
+
         print(f"Pergunta: {question}")
 
-        import time
         start_time = time.time()
-
-        optimized_question = self._optimize_question_for_model(question)
+        index_version = self.get_index_version()
+        timings = {}
+
+        started = time.time()
+        symbol_result, explain_prompt = self._answer_symbol_question(question, start_time)
+        timings["symbol_lookup"] = time.time() - started
+        if symbol_result:
+            usage = None
+            if explain_prompt:
+                usage = OllamaUsageHandler()
+                try:
+                    started = time.time()
+                    with self._llm_slot(generation_slot):
+                        explanation = self.llm.invoke(explain_prompt, config={"callbacks": [usage]})
+                    timings["generation"] = time.time() - started
+                    symbol_result["answer"] += f"\n\n{self._clean_thinking_tags(explanation)}"
+                except Exception as e:
+                    print(f"⚠️ Explicação indisponível: {e}")
+                symbol_result["response_time"] = round(time.time() - start_time, 2)
+            self._record_trace(question, "symbol", symbol_result, timings, usage)
+            return symbol_result
+
+        started = time.time()
+        cache_question = self._cache_question(question, filters)
+        cached, question_embedding = self._lookup_answer_cache(cache_question)
+        timings["cache_lookup"] = time.time() - started
+        if cached:
+            cached["cached"] = True
+            cached["response_time"] = round(time.time() - start_time, 2)
+            self._record_trace(question, "cache", cached, timings)
+            return cached
 
         try:
-            result = self.qa_chain({"query": optimized_question})
+            started = time.time()
+            optimized_question = self._optimize_question_for_model(question)
+            filters, inferred = self._resolve_filters(question, filters)
+            timings["rewrite"] = time.time() - started
+
+            candidates, timings, filters = self._select_documents(optimized_question, filters, inferred, timings)
+
+            started = time.time()
+            prompt, documents, context_stats = self._build_prompt(optimized_question, candidates)
+            timings["packing"] = time.time() - started
+
+            usage = OllamaUsageHandler()
+            started = time.time()
+            with self._llm_slot(generation_slot):
+                if time.time() - started >= 0.001:
+                    timings["generation_wait"] = time.time() - started
+                started = time.time()
+                answer = self.llm.invoke(prompt, config={"callbacks": [usage]})
+            timings["generation"] = time.time() - started
+            self.model_manager.mark_used(self.get_current_model())
             response_time = time.time() - start_time
 
-            cleaned_answer = self._clean_thinking_tags(result["result"])
+            cleaned_answer = self._clean_thinking_tags(answer)
 
-            return {
+            result = {
                 "answer": cleaned_answer,
-                "sources": [doc.metadata.get("source", "Unknown") for doc in result["source_documents"]],
-                "response_time": round(response_time, 2)
+                "sources": [doc.metadata.get("source", "Unknown") for doc in documents],
+                "response_time": round(response_time, 2),
+                "context": context_stats,
+                "filters": filters
             }
+            self._record_trace(question, "rag", result, timings, usage)
+            self._store_answer_cache(cache_question, index_version, result, question_embedding)
+            return result
         except Exception as e:
             response_time = time.time() - start_time
-            return {
+            result = {
                 "answer": f"Erro: {str(e)}",
                 "sources": [],
                 "response_time": round(response_time, 2)
             }
+            self._record_trace(question, "error", result, timings, error=str(e))
+            if isinstance(e, RequestRejected):
+                raise
+            return result
+
+    def query_batch(self, questions: Iterable[Union[str, dict]], max_workers: Optional[int] = None,
+                    max_generations: Optional[int] = None) -> Iterator[dict]:
+        """Responde várias perguntas em paralelo, entregando cada resultado assim que fica pronto
+
+        Cada item é uma string ou {"question", "id"?, "filters"?}. A busca roda em até `max_workers`
+        threads e no máximo `max_generations` chamadas ao LLM ficam abertas ao mesmo tempo.
+        """
+        max_workers = max(1, max_workers or self.config.BATCH_WORKERS)
+        max_generations = max(1, max_generations or self.config.BATCH_MAX_GENERATIONS)
+        generation_slot = threading.BoundedSemaphore(max_generations)
+        model = self.get_current_model()
+
+        def run(position: int, item: Union[str, dict]) -> dict:
+            if isinstance(item, str):
+                item = {"question": item}
+            question = (item.get("question") or "").strip()
+            base = {"id": item.get("id", position), "question": question, "model": model}
+
+            if not question:
+                return dict(base, answer="", error="Pergunta vazia", sources=[], response_time=0)
+            try:
+                result = self._run_query(question, item.get("filters"), generation_slot)
+            except Exception as e:
+                return dict(base, answer="", error=str(e), sources=[], response_time=0)
+
+            if result.get("answer", "").startswith("Erro:"):
+                result["error"] = result["answer"][len("Erro:"):].strip()
+            return dict(base, **result)
+
+        print(f"📦 Lote: {max_workers} buscas em paralelo, até {max_generations} gerações simultâneas")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="krag-batch") as executor:
+            futures = [executor.submit(run, position, item) for position, item in enumerate(questions)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def query_stream(self, question: str, filters: Optional[dict] = None, generation_slot=None,
+                     deadline: Optional[float] = None) -> dict:
+        """Consulta com streaming: fontes já resolvidas e tokens em `tokens` (gerador)
+
+        Ao fim do gerador, `answer`, `response_time` e `first_token_time` são preenchidos.
+        `generation_slot` (semáforo) fica ocupado enquanto o LLM gera; `deadline` (s) limita a
+        espera por vagas no Ollama (RequestRejected na busca; na geração vira mensagem de erro).
+        """
+        deadline_at = time.monotonic() + deadline if deadline else None
+        self.metrics.query_started()
+        try:
+            with self.scheduler.deadline_scope(deadline_at):
+                result = self._start_stream(question, filters, generation_slot, deadline_at)
+        except Exception:
+            self.metrics.query_finished()
+            raise
+
+        if "tokens" not in result:
+            self.metrics.query_finished()
+            return result
+        result["tokens"] = self._track_stream(result["tokens"])
+        return result
+
+    def _track_stream(self, tokens):
+        """A consulta em streaming só termina quando o gerador de tokens termina"""
+        try:
+            yield from tokens
+        finally:
+            self.metrics.query_finished()
+
+    def _start_stream(self, question: str, filters: Optional[dict], generation_slot,
+                      deadline_at: Optional[float]) -> dict:
+        """Busca e monta o prompt; a geração fica no gerador `tokens`"""
+        empty_result = self._check_index()
+        if empty_result:
+            return empty_result
+
+        print(f"Pergunta (stream): {question}")
+
+        start_time = time.time()
+        index_version = self.get_index_version()
+        timings = {}
+
+        started = time.time()
+        symbol_result, explain_prompt = self._answer_symbol_question(question, start_time)
+        timings["symbol_lookup"] = time.time() - started
+        if symbol_result:
+            symbol_result["first_token_time"] = symbol_result["response_time"]
+            symbol_result["tokens"] = self._stream_symbol_answer(symbol_result, explain_prompt, start_time,
+                                                                 question, timings, generation_slot, deadline_at)
+            return symbol_result
+
+        started = time.time()
+        cache_question = self._cache_question(question, filters)
+        cached, question_embedding = self._lookup_answer_cache(cache_question)
+        timings["cache_lookup"] = time.time() - started
+        if cached:
+            cached["cached"] = True
+            cached["response_time"] = round(time.time() - start_time, 2)
+            cached["first_token_time"] = cached["response_time"]
+            self._record_trace(question, "cache", cached, timings)
+            cached["tokens"] = iter([cached["answer"]])
+            return cached
+
+        try:
+            started = time.time()
+            optimized_question = self._optimize_question_for_model(question)
+            filters, inferred = self._resolve_filters(question, filters)
+            timings["rewrite"] = time.time() - started
+
+            candidates, timings, filters = self._select_documents(optimized_question, filters, inferred, timings)
+
+            started = time.time()
+            prompt, documents, context_stats = self._build_prompt(optimized_question, candidates)
+            timings["packing"] = time.time() - started
+        except Exception as e:
+            result = {
+                "answer": f"Erro: {str(e)}",
+                "sources": [],
+                "response_time": round(time.time() - start_time, 2)
+            }
+            self._record_trace(question, "error", result, timings, error=str(e))
+            if isinstance(e, RequestRejected):
+                raise
+            return result
+
+        result = {
+            "answer": "",
+            "sources": [doc.metadata.get("source", "Unknown") for doc in documents],
+            "response_time": 0,
+            "first_token_time": None,
+            "context": context_stats,
+            "filters": filters,
+            "timings": self._format_timings(timings)
+        }
+
+        def generate_tokens():
+            parts = []
+            failed = None
+            usage = OllamaUsageHandler()
+            generation_started = time.time()
+            try:
+                with self._llm_slot(generation_slot, deadline_at):
+                    if time.time() - generation_started >= 0.001:
+                        timings["generation_wait"] = time.time() - generation_started
+                    generation_started = time.time()
+                    stream = self.llm.stream(prompt, config={"callbacks": [usage]})
+                    for piece in self._filter_thinking_stream(stream):
+                        if not parts:
+                            piece = piece.lstrip()
+                            if not piece:
+                                continue
+                            result["first_token_time"] = round(time.time() - start_time, 2)
+                            self.model_manager.mark_used(self.get_current_model())
+                        parts.append(piece)
+                        yield piece
+            except Exception as e:
+                failed = str(e)
+                if isinstance(e, RequestRejected) and not parts:
+                    raise
+                error = f"\n\nErro: {str(e)}"
+                parts.append(error)
+                yield error
+            finally:
+                result["answer"] = self._clean_thinking_tags("".join(parts))
+                result["response_time"] = round(time.time() - start_time, 2)
+                timings["generation"] = time.time() - generation_started
+                self._record_trace(question, "error" if failed else "rag", result, timings, usage, failed)
+
+            if not failed:
+                self._store_answer_cache(cache_question, index_version, result, question_embedding)
+
+        result["tokens"] = generate_tokens()
+        return result
+
+    def _stream_symbol_answer(self, result: dict, explain_prompt: Optional[str], start_time: float,
+                              question: str, timings: dict, generation_slot, deadline_at: Optional[float]):
+        """Entrega a localização na hora e, se configurado, a explicação do LLM em seguida"""
+        yield result["answer"]
+        if not explain_prompt:
+            self._record_trace(question, "symbol", result, timings)
+            return
+
+        parts = []
+        usage = OllamaUsageHandler()
+        generation_started = time.time()
+        try:
+            yield "\n\n"
+            with self._llm_slot(generation_slot, deadline_at):
+                stream = self.llm.stream(explain_prompt, config={"callbacks": [usage]})
+                for piece in self._filter_thinking_stream(stream):
+                    parts.append(piece)
+                    yield piece
+        except Exception as e:
+            print(f"⚠️ Explicação indisponível: {e}")
+        finally:
+            explanation = self._clean_thinking_tags("".join(parts))
+            if explanation:
+                result["answer"] += f"\n\n{explanation}"
+            result["response_time"] = round(time.time() - start_time, 2)
+            timings["generation"] = time.time() - generation_started
+            self._record_trace(question, "symbol", result, timings, usage)
+
+    def _filter_thinking_stream(self, chunks):
+        """Remove blocos <think>/<thinking>/<thought> de um stream, mesmo com tags quebradas entre tokens"""
+        open_tags = ["<think>", "<thinking>", "<thought>"]
+        buffer = ""
+        inside = None
+
+        for chunk in chunks:
+            buffer += chunk
+            while buffer:
+                if inside:
+                    close_tag = f"</{inside}>"
+                    index = buffer.lower().find(close_tag)
+                    if index == -1:
+                        # Guarda só o suficiente para reconhecer uma tag de fechamento partida
+                        buffer = buffer[-(len(close_tag) - 1):]
+                        break
+                    buffer = buffer[index + len(close_tag):]
+                    inside = None
+                    continue
+
+                start = buffer.find("<")
+                if start == -1:
+                    yield buffer
+                    buffer = ""
+                    break
+                if start > 0:
+                    yield buffer[:start]
+                    buffer = buffer[start:]
+
+                lower = buffer.lower()
+                matched = next((tag for tag in open_tags if lower.startswith(tag)), None)
+                if matched:
+                    inside = matched[1:-1]
+                    buffer = buffer[len(matched):]
+                elif any(tag.startswith(lower) for tag in open_tags):
+                    break
+                else:
+                    yield "<"
+                    buffer = buffer[1:]
+
+        if buffer and not inside:
+            yield buffer
 
     def _clean_thinking_tags(self, text: str) -> str:
         """Remove tags de pensamento"""
@@ -550,34 +1564,22 @@ RESPOSTA:"""
     def get_available_models(self) -> dict:
         """Lista modelos disponíveis"""
         try:
-            import requests
-
             all_models = [
                 "gemma3:270m", "qwen3:0.6b", "gemma3:1b",
                 "deepseek-r1:1.5b", "qwen3:1.7b", "qwen2.5:3b", "gemma3:4b"
             ]
 
-            response = requests.get(f"{self.config.OLLAMA_BASE_URL}/api/tags", timeout=5)
+            existing_models = self.ollama.model_names()
 
-            if response.status_code == 200:
-                existing_models = [model["name"] for model in response.json().get("models", [])]
-
-                available = [model for model in all_models if model in existing_models]
-                not_available = [model for model in all_models if model not in existing_models]
+            available = [model for model in all_models if model in existing_models]
+            not_available = [model for model in all_models if model not in existing_models]
 
-                return {
-                    "available": available,
-                    "not_available": not_available,
-                    "total_models": len(existing_models),
-                    "error": None
-                }
-            else:
-                return {
-                    "available": [],
-                    "not_available": all_models,
-                    "total_models": 0,
-                    "error": f"HTTP {response.status_code}"
-                }
+            return {
+                "available": available,
+                "not_available": not_available,
+                "total_models": len(existing_models),
+                "error": None
+            }
 
         except Exception as e:
             return {
@@ -596,41 +1598,26 @@ RESPOSTA:"""
             if new_model not in models_status.get("available", []):
                 return False, f"Modelo {new_model} não está baixado"
 
+            if self.vectorstore and self.vectorstore._collection.count() == 0:
+                return False, "Nenhum documento indexado"
+
             old_llm = self.llm
-            old_chain = self.qa_chain
+            old_k = self.retrieval_k
 
             try:
-                self.llm = self._create_optimized_llm(new_model)
-                if self.vectorstore:
-                    doc_count = self.vectorstore._collection.count()
-                    if doc_count > 0:
-                        template = self._get_optimized_template(new_model)
-                        prompt = PromptTemplate(input_variables=["context", "question"], template=template)
-                        max_results = self._get_optimal_k_for_model(new_model)
-
-                        self.qa_chain = RetrievalQA.from_chain_type(
-                            llm=self.llm,
-                            chain_type="stuff",
-                            retriever=self.vectorstore.as_retriever(search_kwargs={"k": max_results}),
-                            return_source_documents=True,
-                            chain_type_kwargs={"prompt": prompt}
-                        )
-
-                        test_stats = self.debug_vectorstore()
-                        if not test_stats.get("search_working", False):
-                            raise Exception("Chain não funciona")
-
-                    else:
-                        return False, "Nenhum documento indexado"
+                # LLM vem pronto do pool; o carregamento no Ollama segue em background
+                self._activate_model(new_model)
+                if self.config.MODEL_WARMUP:
+                    self.model_manager.warm_up(new_model)
 
                 print(f"Modelo {new_model} ativo!")
-                return True, f"Modelo {new_model} ativo"
+                return True, f"Modelo {new_model} ativo ({self.model_manager.label(new_model)})"
 
-            except Exception as chain_error:
+            except Exception as activation_error:
                 # Rollback
                 self.llm = old_llm
-                self.qa_chain = old_chain
-                return False, f"Erro na configuração: {str(chain_error)}"
+                self.retrieval_k = old_k
+                return False, f"Erro na configuração: {str(activation_error)}"
 
         except Exception as e:
             return False, f"Erro: {str(e)}"
@@ -671,27 +1658,32 @@ RESPOSTA:"""
         return self.config.DEFAULT_MODEL
 
     def get_stats(self) -> dict:
-        """Estatísticas do sistema"""
-        if not self.vectorstore:
+        """Estatísticas do sistema (só leitura de memória; a saúde é verificada em background)"""
+        if self.vectorstore is None:
             return {"error": "Vectorstore não inicializado", "total_documents": 0}
 
-        debug_info = self.debug_vectorstore()
-
-        if debug_info.get("error"):
-            return {"error": debug_info["error"], "total_documents": 0}
-
-        count = debug_info.get("document_count", 0)
+        snapshot = self.stats_monitor.snapshot()
         current_model = self.get_current_model()
         model_info = self.get_model_info(current_model)
 
         return {
-            "total_documents": count,
+            "total_documents": snapshot["document_count"],
+            "index_version": self.get_index_version(),
+            "last_index_time": snapshot["last_index_time"],
+            "health": snapshot["health"],
             "models": {
                 "llm": current_model,
                 "embedding": self.config.EMBEDDING_MODEL
             },
             "model_info": model_info,
-            "debug": debug_info
+            "answer_cache": self.answer_cache.get_stats(),
+            "symbol_index": self.symbol_index.get_stats(),
+            "embedding_cache": self.embeddings.get_stats() if hasattr(self.embeddings, "get_stats") else {},
+            "model_pool": self.model_manager.get_status(),
+            "ollama": self.ollama.get_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "system": self.system_monitor.get_stats(),
+            "queries": self.query_traces.get_summary()
         }
 
     def set_custom_source_path(self, new_path: str) -> bool:
@@ -725,33 +1717,22 @@ RESPOSTA:"""
         """Inicia monitoramento automático"""
         try:
             from watchdog.observers import Observer
-            from watchdog.events import FileSystemEventHandler
-            import time
+            from auto_reindex import AutoReindexer, ChangeHandler
 
             if not source_path:
                 source_path = self.config.SOURCE_CODE_PATH
 
-            class ChangeHandler(FileSystemEventHandler):
-                def __init__(self, rag_engine):
-                    self.rag_engine = rag_engine
-                    self.last_modified = time.time()
-
-                def on_modified(self, event):
-                    if event.is_directory:
-                        return
-
-                    current_time = time.time()
-                    if current_time - self.last_modified > 30:
-                        print(f"📝 Modificado: {event.src_path}")
-                        try:
-                            self.rag_engine.index_documents(force_reindex=True)
-                            self.last_modified = current_time
-                            print("Reindexação automática OK!")
-                        except Exception as e:
-                            print(f"Erro auto-reindex: {e}")
+            self.auto_reindexer = AutoReindexer(
+                self,
+                source_path,
+                debounce=self.config.AUTO_REINDEX_DEBOUNCE,
+                max_delay=self.config.AUTO_REINDEX_MAX_DELAY,
+                full_scan_threshold=self.config.AUTO_REINDEX_FULL_SCAN_THRESHOLD
+            )
+            self.auto_reindexer.start()
 
             self.file_watcher = Observer()
-            self.file_watcher.schedule(ChangeHandler(self), source_path, recursive=True)
+            self.file_watcher.schedule(ChangeHandler(self.auto_reindexer), source_path, recursive=True)
             self.file_watcher.start()
 
             print(f"Monitoramento ativo: {source_path}")
@@ -772,6 +1753,17 @@ RESPOSTA:"""
             except Exception as e:
                 print(f"⚠️ Erro ao parar: {e}")
 
+        if self.auto_reindexer:
+            self.auto_reindexer.stop()
+            self.auto_reindexer = None
+
+    def shutdown(self):
+        """Para as threads de fundo e deixa de expor as métricas (antes de descartar o motor)"""
+        self.stop_auto_reindex()
+        self.stats_monitor.stop()
+        self.system_monitor.stop()
+        self.metrics.stop_server()
+
     def get_current_source_path(self) -> str:
         """Pasta atual"""
         return self.config.SOURCE_CODE_PATH
@@ -779,8 +1771,6 @@ RESPOSTA:"""
     def remove_model(self, model_name: str) -> tuple[bool, str]:
         """Remove um modelo do Ollama"""
         try:
-            import requests
-
             print(f"🗑️ Removendo modelo: {model_name}")
 
             models_status = self.get_available_models()
@@ -791,13 +1781,10 @@ RESPOSTA:"""
             if model_name == current_model:
                 return False, f"Não é possível remover o modelo ativo ({model_name}). Troque para outro modelo primeiro."
 
-            response = requests.delete(
-                f"{self.config.OLLAMA_BASE_URL}/api/delete",
-                json={"name": model_name},
-                timeout=30
-            )
+            response = self.ollama.delete(model_name)
 
             if response.status_code == 200:
+                self.model_manager.forget(model_name)
                 print(f"Modelo {model_name} removido com sucesso!")
                 return True, f"Modelo {model_name} removido"
             else:
@@ -819,16 +1806,10 @@ RESPOSTA:"""
     def get_model_disk_usage(self, model_name: str) -> str:
         """Retorna o uso de disco estimado de um modelo"""
         try:
-            import requests
-
-            response = requests.get(f"{self.config.OLLAMA_BASE_URL}/api/tags", timeout=5)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                for model in models:
-                    if model["name"] == model_name:
-                        size_bytes = model.get("size", 0)
-                        size_gb = size_bytes / (1024 ** 3)
-                        return f"{size_gb:.1f}GB"
+            model = self.ollama.get_model(model_name)
+            if model:
+                size_gb = model.get("size", 0) / (1024 ** 3)
+                return f"{size_gb:.1f}GB"
 
             # Fallback para estimativas conhecidas
             size_estimates = {
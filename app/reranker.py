@@ -0,0 +1,144 @@
+import re
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+SCORE_PATTERN = re.compile(r"^\s*\[?(\d+)\]?\s*[:=\-]\s*(\d+(?:\.\d+)?)", re.MULTILINE)
+
+
+def _line_span(document: Document) -> Optional[Tuple[int, int]]:
+    start = document.metadata.get("start_line")
+    end = document.metadata.get("end_line")
+    if isinstance(start, int) and isinstance(end, int):
+        return start, end
+    return None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class Reranker:
+    """Etapa pós-busca: remove trechos repetidos, reordena (embedding ou LLM) e diversifica por MMR"""
+
+    def __init__(self, fetch_embeddings: Callable[[List[Document]], List[Optional[list]]],
+                 embed_query: Callable[[str], list], mode: str = "none", mmr_lambda: float = 0.7,
+                 dedupe_overlap: float = 0.5, llm_top: int = 10):
+        self.fetch_embeddings = fetch_embeddings
+        self.embed_query = embed_query
+        self.mode = mode
+        self.mmr_lambda = mmr_lambda
+        self.dedupe_overlap = dedupe_overlap
+        self.llm_top = llm_top
+
+    def dedupe(self, documents: List[Document]) -> List[Document]:
+        """Descarta chunks quase iguais (mesmo texto ou mesma faixa de linhas) a outro mais bem ranqueado"""
+        kept = []
+        seen_texts = set()
+
+        for document in documents:
+            text = " ".join(document.page_content.split())
+            if text in seen_texts:
+                continue
+
+            span = _line_span(document)
+            source = document.metadata.get("source", "")
+            duplicate = False
+            if span:
+                for other in kept:
+                    other_span = _line_span(other)
+                    if not other_span or other.metadata.get("source", "") != source:
+                        continue
+                    overlap = min(span[1], other_span[1]) - max(span[0], other_span[0]) + 1
+                    shortest = min(span[1] - span[0], other_span[1] - other_span[0]) + 1
+                    if overlap > 0 and overlap / shortest >= self.dedupe_overlap:
+                        duplicate = True
+                        break
+
+            if not duplicate:
+                kept.append(document)
+                seen_texts.add(text)
+
+        return kept
+
+    def _llm_scores(self, llm, question: str, documents: List[Document]) -> List[float]:
+        """Pede ao LLM uma nota de 0 a 10 por trecho, numa única chamada"""
+        listing = "\n\n".join(
+            f"[{i}] {document.metadata.get('source', '')}\n{document.page_content[:400]}"
+            for i, document in enumerate(documents)
+        )
+        prompt = (f"Dê uma nota de 0 a 10 para a relevância de cada trecho à pergunta.\n"
+                  f"Responda apenas linhas no formato 'índice: nota'.\n\n"
+                  f"PERGUNTA: {question}\n\nTRECHOS:\n{listing}\n\nNOTAS:")
+
+        scores = [0.0] * len(documents)
+        for index, score in SCORE_PATTERN.findall(llm.invoke(prompt)):
+            if int(index) < len(documents):
+                scores[int(index)] = min(float(score), 10.0) / 10.0
+        return scores
+
+    def rerank(self, question: str, documents: List[Document], k: int, llm=None) -> Tuple[List[Document], dict]:
+        """Retorna até `k` documentos e o tempo (s) de cada etapa; `llm` só é usado no modo llm"""
+        timings = {}
+
+        started = time.time()
+        documents = self.dedupe(documents)
+        timings["dedupe"] = time.time() - started
+
+        if len(documents) <= 1:
+            return documents[:k], timings
+
+        started = time.time()
+        vectors = self.fetch_embeddings(documents)
+        if any(vector is None for vector in vectors):
+            # Sem vetor não dá para comparar: mantém a ordem da busca
+            return documents[:k], timings
+        doc_vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        timings["embeddings"] = time.time() - started
+
+        # Relevância: ordem da busca (RRF/vetorial), ou nova nota por embedding/LLM
+        count = len(documents)
+        relevance = np.array([1.0 - i / count for i in range(count)], dtype=np.float32)
+
+        if self.mode in ("embedding", "llm"):
+            started = time.time()
+            query_vector = _normalize(np.asarray(self.embed_query(question), dtype=np.float32))
+            relevance = doc_vectors @ query_vector
+            if self.mode == "llm" and llm is not None:
+                top = np.argsort(-relevance)[:self.llm_top]
+                try:
+                    llm_scores = self._llm_scores(llm, question, [documents[i] for i in top])
+                    for position, index in enumerate(top):
+                        # Os avaliados pelo LLM ficam acima dos demais
+                        relevance[index] = 1.0 + llm_scores[position]
+                except Exception as e:
+                    print(f"⚠️ Rerank por LLM indisponível: {e}")
+            timings["rerank"] = time.time() - started
+
+        started = time.time()
+        similarity = doc_vectors @ doc_vectors.T
+        selected: List[int] = []
+        remaining = list(range(count))
+
+        while remaining and len(selected) < k:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = remaining[int(np.argmax(scores))]
+            selected.append(best)
+            remaining.remove(best)
+
+        timings["mmr"] = time.time() - started
+
+        results = []
+        for index in selected:
+            document = documents[index]
+            document.metadata["rerank_score"] = round(float(relevance[index]), 4)
+            results.append(document)
+        return results, timings
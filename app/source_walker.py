@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+SOURCE_EXTENSIONS = {
+    ".py", ".java", ".php", ".rb",
+    ".go", ".cpp", ".c", ".h",
+    ".cs", ".kt", ".swift", ".rs",
+    ".js", ".ts", ".jsx", ".tsx",
+    ".vue", ".html", ".css", ".scss",
+    ".json", ".xml", ".yaml", ".yml",
+    ".sql", ".properties", ".conf",
+    ".env", ".ini", ".md", ".txt", ".rst"
+}
+
+DOC_EXTENSIONS = {".md", ".txt", ".rst"}
+
+IGNORED_DIRS = {
+    "node_modules", "venv", "env", ".git", "build",
+    "dist", "target", ".pytest_cache"
+}
+
+IGNORED_SUFFIXES = (".log", ".tmp")
+
+
+def get_extension(name: str) -> str:
+    """Extensão em minúsculas, incluindo arquivos como '.env'"""
+    dot = name.rfind(".")
+    return name[dot:].lower() if dot >= 0 else ""
+
+
+def has_ignored_dir(relative_path: str, ignored_dirs: Set[str] = IGNORED_DIRS) -> bool:
+    """Verifica se algum componente do caminho (relativo à raiz) é uma pasta ignorada"""
+    parts = os.path.normpath(relative_path).split(os.sep)
+    return any(part in ignored_dirs for part in parts)
+
+
+def is_indexable(relative_path: str, extensions: Set[str], ignored_dirs: Set[str] = IGNORED_DIRS) -> bool:
+    """Aplica a um único arquivo as mesmas regras do walker"""
+    name = os.path.basename(relative_path)
+    if name.endswith(IGNORED_SUFFIXES) or get_extension(name) not in extensions:
+        return False
+    return not has_ignored_dir(os.path.dirname(relative_path), ignored_dirs)
+
+
+def walk_files(root: str, extensions: Set[str], ignored_dirs: Set[str] = IGNORED_DIRS) -> Dict[str, dict]:
+    """Percorre a árvore uma única vez, podando pastas ignoradas antes de descer"""
+    files = {}
+    stack = [root]
+
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in ignored_dirs:
+                                stack.append(entry.path)
+                            continue
+
+                        if not entry.is_file():
+                            continue
+
+                        if entry.name.endswith(IGNORED_SUFFIXES):
+                            continue
+
+                        if get_extension(entry.name) not in extensions:
+                            continue
+
+                        stat = entry.stat()
+                        files[os.path.normpath(entry.path)] = {
+                            "size": stat.st_size,
+                            "mtime": stat.st_mtime
+                        }
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"⚠️ Erro ao listar {current}: {e}")
+
+    return files
+
+
+TOO_LARGE = object()
+
+
+def _read_text(path: str, max_chars: Optional[int]):
+    try:
+        if max_chars and os.path.getsize(path) > max_chars * 4:
+            return TOO_LARGE
+
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        if max_chars and len(content) >= max_chars:
+            return TOO_LARGE
+        return content
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def read_text_files(paths: List[str], max_workers: int = 8, max_chars: Optional[int] = None,
+                    oversized: Optional[List[str]] = None) -> Dict[str, str]:
+    """Lê arquivos UTF-8 em paralelo; arquivos ilegíveis ou grandes demais são ignorados
+
+    Os caminhos ignorados por `max_chars` são acrescentados a `oversized`, se informado.
+    """
+    if not paths:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        contents = list(executor.map(lambda path: _read_text(path, max_chars), paths))
+
+    results = {}
+    for path, content in zip(paths, contents):
+        if content is TOO_LARGE:
+            if oversized is not None:
+                oversized.append(path)
+        elif content is not None:
+            results[path] = content
+    return results
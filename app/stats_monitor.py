@@ -0,0 +1,113 @@
+import threading
+import time
+from typing import Optional
+
+
+class StatsMonitor:
+    """Contagens e saúde do índice mantidas em memória
+
+    A leitura (`snapshot`) não faz I/O: as contagens são atualizadas quando o índice muda e a
+    verificação de saúde (Chroma + Ollama) roda numa thread em intervalo fixo.
+    """
+
+    def __init__(self, rag_engine, interval: float = 60.0):
+        self.rag_engine = rag_engine
+        self.interval = interval
+
+        self.document_count = 0
+        self.last_index_time: Optional[float] = None
+        self.health = {"status": "unknown", "checked_at": None, "latency_ms": None, "checks": {}, "error": None}
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._worker = None
+
+    def start(self):
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="krag-health", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.check_health()
+            self._stop_event.wait(self.interval)
+
+    def refresh_counts(self):
+        """Recontagem local (SQLite do Chroma, sem embeddings); chamada quando o índice muda"""
+        vectorstore = self.rag_engine.vectorstore
+        if vectorstore is None:
+            return
+        try:
+            count = vectorstore._collection.count()
+        except Exception as e:
+            print(f"⚠️ Erro ao contar documentos: {e}")
+            return
+        with self._lock:
+            self.document_count = count
+
+    def mark_indexed(self):
+        with self._lock:
+            self.last_index_time = time.time()
+        self.refresh_counts()
+
+    def check_health(self) -> dict:
+        """Chroma responde? Ollama responde e tem o modelo de embedding?"""
+        started = time.time()
+        checks = {}
+        error = None
+
+        try:
+            count = self.rag_engine.vectorstore._collection.count()
+            with self._lock:
+                self.document_count = count
+            checks["chroma"] = True
+        except Exception as e:
+            checks["chroma"] = False
+            error = f"Chroma: {e}"
+
+        try:
+            names = self.rag_engine.ollama.model_names(refresh=True)
+            checks["ollama"] = True
+            embedding_model = self.rag_engine.config.EMBEDDING_MODEL
+            checks["embedding_model"] = any(
+                name == embedding_model or name.split(":")[0] == embedding_model for name in names
+            )
+            if not checks["embedding_model"]:
+                error = error or f"Modelo de embedding {embedding_model} não encontrado"
+        except Exception as e:
+            checks["ollama"] = False
+            error = error or f"Ollama: {e}"
+
+        if not checks.get("chroma") or not checks.get("ollama"):
+            status = "error"
+        elif not checks.get("embedding_model"):
+            status = "degraded"
+        else:
+            status = "ok"
+
+        health = {
+            "status": status,
+            "checked_at": time.time(),
+            "latency_ms": round((time.time() - started) * 1000, 1),
+            "checks": checks,
+            "error": error
+        }
+        with self._lock:
+            self.health = health
+        return health
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "document_count": self.document_count,
+                "last_index_time": self.last_index_time,
+                "health": dict(self.health, checks=dict(self.health["checks"]))
+            }
@@ -0,0 +1,319 @@
+import gzip
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from ast_chunker import describe_definition, get_parser, run_parallel
+from index_journal import IndexJournal
+from source_walker import DOC_EXTENSIONS, get_extension
+
+# Chamadas por linguagem: tipo de nó → campo com o alvo da chamada
+CALL_NODES = {
+    "python": {"call": "function"},
+    "java": {"method_invocation": "name", "object_creation_expression": "type"},
+    "javascript": {"call_expression": "function", "new_expression": "constructor"},
+}
+
+# Alvo qualificado (obj.metodo) → campo com o nome do membro
+MEMBER_FIELDS = {"attribute": "attribute", "member_expression": "property", "field_access": "field"}
+
+# Linguagens sem gramática: definições e chamadas por regex
+REGEX_DEFINITIONS = [
+    (re.compile(r"^\s*(?:export\s+)?(?:(?:public|private|protected|static|async|abstract|final|"
+                r"internal|override|open|pub)\s+)*(function|def|class|interface|trait|struct|enum|"
+                r"module|fn|fun)\s+&?([A-Za-z_$][\w$]*)"), None),
+    (re.compile(r"^\s*func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)"), "function"),
+    (re.compile(r"^\s*create\s+(?:or\s+replace\s+)?(table|view|procedure|function|trigger)\s+"
+                r"(?:if\s+not\s+exists\s+)?([\w.\"`\[\]]+)", re.IGNORECASE), None),
+]
+REGEX_CALL = re.compile(r"(?<![\w$])([A-Za-z_$][\w$]*)\s*\(")
+CALL_KEYWORDS = {
+    "if", "for", "while", "switch", "return", "catch", "function", "def", "class", "elif",
+    "and", "or", "not", "in", "sizeof", "typeof", "new", "func", "fn", "fun", "print", "echo",
+    "super", "this", "self", "lambda", "with", "except", "assert", "yield", "await", "foreach",
+    "values", "exists", "count", "select", "from", "where", "insert", "into", "update", "delete",
+}
+
+KIND_NAMES = {"table": "table", "view": "view", "procedure": "procedure", "trigger": "trigger",
+              "def": "function", "fn": "function", "fun": "function", "func": "function"}
+
+
+def _node_text(node) -> str:
+    return node.text.decode("utf-8", errors="replace") if node is not None else ""
+
+
+def _call_target(node, field: str) -> str:
+    """Nome curto chamado (obj.metodo() → metodo, new pkg.Classe() → Classe)"""
+    target = node.child_by_field_name(field)
+    if target is None:
+        return ""
+
+    member_field = MEMBER_FIELDS.get(target.type)
+    if member_field:
+        target = target.child_by_field_name(member_field)
+    elif target.type == "generic_type" and target.named_children:
+        target = target.named_children[0]
+
+    text = _node_text(target)
+    return text.rsplit(".", 1)[-1] if re.fullmatch(r"[\w$.]+", text) else ""
+
+
+def _extract_with_ast(parser, language: str, data: bytes) -> dict:
+    tree = parser.parse(data)
+    definitions, references = [], []
+    calls = CALL_NODES[language]
+
+    stack = [(tree.root_node, "")]
+    while stack:
+        node, scope = stack.pop()
+
+        found = describe_definition(node, language)
+        if found:
+            definition, name, kind = found
+            if name:
+                qualified = f"{scope}.{name}" if scope else name
+                if kind == "function" and scope:
+                    kind = "method"
+                definitions.append({
+                    "name": name,
+                    "symbol": qualified,
+                    "kind": kind,
+                    "line": node.start_point[0] + 1,
+                    "end_line": node.end_point[0] + 1
+                })
+                scope = qualified
+
+        field = calls.get(node.type)
+        if field:
+            target = _call_target(node, field)
+            if target:
+                references.append({"name": target, "line": node.start_point[0] + 1, "caller": scope})
+
+        stack.extend((child, scope) for child in reversed(node.named_children))
+
+    return {"definitions": definitions, "references": references}
+
+
+def _extract_with_regex(text: str) -> dict:
+    definitions, references = [], []
+    scope = ""
+
+    for number, line in enumerate(text.splitlines(), start=1):
+        defined = None
+        for pattern, fixed_kind in REGEX_DEFINITIONS:
+            match = pattern.match(line)
+            if match:
+                if fixed_kind:
+                    kind, name = fixed_kind, match.group(1)
+                else:
+                    keyword, name = match.group(1).lower(), match.group(2)
+                    kind = KIND_NAMES.get(keyword, keyword)
+                name = name.strip("\"`[]").rsplit(".", 1)[-1]
+                definitions.append({"name": name, "symbol": name, "kind": kind, "line": number, "end_line": number})
+                defined = name
+                if kind in ("function", "procedure"):
+                    scope = name
+                break
+
+        # Sem AST não há fim de bloco: código encostado na margem volta ao nível do módulo
+        if defined is None and line[:1].strip():
+            scope = ""
+
+        for name in REGEX_CALL.findall(line):
+            if name == defined or name.lower() in CALL_KEYWORDS:
+                continue
+            references.append({"name": name, "line": number, "caller": scope})
+
+    return {"definitions": definitions, "references": references}
+
+
+def extract_symbols(source: str, text: str) -> dict:
+    """Definições (nome, tipo, linhas) e chamadas (nome, linha, quem chama) de um arquivo"""
+    if get_extension(source) in DOC_EXTENSIONS:
+        return {"definitions": [], "references": []}
+
+    parser, language = get_parser(source)
+    if parser is not None:
+        try:
+            return _extract_with_ast(parser, language, text.encode("utf-8", errors="surrogatepass"))
+        except Exception as e:
+            print(f"⚠️ Erro ao extrair símbolos de {source}: {e}")
+
+    return _extract_with_regex(text)
+
+
+def _extract_job(args: tuple) -> tuple:
+    source, text = args
+    return source, extract_symbols(source, text)
+
+
+def extract_all(files: Dict[str, str], max_workers: int = 4) -> Dict[str, dict]:
+    """Extrai símbolos de vários arquivos em paralelo"""
+    return dict(run_parallel(_extract_job, list(files.items()), max_workers=max_workers))
+
+
+# "onde está X", "quem chama X", "where is X defined", "who calls X", ...
+IDENTIFIER = r"[`'\"]?([A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*)(?:\(\))?[`'\"]?"
+NOUNS = r"(?:(?:a|o|the)\s+)?(?:(?:função|funcao|método|metodo|classe|tabela|procedure|interface|" \
+        r"function|method|class|table)\s+)?"
+QUESTION_TEMPLATES = [
+    ("references", rf"(?:quem|o que)\s+(?:chama|usa|invoca|utiliza)\s+{NOUNS}{IDENTIFIER}"),
+    ("references", rf"onde\s+{NOUNS}{IDENTIFIER}\s+é\s+(?:chamad[oa]|usad[oa]|utilizad[oa]|invocad[oa])"),
+    ("references", rf"(?:quais|que)\s+(?:arquivos|funções|funcoes|métodos|metodos|lugares)\s+"
+                   rf"(?:chamam|usam|utilizam|invocam)\s+{NOUNS}{IDENTIFIER}"),
+    ("references", rf"(?:who|what)\s+(?:calls|uses|invokes)\s+{NOUNS}{IDENTIFIER}"),
+    ("references", rf"where\s+is\s+{NOUNS}{IDENTIFIER}\s+(?:called|used|invoked)"),
+    ("references", rf"(?:find\s+)?(?:usages|references|callers)\s+(?:of|to)\s+{NOUNS}{IDENTIFIER}"),
+    ("definition", rf"onde\s+(?:está|esta|fica)\s+(?:definid[oa]\s+)?{NOUNS}{IDENTIFIER}"
+                   rf"(?:\s+(?:definid[oa]|declarad[oa]|implementad[oa]))?"),
+    ("definition", rf"onde\s+{NOUNS}{IDENTIFIER}\s+(?:é|foi)\s+(?:definid[oa]|declarad[oa]|implementad[oa])"),
+    ("definition", rf"where\s+is\s+{NOUNS}{IDENTIFIER}(?:\s+(?:defined|declared|implemented))?"),
+    ("definition", rf"(?:find\s+)?(?:the\s+)?definition\s+of\s+{NOUNS}{IDENTIFIER}"),
+]
+QUESTION_PATTERNS = [(intent, re.compile(rf"^{pattern}\s*[?.!]*$", re.IGNORECASE))
+                     for intent, pattern in QUESTION_TEMPLATES]
+
+
+def parse_symbol_question(question: str) -> Optional[Tuple[str, str]]:
+    """Reconhece perguntas de localização: ('definition' | 'references', nome)"""
+    text = re.sub(r"\s+", " ", question.strip())
+    for intent, pattern in QUESTION_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return intent, match.group(1)
+    return None
+
+
+class SymbolIndex:
+    """Tabela de definições e referências por arquivo, persistida junto ao Chroma"""
+
+    FILENAME = "symbol_index.json.gz"
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.FILENAME)
+        self.files: Dict[str, dict] = {}
+        self._definitions: Dict[str, Set[str]] = {}
+        self._references: Dict[str, Set[str]] = {}
+        # Totais mantidos por set_file/remove_file: get_stats é O(1) (consultado pela UI e pelas métricas)
+        self.definition_count = 0
+        self.reference_count = 0
+        self.journal = IndexJournal(self.path)
+        self._lock = threading.RLock()
+        self.load()
+
+    def __len__(self):
+        return len(self.files)
+
+    def load(self):
+        with self._lock:
+            self._reset()
+            if not os.path.exists(self.path):
+                self.journal.invalidate()
+                return
+
+            try:
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    files = json.load(f).get("files", {})
+                for source, symbols in files.items():
+                    self._set_file(source, symbols)
+
+                for operation in self.journal.replay():
+                    if operation[0] == "set":
+                        self._set_file(operation[1], operation[2])
+                    elif operation[0] == "remove":
+                        self._remove_file(operation[1])
+            except Exception as e:
+                print(f"⚠️ Erro ao ler índice de símbolos: {e}")
+                self.clear()
+
+    def save(self):
+        """Acrescenta as mudanças ao journal; o snapshot completo só é regravado na compactação"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if not self.journal.needs_compaction(len(self.files)):
+                self.journal.append()
+                return
+
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({"files": self.files}, f)
+            os.replace(tmp_path, self.path)
+            self.journal.truncate()
+
+    def _reset(self):
+        self.files = {}
+        self._definitions = {}
+        self._references = {}
+        self.definition_count = 0
+        self.reference_count = 0
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.journal.invalidate()
+
+    def set_file(self, source: str, symbols: dict):
+        with self._lock:
+            self._set_file(source, symbols)
+            self.journal.record("set", source, symbols)
+
+    def remove_file(self, source: str):
+        with self._lock:
+            if source in self.files:
+                self._remove_file(source)
+                self.journal.record("remove", source)
+
+    def _set_file(self, source: str, symbols: dict):
+        self._remove_file(source)
+        self.files[source] = symbols
+        self.definition_count += len(symbols.get("definitions", []))
+        self.reference_count += len(symbols.get("references", []))
+        for entry in symbols.get("definitions", []):
+            self._definitions.setdefault(entry["name"], set()).add(source)
+        for entry in symbols.get("references", []):
+            self._references.setdefault(entry["name"], set()).add(source)
+
+    def _remove_file(self, source: str):
+        symbols = self.files.pop(source, None)
+        if not symbols:
+            return
+        self.definition_count -= len(symbols.get("definitions", []))
+        self.reference_count -= len(symbols.get("references", []))
+        for key, index in (("definitions", self._definitions), ("references", self._references)):
+            for entry in symbols.get(key, []):
+                sources = index.get(entry["name"])
+                if sources is None:
+                    continue
+                sources.discard(source)
+                if not sources:
+                    del index[entry["name"]]
+
+    def _lookup(self, index: Dict[str, Set[str]], key: str, name: str) -> List[dict]:
+        short_name = name.rsplit(".", 1)[-1]
+        results = []
+        with self._lock:
+            for source in sorted(index.get(short_name, ())):
+                for entry in self.files[source].get(key, []):
+                    if entry["name"] != short_name:
+                        continue
+                    # "Classe.metodo" só casa com a definição qualificada
+                    if key == "definitions" and "." in name and not entry["symbol"].endswith(name):
+                        continue
+                    results.append(dict(entry, source=source))
+        return results
+
+    def find_definitions(self, name: str) -> List[dict]:
+        return self._lookup(self._definitions, "definitions", name)
+
+    def find_references(self, name: str) -> List[dict]:
+        return self._lookup(self._references, "references", name)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self.files),
+                "definitions": self.definition_count,
+                "references": self.reference_count
+            }
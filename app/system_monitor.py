@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+import psutil
+
+MB = 1024 ** 2
+
+
+class SystemMonitor:
+    """Amostra CPU/RAM da máquina e a memória do Ollama e do KRAG numa thread, em buffer circular
+
+    A UI só lê a última amostra (sem o bloqueio de 1s do psutil.cpu_percent(interval=1)).
+    """
+
+    FIELDS = ("cpu_percent", "ram_percent", "ram_used_gb", "krag_rss_mb", "ollama_rss_mb")
+
+    def __init__(self, interval: float = 2.0, history_size: int = 150):
+        self.interval = interval
+        self._samples = deque(maxlen=history_size)
+        self._process = psutil.Process(os.getpid())
+        self._ollama_pids: List[int] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._worker = None
+
+    def start(self):
+        if self._worker and self._worker.is_alive():
+            return
+        # A primeira leitura de cpu_percent(None) só marca o início da janela
+        psutil.cpu_percent(interval=None)
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="krag-system-monitor", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"⚠️ Erro ao coletar métricas do sistema: {e}")
+
+    def _find_ollama(self) -> List[psutil.Process]:
+        """Processos do Ollama na mesma máquina (vazio quando roda em outro container/host)"""
+        processes = []
+        for pid in self._ollama_pids:
+            try:
+                processes.append(psutil.Process(pid))
+            except psutil.Error:
+                pass
+
+        if not processes:
+            for process in psutil.process_iter(["name"]):
+                if (process.info.get("name") or "").lower().startswith("ollama"):
+                    processes.append(process)
+            self._ollama_pids = [process.pid for process in processes]
+        return processes
+
+    def _ollama_rss(self) -> Optional[float]:
+        processes = self._find_ollama()
+        if not processes:
+            return None
+
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                # Processo terminou: procura de novo na próxima amostra
+                self._ollama_pids = []
+        return round(total / MB, 1)
+
+    def sample(self) -> dict:
+        memory = psutil.virtual_memory()
+        sample = {
+            "time": time.time(),
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "ram_percent": memory.percent,
+            "ram_used_gb": round(memory.used / 1024 ** 3, 2),
+            "krag_rss_mb": round(self._process.memory_info().rss / MB, 1),
+            "ollama_rss_mb": self._ollama_rss()
+        }
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    def latest(self) -> Optional[dict]:
+        """Última amostra (coleta uma na hora se o buffer ainda está vazio)"""
+        with self._lock:
+            if self._samples:
+                return dict(self._samples[-1])
+        return self.sample()
+
+    def history(self, field: str, seconds: Optional[float] = None) -> List[float]:
+        """Série de um campo, da mais antiga para a mais recente"""
+        since = time.time() - seconds if seconds else 0
+        with self._lock:
+            return [sample[field] for sample in self._samples
+                    if sample["time"] >= since and sample.get(field) is not None]
+
+    def get_stats(self) -> dict:
+        latest = self.latest() or {}
+        with self._lock:
+            samples = len(self._samples)
+        return dict(latest, samples=samples, interval=self.interval)